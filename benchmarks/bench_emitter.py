@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Compare the inventory emitter with PyYAML
+
+The inventory is built by generator.py, see --help for its parameters.
+"""
+
+import argparse
+import os.path as op
+import sys
+import timeit
+import yaml
+
+sys.path.insert(0, op.abspath(op.join(op.dirname(__file__), '..')))
+import inventory_tool.emitter as em
+import generator
+
+
+def main():
+    args = parse_args()
+    hosts = args.hosts
+    data = generator.generate(**{x: getattr(args, x) for x in generator.DEFAULTS})
+    expected = yaml.dump(data, Dumper=em.Dumper, encoding='utf-8',
+                         default_flow_style=False)
+    if em.dump(data) != expected:
+        print("Emitter output differs from PyYAML output!", file=sys.stderr)
+        sys.exit(1)
+    pyyaml = min(timeit.repeat(lambda: yaml.dump(data, Dumper=em.Dumper,
+                                                 encoding='utf-8',
+                                                 default_flow_style=False),
+                               number=1, repeat=3))
+    fast = min(timeit.repeat(lambda: em.dump(data), number=1, repeat=3))
+    print("{0} hosts, {1} bytes".format(hosts, len(expected)))
+    print("PyYAML ({0}): {1:.3f}s".format(em.Dumper.__name__, pyyaml))
+    print("emitter: {0:.3f}s ({1:.1f}x faster)".format(fast, pyyaml / fast))
+
+
+def parse_args(description=__doc__):
+    """Parse generator parameters, shared by the comparison benchmarks"""
+    parser = argparse.ArgumentParser(description=description.splitlines()[0])
+    generator.add_arguments(parser)
+    parser.set_defaults(hosts=10000)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
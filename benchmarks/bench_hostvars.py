@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Compare building of "_meta"/"hostvars" with the per-key conversion loop
+
+The inventory is built by generator.py, see --help for its parameters.
+"""
+
+import os.path as op
+import sys
+import timeit
+
+sys.path.insert(0, op.abspath(op.join(op.dirname(__file__), '..')))
+import inventory_tool.validators as v
+from inventory_tool.object.host import Host
+import generator
+from bench_emitter import parse_args
+
+
+def per_key(hosts):
+    """Hostvars conversion as it was done before Host.get_ansible_hostvars"""
+    ret = {}
+    for host in sorted(hosts):
+        keyvals = hosts[host].get_keyval()
+        tmp = {}
+        for key in keyvals:
+            if key in v.KeyWordValidator.get_ipaddress_keywords() + \
+                    v.KeyWordValidator.get_ipnetwork_keywords():
+                tmp[key] = str(keyvals[key])
+            else:
+                tmp[key] = keyvals[key]
+        ret[host] = tmp
+    return ret
+
+
+def serializer(hosts):
+    str_keywords = frozenset(v.KeyWordValidator.get_ipaddress_keywords() +
+                             v.KeyWordValidator.get_ipnetwork_keywords())
+    return {host: hosts[host].get_ansible_hostvars(str_keywords)
+            for host in sorted(hosts)}
+
+
+def main():
+    args = parse_args(__doc__)
+    hosts = args.hosts
+    data = generator.generate(**{x: getattr(args, x) for x in generator.DEFAULTS})
+    objs = {x: Host(**data["hosts"][x]) for x in data["hosts"]}
+    if per_key(objs) != serializer(objs):
+        print("Serializer output differs from per-key conversion!",
+              file=sys.stderr)
+        sys.exit(1)
+    print("{0} hosts".format(hosts))
+    old = min(timeit.repeat(lambda: per_key(objs), number=1, repeat=5))
+    # The first call fills the string caches, the following ones reuse them:
+    objs = {x: Host(**data["hosts"][x]) for x in data["hosts"]}
+    cold = timeit.timeit(lambda: serializer(objs), number=1)
+    warm = min(timeit.repeat(lambda: serializer(objs), number=1, repeat=5))
+    print("per-key conversion: {0:.3f}s".format(old))
+    print("serializer, cold: {0:.3f}s ({1:.1f}x faster)".format(cold, old / cold))
+    print("serializer, warm: {0:.3f}s ({1:.1f}x faster)".format(warm, old / warm))
+
+
+if __name__ == '__main__':
+    main()
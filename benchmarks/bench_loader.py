@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Compare the inventory subset parser with PyYAML
+
+The inventory is built by generator.py, see --help for its parameters.
+"""
+
+import os.path as op
+import sys
+import timeit
+import yaml
+
+sys.path.insert(0, op.abspath(op.join(op.dirname(__file__), '..')))
+import inventory_tool.emitter as em
+import inventory_tool.loader as ld
+import generator
+from bench_emitter import parse_args
+
+
+def main():
+    args = parse_args(__doc__)
+    hosts = args.hosts
+    data = generator.generate(**{x: getattr(args, x) for x in generator.DEFAULTS})
+    document = em.dump(data)
+    if list(ld._iter_subset(document)) != list(ld._iter_events(document)):
+        print("Subset parser output differs from PyYAML output!", file=sys.stderr)
+        sys.exit(1)
+    print("{0} hosts, {1} bytes".format(hosts, len(document)))
+    results = [("PyYAML (yaml.Loader)",
+                lambda: yaml.load(document, Loader=yaml.Loader)),
+               ("PyYAML events ({0})".format(ld.Loader.__name__),
+                lambda: list(ld._iter_events(document))),
+               ("subset parser", lambda: list(ld._iter_subset(document))),
+               ]
+    for name, func in results:
+        took = min(timeit.repeat(func, number=1, repeat=3))
+        print("{0}: {1:.3f}s".format(name, took))
+
+
+if __name__ == '__main__':
+    main()
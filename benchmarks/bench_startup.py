@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Measure the startup overhead of "--list" calls
+
+Each run is a separate interpreter, just like when Ansible calls the inventory
+script. The overhead is the median wall time of "--list" minus the median
+wall time of an interpreter that does nothing, so the budget does not depend
+that much on the machine. Modules imported during the call are taken from
+"python -X importtime" output.
+
+Usage: bench_startup.py [--format yaml|json|binary] [--hosts N] [--runs N]
+                        [--budget MILLISECONDS]
+
+Exits with status 1 if the overhead exceeds the budget.
+"""
+
+import argparse
+import os
+import os.path as op
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, op.abspath(op.join(op.dirname(__file__), '..')))
+import generator
+
+# Modules that "--list" must not need:
+UNNEEDED_MODULES = ['argparse', 'sqlite3', 'logging.handlers']
+
+SCRIPT = """
+import sys
+sys.path.insert(0, {0!r})
+import inventory_tool.cmdline as cmd
+cmd.main(['bench', '--list'], {1!r}, backend_domain={2!r})
+"""
+
+
+def _median_time(args, runs):
+    ret = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, check=True, stdout=subprocess.DEVNULL)
+        ret.append(time.perf_counter() - start)
+    return statistics.median(ret)
+
+
+def _imported_modules(args):
+    res = subprocess.run([args[0], '-X', 'importtime'] + args[1:], check=True,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                         universal_newlines=True)
+    ret = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        ret[name.strip()] = int(cumulative)
+    return ret
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--format', choices=['yaml', 'json', 'binary'],
+                        default='yaml')
+    parser.add_argument('--hosts', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--budget', type=float, default=150.0)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = op.join(tmpdir, 'inventory' + {'yaml': '.yml', 'json': '.json',
+                                              'binary': '.bin'}[args.format])
+        generator.write(generator.generate(hosts=args.hosts), path)
+
+        root = op.abspath(op.join(op.dirname(__file__), '..'))
+        command = [sys.executable, '-c', SCRIPT.format(root, path,
+                                                      generator.BACKEND_DOMAIN)]
+        bare = _median_time([sys.executable, '-c', 'pass'], args.runs)
+        took = _median_time(command, args.runs)
+        modules = _imported_modules(command)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    overhead = (took - bare) * 1000
+    print("{0} inventory, {1} hosts, {2} runs".format(args.format, args.hosts,
+                                                      args.runs))
+    print("bare interpreter: {0:.1f}ms".format(bare * 1000))
+    print("--list: {0:.1f}ms, overhead {1:.1f}ms, budget {2:.1f}ms".format(
+          took * 1000, overhead, args.budget))
+    print("imports of inventory_tool.cmdline: {0:.1f}ms (-X importtime)".format(
+          modules.get('inventory_tool.cmdline', 0) / 1000))
+    failed = False
+    unneeded = [x for x in UNNEEDED_MODULES if x in modules]
+    if unneeded:
+        print("Unneeded modules imported: " + ", ".join(unneeded))
+        failed = True
+    if overhead > args.budget:
+        print("Startup overhead exceeds the budget!")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Generate synthetic inventories for benchmarking
+
+The same parameters (and seed) always give the same inventory, so results
+obtained for different commits can be compared.
+
+Usage: generator.py [options] PATH
+"""
+
+import argparse
+import math
+import os.path as op
+import random
+import sys
+
+sys.path.insert(0, op.abspath(op.join(op.dirname(__file__), '..')))
+import inventory_tool.fileformat as ff
+from inventory_tool.object.inventory import InventoryData
+from inventory_tool.validators import HostnameParser
+
+# Generated hosts live in relative names, so any domain will do:
+BACKEND_DOMAIN = "example.com"
+
+DEFAULTS = {"hosts": 1000,
+            "aliases": 1,
+            "groups": 20,
+            "depth": 2,
+            "pools": 4,
+            "fill": 0.9,
+            "free": 0,
+            "seed": 0,
+            }
+
+
+def _pool_networks(pools, prefix):
+    """Consecutive, non-overlapping networks of the same size"""
+    size = 2 ** (32 - prefix)
+    for i in range(pools):
+        start = (10 << 24) + i * size
+        yield "{0}.{1}.{2}.{3}/{4}".format(start >> 24 & 255, start >> 16 & 255,
+                                          start >> 8 & 255, start & 255, prefix)
+
+
+def ip_str(value):
+    """Format an integer as an IPv4 address"""
+    return "{0}.{1}.{2}.{3}".format(value >> 24 & 255, value >> 16 & 255,
+                                    value >> 8 & 255, value & 255)
+
+
+def generate(hosts=DEFAULTS["hosts"], aliases=DEFAULTS["aliases"],
+             groups=DEFAULTS["groups"], depth=DEFAULTS["depth"],
+             pools=DEFAULTS["pools"], fill=DEFAULTS["fill"],
+             free=DEFAULTS["free"], seed=DEFAULTS["seed"]):
+    """Build serialized inventory data
+
+    Args:
+        hosts: number of hosts
+        aliases: number of aliases of each host
+        groups: number of regular groups, arranged in "depth" levels with each
+            group being a child of some group from the level above. Hosts are
+            members of the groups from the lowest level.
+        depth: number of levels of groups
+        pools: number of ip pools, each of them assigned to ansible_ssh_host
+            variable of its own group of hosts
+        fill: fraction of addresses of each pool that are in use, either
+            allocated to hosts or reserved
+        free: minimal number of free addresses left in each pool, i.e. for
+            the hosts added by the benchmarks, takes precedence over "fill"
+        seed: seed of the pseudo-random generator
+
+    Returns:
+        A hash in the format accepted by InventoryData.load_hash().
+    """
+    rnd = random.Random(seed)
+    data = {"hosts": {}, "groups": {}, "ippools": {}}
+
+    # Smallest network that fits the hosts of the biggest pool at given fill
+    # ratio and with enough free addresses (network and broadcast addresses
+    # are not usable):
+    per_pool = int(math.ceil(hosts / float(max(pools, 1))))
+    usable = max(int(math.ceil(per_pool / fill)), per_pool + free, 1)
+    prefix = 32 - max(int(math.ceil(math.log(usable + 2, 2))), 2)
+    pool_names = ["pool{0:03d}".format(i) for i in range(pools)]
+    for name, network in zip(pool_names, _pool_networks(pools, prefix)):
+        data["ippools"][name] = {"network": network,
+                                 "allocated": [],
+                                 "reserved": []}
+        data["groups"][name] = {"hosts": [], "children": [],
+                                "ippools": {"ansible_ssh_host": name}}
+
+    levels = [[] for _ in range(max(depth, 1))]
+    for i in range(groups):
+        name = "group{0:04d}".format(i)
+        level = levels[i * len(levels) // max(groups, 1)]
+        level.append(name)
+        data["groups"][name] = {"hosts": [], "children": [], "ippools": {}}
+    for upper, lower in zip(levels, levels[1:]):
+        for name in lower:
+            data["groups"][rnd.choice(upper)]["children"].append(name)
+    leaves = [x for x in levels if x][-1] if groups else []
+
+    next_ip = {}
+    for name in pool_names:
+        network = data["ippools"][name]["network"].split('/')[0]
+        next_ip[name] = sum(int(x) << (24 - 8 * i)
+                            for i, x in enumerate(network.split('.'))) + 1
+    for i in range(hosts):
+        name = "host{0:06d}.dc{1}".format(i, i % 3)
+        keyvals = {"ansible_ssh_port": rnd.choice([22, 22, 22, 2222]),
+                   "role": rnd.choice(["web", "db", "cache", "worker"]),
+                   }
+        if pools:
+            pool = pool_names[i % pools]
+            keyvals["ansible_ssh_host"] = ip_str(next_ip[pool])
+            next_ip[pool] += 1
+            data["ippools"][pool]["allocated"].append(keyvals["ansible_ssh_host"])
+            data["groups"][pool]["hosts"].append(name)
+        else:
+            keyvals["ansible_ssh_host"] = ip_str((172 << 24) + 16 + i)
+        if leaves:
+            data["groups"][rnd.choice(leaves)]["hosts"].append(name)
+        data["hosts"][name] = {
+            "aliases": ["alias{0:06d}-{1}.dc{2}".format(i, j, i % 3)
+                        for j in range(aliases)],
+            "keyvals": keyvals,
+            }
+
+    # Reserve addresses right after the allocated ones up to the fill ratio:
+    size = 2 ** (32 - prefix) - 2
+    for name in pool_names:
+        pool = data["ippools"][name]
+        for _ in range(min(int(size * fill), size - free) -
+                       len(pool["allocated"])):
+            pool["reserved"].append(ip_str(next_ip[name]))
+            next_ip[name] += 1
+    return data
+
+
+def write(data, path, file_format=None):
+    """Save generated data as an inventory file
+
+    Args:
+        data: data returned by generate()
+        path: path of the inventory file
+        file_format: one of fileformat.FORMATS, guessed from path by default
+    """
+    HostnameParser.set_backend_domain(BACKEND_DOMAIN)
+    inventory = InventoryData(path, initialize=True, file_format=file_format)
+    inventory.load_hash(data)
+    inventory.save()
+
+
+def add_arguments(parser):
+    """Add generator parameters to the argparse parser"""
+    for name in ["hosts", "aliases", "groups", "depth", "pools", "free",
+                 "seed"]:
+        parser.add_argument("--" + name, type=int, default=DEFAULTS[name],
+                            help="default: {0}".format(DEFAULTS[name]))
+    parser.add_argument("--fill", type=float, default=DEFAULTS["fill"],
+                        help="fill ratio of ip pools, default: {0}".format(
+                             DEFAULTS["fill"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--format", choices=ff.FORMATS, default=None,
+                        help="guessed from the extension of PATH by default")
+    parser.add_argument("path", metavar="PATH")
+    args = parser.parse_args()
+    params = {x: getattr(args, x) for x in DEFAULTS}
+    write(generate(**params), args.path, args.format)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+"""Time common operations on a synthetic inventory
+
+Results are printed and can be stored as JSON (--output), so that they can be
+compared with the results of other commits (--compare).
+
+Usage: suite.py [options]
+"""
+
+import argparse
+import io
+import json
+import os.path as op
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from ipaddress import ip_network
+
+sys.path.insert(0, op.abspath(op.join(op.dirname(__file__), '..')))
+import inventory_tool.cmdline as cmd
+import inventory_tool.validators as v
+from inventory_tool.object.inventory import InventoryData
+from inventory_tool.object.ippool import IPPool
+import generator
+
+
+class Scenario:
+    """A timed operation
+
+    setup() prepares a fresh state for each run and is not timed, run() takes
+    the state and is the operation being measured.
+    """
+
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def scenarios(args, workdir):
+    params = {x: getattr(args, x) for x in generator.DEFAULTS}
+    # host_add_* scenarios auto-assign addresses of the new hosts from pool000:
+    params["free"] = max(params["free"], args.new_hosts)
+    data = generator.generate(**params)
+    paths = {}
+    for file_format, ext in [("yaml", ".yml"), ("json", ".json")]:
+        paths[file_format] = op.join(workdir, "inventory" + ext)
+        generator.write(data, paths[file_format])
+    save_path = op.join(workdir, "saved.yml")
+
+    def fresh():
+        inventory = InventoryData(save_path, initialize=True)
+        inventory.load_hash(data)
+        return inventory
+
+    def loaded():
+        return InventoryData(paths["yaml"])
+
+    def nearly_full_pool():
+        # Auto-allocation hands out the first free address, keep the free ones
+        # at the end of the network:
+        network = "10.0.0.0/{0}".format(args.pool_prefix)
+        size = 2 ** (32 - args.pool_prefix) - 2
+        taken = size - args.allocations
+        base = 10 << 24
+        allocated = [generator.ip_str(base + 1 + i) for i in range(taken)]
+        return IPPool(network, allocated=allocated)
+
+    def allocate(pool):
+        for _ in range(args.allocations):
+            pool.allocate()
+
+    def add_hosts(inventory):
+        for i in range(args.new_hosts):
+            name = "new{0:04d}.dc0".format(i)
+            inventory.host_add(name)
+            for j in range(args.new_aliases):
+                inventory.host_alias_add(name, "new{0:04d}-{1}.dc0".format(i, j))
+
+    def autoassign_hosts(inventory):
+        keyval = {"key": "ansible_ssh_host", "val": None}
+        for i in range(args.new_hosts):
+            name = "new{0:04d}.dc0".format(i)
+            inventory.host_add(name)
+            inventory.group_host_add("pool000", name)
+            inventory.host_set_vars(name, [dict(keyval)])
+
+    def autoassign_hosts_in_bulk(inventory):
+        inventory.host_add_many(
+            ["new{0:04d}.dc0".format(i) for i in range(args.new_hosts)],
+            groups=["pool000"], data=[{"key": "ansible_ssh_host", "val": None}])
+
+    def find_hosts(inventory):
+        # The first query builds the index of variables:
+        for i in range(args.queries):
+            inventory.host_find("ansible_ssh_port", "2222")
+            inventory.host_find("ansible_ssh_host", network=ip_network(
+                "10.{0}.0.0/24".format(i % 4)))
+
+    def hostnames():
+        inventory = loaded()
+        ret = []
+        for host in inventory.host_get():
+            ret.append(host)
+            ret.extend(inventory.host_get(host).get_aliases())
+        return ret
+
+    def normalize_hostnames(names):
+        # Most of the inventory methods normalize the names they are given,
+        # often the same ones many times over:
+        for _ in range(args.normalizations):
+            for name in names:
+                cmd.HostnameParser.normalize_hostname(name)
+
+    def parse_host_range(unused):
+        # Expands to as many names as there are hosts in the inventory:
+        v.names_source(v.get_fqdn, ranges=True)(
+            "web[1:{0}].".format(args.hosts) + "a-b" * 20)
+
+    def reject_malformed_names(unused):
+        # Near-misses that made the backtracking name regexes run for minutes:
+        for _ in range(args.normalizations):
+            for name in ['a' * 60 + '!', 'a-' * 30 + '!', 'a' * 250 + '-',
+                         '-'.join(['a'] * 126) + '.!']:
+                try:
+                    v.get_fqdn(name)
+                except argparse.ArgumentTypeError:
+                    pass
+            for name in ["a" * 10000 + " ", "-." * 5000 + "!"]:
+                try:
+                    v.get_name(name)
+                except argparse.ArgumentTypeError:
+                    pass
+
+    def rename_hosts(inventory):
+        for host in sorted(inventory.host_get())[:args.renames]:
+            inventory.host_rename(host, "renamed-" + host)
+
+    ret = [
+        Scenario("load_yaml", lambda: paths["yaml"], InventoryData),
+        Scenario("load_json", lambda: paths["json"], InventoryData),
+        Scenario("list", loaded, lambda inventory: cmd.write_ansible_inventory(
+            inventory, io.StringIO(), compact=True)),
+        Scenario("list_limit", loaded, lambda inventory: cmd.write_ansible_inventory(
+            inventory, io.StringIO(), compact=True,
+            limit="group0019:group0018:&pool000:!pool001")),
+        Scenario("normalize_hostnames", hostnames, normalize_hostnames),
+        Scenario("parse_host_range", lambda: None, parse_host_range),
+        Scenario("reject_malformed_names", lambda: None, reject_malformed_names),
+        Scenario("save_yaml", fresh, lambda inventory: inventory.save()),
+        Scenario("recalculate", fresh,
+                 lambda inventory: inventory.recalculate_inventory()),
+        Scenario("allocate_nearly_full_pool", nearly_full_pool, allocate),
+        Scenario("host_add_aliases", fresh, add_hosts),
+        Scenario("host_rename", fresh, rename_hosts),
+        Scenario("host_find", loaded, find_hosts),
+        Scenario("host_add_autoassign", fresh, autoassign_hosts),
+        Scenario("host_add_many_autoassign", fresh, autoassign_hosts_in_bulk),
+    ]
+    if not args.pools:
+        # These need the hosts and the ip pool of pool000 group:
+        ret = [x for x in ret if x.name not in
+               ["list_limit", "host_add_autoassign", "host_add_many_autoassign"]]
+    return ret
+
+
+def measure(scenario, repeat):
+    runs = []
+    for _ in range(repeat):
+        state = scenario.setup()
+        start = time.perf_counter()
+        scenario.run(state)
+        runs.append(time.perf_counter() - start)
+    runs.sort()
+    return {"min": runs[0], "median": runs[len(runs) // 2], "runs": runs}
+
+
+def commit_id():
+    """Return the id of the checked out commit, if it can be determined"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=op.dirname(op.abspath(__file__)),
+            stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    generator.add_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs of each scenario, default: 3")
+    parser.add_argument("--only", default=None, metavar="NAME[,NAME...]",
+                        help="run only selected scenarios")
+    parser.add_argument("--pool-prefix", type=int, default=22,
+                        help="prefix of the nearly full pool, default: 22")
+    parser.add_argument("--allocations", type=int, default=10,
+                        help="auto-allocations from the nearly full pool, " +
+                             "same as the number of its free addresses, " +
+                             "default: 10")
+    parser.add_argument("--new-hosts", type=int, default=20,
+                        help="hosts added by host_add_* scenarios, default: 20")
+    parser.add_argument("--new-aliases", type=int, default=50,
+                        help="aliases of each added host, default: 50")
+    parser.add_argument("--renames", type=int, default=100,
+                        help="hosts renamed by host_rename, default: 100")
+    parser.add_argument("--normalizations", type=int, default=10,
+                        help="passes over all host names and aliases done " +
+                             "by normalize_hostnames, and over malformed " +
+                             "names by reject_malformed_names, default: 10")
+    parser.add_argument("--queries", type=int, default=100,
+                        help="lookups done by host_find, default: 100")
+    parser.add_argument("--output", default=None, metavar="PATH",
+                        help="store results as JSON")
+    parser.add_argument("--compare", default=None, metavar="PATH",
+                        help="compare with results stored by --output")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["results"]
+    only = None if args.only is None else args.only.split(',')
+
+    cmd.HostnameParser.set_backend_domain(generator.BACKEND_DOMAIN)
+    workdir = tempfile.mkdtemp(prefix="inventory-bench-")
+    results = {}
+    try:
+        for scenario in scenarios(args, workdir):
+            if only is not None and scenario.name not in only:
+                continue
+            results[scenario.name] = measure(scenario, args.repeat)
+            line = "{0:<28} {1:9.4f}s".format(scenario.name,
+                                              results[scenario.name]["min"])
+            if baseline is not None and scenario.name in baseline:
+                line += " ({0:.2f}x of baseline)".format(
+                    results[scenario.name]["min"] /
+                    baseline[scenario.name]["min"])
+            print(line)
+    finally:
+        shutil.rmtree(workdir)
+
+    if args.output is not None:
+        params = {x: getattr(args, x) for x in generator.DEFAULTS}
+        params.update({x: getattr(args, x) for x in
+                       ["repeat", "pool_prefix", "allocations", "new_hosts",
+                        "new_aliases", "renames", "queries", "normalizations"]})
+        report = {"commit": commit_id(),
+                  "python": platform.python_version(),
+                  "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                  "parameters": params,
+                  "results": results,
+                  }
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, sort_keys=True, indent=4)
+            fh.write('\n')
+
+
+if __name__ == '__main__':
+    main()
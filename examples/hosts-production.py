@@ -21,6 +21,8 @@ import sys
 backend_domain = 'example.com'
 ipaddress_keywords = ["tunnel_ip", ]
 ipnetwork_keywords = []
+use_journal = False
+storage_backend = 'yaml'
 inventorytool_path = '..'
 inventory_path = '../test/fabric/'
 
@@ -33,7 +35,9 @@ if inventorytool_path is not None:
 import inventory_tool.cmdline as cmd
 
 # Locate the inventory file:
-name = op.basename(sys.argv[0]).split(".")[0] + ".yml"
+extension = {'yaml': '.yml', 'json': '.json', 'binary': '.bin',
+             'sharded': '.d', 'sqlite': '.sqlite'}[storage_backend]
+name = op.basename(sys.argv[0]).split(".")[0] + extension
 inventory_path = op.abspath(op.join(cwd, inventory_path, name))
 
 if __name__ == '__main__':
@@ -42,4 +46,6 @@ if __name__ == '__main__':
              backend_domain=backend_domain,
              extra_ipaddress_keywords=ipaddress_keywords,
              extra_ipnetwork_keywords=ipnetwork_keywords,
+             journal=use_journal,
+             backend=storage_backend,
              )
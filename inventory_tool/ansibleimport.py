@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import argparse
+import ast
+import logging
+import os
+import re
+import shlex
+
+import yaml
+
+import inventory_tool.validators as v
+from inventory_tool.exception import MalformedInputException
+
+# For Python3 < 3.3, ipaddress module is available as an extra module,
+# under a different name:
+try:
+    from ipaddress import ip_address
+    from ipaddress import ip_network
+except ImportError:
+    from ipaddr import IPAddress as ip_address
+    from ipaddr import IPNetwork as ip_network
+
+# Groups that Ansible defines implicitly:
+_IMPLICIT_GROUPS = ["all", "ungrouped"]
+
+# Newer names of the connection variables -> names used by the inventory:
+_RENAMED_VARS = {"ansible_host": "ansible_ssh_host",
+                 "ansible_port": "ansible_ssh_port",
+                 "ansible_user": "ansible_ssh_user",
+                 }
+
+_VARS_EXTENSIONS = ["", ".yml", ".yaml", ".json"]
+
+
+class AnsibleInventory:
+    """Static Ansible inventory read from INI/YAML file and *_vars directories
+
+    Hosts are kept as a hash name -> variables, groups as a hash name ->
+    {"hosts": [...], "children": [...], "vars": {...}}. Variables from
+    host_vars/group_vars directories are merged into the ones from the
+    inventory file, as they take precedence over them.
+    """
+
+    __slots__ = ['hosts', 'groups', 'problems']
+
+    def __init__(self):
+        self.hosts = {}
+        self.groups = {}
+        # Things that could not be parsed, as (object, message) tuples:
+        self.problems = []
+
+    def _group(self, name):
+        if name not in self.groups:
+            self.groups[name] = {"hosts": [], "children": [], "vars": {}}
+        return self.groups[name]
+
+    def _add_host(self, pattern, group, hostvars):
+        try:
+            names = v.expand_ranges(pattern)
+        except argparse.ArgumentTypeError as e:
+            self.problems.append(("host " + pattern, str(e)))
+            return
+        for name in names:
+            self.hosts.setdefault(name, {}).update(hostvars)
+            if group is not None:
+                self._group(group)["hosts"].append(name)
+
+    def read_ini(self, path):
+        """Parse Ansible inventory in INI format
+
+        Values of host variables are parsed as Python literals, just like
+        Ansible does, values of group variables are kept as strings.
+        """
+        group, kind = None, "hosts"
+        with open(path) as fh:
+            for lineno, line in enumerate(fh, 1):
+                line = line.strip()
+                if not line or line[0] in "#;":
+                    continue
+                match = re.match(r'\[([^\]:]+)(?::(\w+))?\]$', line)
+                if match:
+                    group, kind = match.group(1), match.group(2) or "hosts"
+                    if kind not in ["hosts", "children", "vars"]:
+                        msg = "unsupported section type in line {0}".format(lineno)
+                        self.problems.append(("group " + group, msg))
+                    self._group(group)
+                    continue
+                try:
+                    tokens = shlex.split(line, comments=True)
+                except ValueError as e:
+                    msg = "line {0}: {1}".format(lineno, str(e))
+                    self.problems.append((path, msg))
+                    continue
+                if kind == "children":
+                    self._group(group)["children"].append(tokens[0])
+                elif kind == "vars":
+                    key, _, val = line.partition("=")
+                    self._group(group)["vars"][key.strip()] = val.strip()
+                elif kind == "hosts":
+                    hostvars = self._ini_hostvars(tokens, lineno)
+                    self._add_host(tokens[0], group, hostvars)
+
+    def _ini_hostvars(self, tokens, lineno):
+        """Parse variables of the host line, strip the port from the name"""
+        ret = {}
+        # "host:port" form:
+        match = re.match(r'(.*):(\d+)$', tokens[0])
+        if match:
+            tokens[0] = match.group(1)
+            ret["ansible_port"] = int(match.group(2))
+        for token in tokens[1:]:
+            key, sep, val = token.partition("=")
+            if not sep:
+                msg = "line {0}: {1} is not a key=value pair".format(lineno, token)
+                self.problems.append(("host " + tokens[0], msg))
+                continue
+            try:
+                ret[key] = ast.literal_eval(val)
+            except (ValueError, SyntaxError):
+                ret[key] = val
+        return ret
+
+    def read_yaml(self, path):
+        """Parse Ansible inventory in YAML format"""
+        with open(path) as fh:
+            data = yaml.safe_load(fh) or {}
+        for name, group in data.items():
+            self._read_yaml_group(name, group)
+
+    def _read_yaml_group(self, name, data):
+        group = self._group(name)
+        data = data or {}
+        for pattern, hostvars in (data.get("hosts") or {}).items():
+            self._add_host(pattern, name, hostvars or {})
+        group["vars"].update(data.get("vars") or {})
+        for child, child_data in (data.get("children") or {}).items():
+            group["children"].append(child)
+            self._read_yaml_group(child, child_data)
+
+    def read_vars_dirs(self, base_dir):
+        """Merge variables from host_vars/ and group_vars/ directories
+
+        Each host/group may have a file named after it, with optional
+        extension, or a directory with many files.
+        """
+        for dirname in ["host_vars", "group_vars"]:
+            path = os.path.join(base_dir, dirname)
+            if not os.path.isdir(path):
+                continue
+            for entry in sorted(os.listdir(path)):
+                name, ext = os.path.splitext(entry)
+                if ext not in _VARS_EXTENSIONS:
+                    name = entry
+                if dirname == "host_vars" and name in self.hosts:
+                    target = self.hosts[name]
+                elif dirname == "group_vars" and (name in self.groups or
+                                                  name == "all"):
+                    target = self._group(name)["vars"]
+                else:
+                    msg = "variables of an object that is not in the inventory"
+                    self.problems.append((os.path.join(dirname, entry), msg))
+                    continue
+                for data in self._read_vars(os.path.join(path, entry)):
+                    target.update(data)
+
+    def _read_vars(self, path):
+        if os.path.isdir(path):
+            files = [os.path.join(path, x) for x in sorted(os.listdir(path))]
+        else:
+            files = [path]
+        for name in files:
+            with open(name) as fh:
+                data = yaml.safe_load(fh)
+            if data is None:
+                continue
+            if not isinstance(data, dict):
+                self.problems.append((name, "variables are not a mapping"))
+                continue
+            yield data
+
+    def _depths(self):
+        """Number of ancestors of each group, "all" being the root"""
+        ret = {}
+
+        def depth(group, path):
+            if group in ret:
+                return ret[group]
+            parents = [x for x in self.groups if group in
+                       self.groups[x]["children"] and x not in path]
+            ret[group] = 1 + max([depth(x, path + [group]) for x in parents] or
+                                 [0 if group == "all" else 1])
+            return ret[group]
+
+        for group in self.groups:
+            depth(group, [])
+        return ret
+
+    def get_hostvars(self):
+        """Compute final variables of each of the hosts
+
+        Variables of the "all" group come first, then the ones of the groups
+        the host is member of, parents before children, and host variables
+        at the end.
+        """
+        depths = self._depths()
+        members = {}
+
+        def add_members(group, hosts, path):
+            hosts.update(self.groups[group]["hosts"])
+            for child in self.groups[group]["children"]:
+                if child in self.groups and child not in path:
+                    add_members(child, hosts, path + [child])
+
+        for group in self.groups:
+            tmp = set()
+            add_members(group, tmp, [group])
+            members[group] = tmp
+        ret = {}
+        for host in self.hosts:
+            ret[host] = dict(self.groups.get("all", {}).get("vars", {}))
+        for group in sorted(self.groups, key=lambda x: (depths[x], x)):
+            if group == "all":
+                continue
+            for host in members[group]:
+                ret[host].update(self.groups[group]["vars"])
+        for host in self.hosts:
+            ret[host].update(self.hosts[host])
+        return ret
+
+
+def read(path):
+    """Read static Ansible inventory and its *_vars directories
+
+    Args:
+        path: path of the inventory file, in YAML format if its extension is
+            .yml/.yaml/.json, INI otherwise
+
+    Returns:
+        AnsibleInventory object
+    """
+    ret = AnsibleInventory()
+    if os.path.splitext(path)[1] in _VARS_EXTENSIONS[1:]:
+        ret.read_yaml(path)
+    else:
+        ret.read_ini(path)
+    ret.read_vars_dirs(os.path.dirname(os.path.abspath(path)))
+    return ret
+
+
+class Summary:
+    """Result of the import"""
+
+    __slots__ = ['hosts', 'groups', 'aliases', 'addresses', 'conflicts']
+
+    def __init__(self):
+        self.hosts = 0
+        self.groups = 0
+        self.aliases = 0
+        self.addresses = 0
+        # (object, message) tuples:
+        self.conflicts = []
+
+    def __str__(self):
+        ret = "Imported {0} hosts, {1} groups, {2} aliases, ".format(
+            self.hosts, self.groups, self.aliases)
+        ret += "{0} addresses marked as allocated.\n".format(self.addresses)
+        if self.conflicts:
+            ret += "Skipped due to {0} conflicts:\n".format(len(self.conflicts))
+            for obj, msg in self.conflicts:
+                ret += "\t- {0}: {1}\n".format(obj, msg)
+        return ret
+
+
+def _hostname(name):
+    """Normalize host name, None if it is not a valid one"""
+    domain = v.HostnameParser.get_backend_domain()
+    if domain is not None and name.endswith("." + domain):
+        # Ansible does not use trailing dots, the name is absolute anyway:
+        name += "."
+    try:
+        return v.get_fqdn(name)
+    except argparse.ArgumentTypeError:
+        return None
+
+
+class _Importer:
+    """Convert Ansible hosts into data accepted by InventoryData.host_import()"""
+
+    __slots__ = ['_summary', '_taken', '_pools', '_used']
+
+    def __init__(self, inventory, summary):
+        self._summary = summary
+        # Names of the hosts and aliases in use -> host using it:
+        self._taken = {}
+        for host in inventory.host_get():
+            self._taken[host] = host
+            for alias in inventory.host_get(host).get_aliases():
+                self._taken[alias] = host
+        self._pools = [inventory.ippool_get(x) for x in inventory.ippool_get()]
+        # Addresses in use in all of the pools:
+        self._used = set()
+        for pool in self._pools:
+            tmp = pool.get_hash()
+            self._used.update(tmp["allocated"] + tmp["reserved"])
+
+    def host(self, name, hostvars):
+        """Build host data, None if the host can not be imported
+
+        Hosts that end up without a valid ansible_ssh_host variable, which
+        "--list" requires, are skipped as a whole.
+        """
+        host_n = _hostname(name)
+        if host_n is None:
+            self._summary.conflicts.append(("host " + name,
+                                            "not a proper host name"))
+            return None
+        if host_n in self._taken:
+            msg = "name already used by host {0}".format(self._taken[host_n])
+            self._summary.conflicts.append(("host " + host_n, msg))
+            return None
+        # Names and addresses are marked as used only once the host is known
+        # to be imported:
+        taken = set([host_n])
+        addresses = []
+        conflicts = []
+        ret = {"aliases": [], "keyvals": {}}
+        no_address = "ansible_ssh_host variable is not set"
+        for key, val in hostvars.items():
+            if key == "aliases":
+                conflicts.extend(self._aliases(val, taken, ret))
+                continue
+            key = _RENAMED_VARS.get(key, key)
+            if isinstance(val, (list, dict)):
+                # Host variables are kept as strings:
+                msg = "{0} has a structured value, not supported".format(key)
+                conflicts.append(msg)
+                continue
+            val, msg = self._value(key, val, addresses)
+            if msg is not None:
+                conflicts.append(msg)
+                if key == "ansible_ssh_host":
+                    no_address = msg
+            else:
+                ret["keyvals"][key] = val
+        if "ansible_ssh_host" not in ret["keyvals"]:
+            self._summary.conflicts.append(
+                ("host " + host_n, no_address + ", host skipped"))
+            return None
+        self._summary.conflicts.extend(("host " + host_n, x) for x in conflicts)
+        for tmp in taken:
+            self._taken[tmp] = host_n
+        self._used.update(addresses)
+        self._summary.addresses += len(addresses)
+        return ret
+
+    def _aliases(self, aliases, taken, ret):
+        """Add valid aliases to host data, return the problems with the rest"""
+        problems = []
+        if isinstance(aliases, str):
+            aliases = [aliases]
+        for alias in aliases:
+            alias_n = _hostname(str(alias))
+            if alias_n is None:
+                problems.append("{0} is not a proper alias".format(alias))
+            elif alias_n in self._taken:
+                problems.append("alias {0} is already used by host {1}".format(
+                    alias_n, self._taken[alias_n]))
+            elif alias_n in taken:
+                problems.append("alias {0} is used twice".format(alias_n))
+            else:
+                taken.add(alias_n)
+                ret["aliases"].append(alias_n)
+        return problems
+
+    def _value(self, key, val, addresses):
+        """Validate value of the variable
+
+        Args:
+            key: name of the variable
+            val: value of the variable
+            addresses: list of addresses from the ip pools that the host
+                uses, updated with the address from the value
+
+        Returns:
+            A tuple (value, problem), with problem set to None if the value
+            is valid.
+        """
+        kw = v.KeyWordValidator
+        try:
+            if kw.is_ipaddress_keyword(key):
+                ip = ip_address(str(val))
+                if str(ip) in self._used or str(ip) in addresses:
+                    msg = "{0} {1} is already allocated or reserved"
+                    return None, msg.format(key, ip)
+                if any(ip in x for x in self._pools):
+                    addresses.append(str(ip))
+                return str(ip), None
+            elif kw.is_ipnetwork_keyword(key):
+                return str(ip_network(str(val))), None
+            elif kw.is_integer_keyword(key):
+                return int(val), None
+        except ValueError:
+            return None, "{0} is not a proper value of {1}".format(val, key)
+        return val, None
+
+
+def import_inventory(inventory, source):
+    """Add hosts and groups of Ansible inventory to the inventory
+
+    Hosts that already exist, and aliases and addresses already in use, are
+    skipped and reported as conflicts. Variables of Ansible groups are copied
+    to their member hosts, as the inventory keeps variables only on hosts.
+
+    Args:
+        inventory: inventory object
+        source: AnsibleInventory object
+
+    Returns:
+        Summary object.
+    """
+    summary = Summary()
+    summary.conflicts.extend(source.problems)
+
+    groups = {}
+    existing = set(inventory.group_get())
+    for group in source.groups:
+        if group in _IMPLICIT_GROUPS:
+            continue
+        try:
+            groups[group] = v.get_name(group)
+        except argparse.ArgumentTypeError:
+            summary.conflicts.append(("group " + group,
+                                      "not a proper group name"))
+
+    importer = _Importer(inventory, summary)
+    hostvars = source.get_hostvars()
+    hosts = {}
+    names = {}
+    for host in sorted(source.hosts):
+        data = importer.host(host, hostvars[host])
+        if data is not None:
+            names[host] = _hostname(host)
+            hosts[names[host]] = data
+            summary.aliases += len(data["aliases"])
+    logging.debug("Importing {0} hosts".format(len(hosts)))
+    inventory.host_import(hosts)
+    summary.hosts = len(hosts)
+
+    for group in sorted(groups):
+        if group not in existing:
+            inventory.group_add(group)
+            summary.groups += 1
+    for group in sorted(groups):
+        children = inventory.group_get(group).get_children()
+        for child in source.groups[group]["children"]:
+            if child in groups and child not in children:
+                inventory.group_child_add(group, child)
+                children.append(child)
+        members = set(inventory.group_get(group).get_hosts())
+        for host in source.groups[group]["hosts"]:
+            if host in names and names[host] not in members:
+                inventory.group_host_add(group, names[host])
+                members.add(names[host])
+    return summary
+
+
+def load(path):
+    """Read Ansible inventory, reporting unreadable files uniformly
+
+    Raises:
+        MalformedInputException: inventory or variables can not be read
+    """
+    try:
+        return read(path)
+    except (IOError, yaml.YAMLError, UnicodeDecodeError) as e:
+        msg = "Failed to read Ansible inventory {0}: {1}".format(path, str(e))
+        raise MalformedInputException(msg) from e
@@ -14,23 +14,200 @@
 # License for the specific language governing permissions and limitations under
 # the License.
 
-import argparse
+import atexit
+import collections
 import json
 import logging
-import logging.handlers
+import os
 import sys
-import yaml
+import time
+import types
 
 import inventory_tool
-from inventory_tool.exception import ScriptException
+import inventory_tool.profiling as prof
+import inventory_tool.stats as st
+from inventory_tool.exception import MalformedInputException, ScriptException
+from inventory_tool.fileformat import FORMATS, guess_format
+from inventory_tool.lock import InventoryLock, get_file_signature
 from inventory_tool.object.host import Host
 from inventory_tool.object.inventory import InventoryData
+from inventory_tool.session import open_inventory
 from inventory_tool.validators import KeyWordValidator, HostnameParser
 from inventory_tool.validators import get_name, get_ippool, get_ipaddr, get_fqdn, get_keyval
+from inventory_tool.validators import get_condition, get_count, names_list, names_source
+
+# Modules that are slow to import (argparse, yaml, sqlite3...) are imported
+# only when needed, as Ansible calls the script with "--list" for each run
+# and the startup time adds up.
+
+
+class _AnsibleArgs(types.SimpleNamespace):
+    """Command line configuration of "--list" and "--host" calls
+
+    Compatible with argparse.Namespace as far as main() is concerned.
+    """
+
+    def __init__(self, **kwargs):
+        defaults = {"verbose": False,
+                    "initialize_inventory": False,
+                    "std_err": False,
+                    "list": False,
+                    "list_limit": None,
+                    "groups": None,
+                    "vars": None,
+                    "host": None,
+                    "compact_json": None,
+                    "profile": False,
+                    "profile_dump": None,
+                    "subcommand": None,
+                    }
+        defaults.update(kwargs)
+        super().__init__(**defaults)
+
+    def __contains__(self, key):
+        return key in self.__dict__
+
+
+def _yaml_errors():
+    """Return the base class of PyYAML exceptions, if PyYAML is in use at all
+
+    Inventories that are not kept in YAML do not need it, and importing it
+    only in order to catch its exceptions would be a waste of time.
+    """
+    yaml = sys.modules.get('yaml')
+    return () if yaml is None else yaml.YAMLError
+
+
+def _json_encoder(compact):
+    """Build JSON encoder for the output of the script
+
+    Args:
+        compact: emit minimal separators only, indent by 4 spaces otherwise
+    """
+    if compact:
+        return json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+    return json.JSONEncoder(sort_keys=True, indent=4, separators=(',', ': '))
+
+
+def write_ansible_inventory(inventory, stream, compact=False, limit=None,
+                            groups=None, keys=None):
+    """Write "--list" output, one host at a time
+
+    Output is the same as json.dumps() of inventory.get_ansible_inventory()
+    would give, but variables of each host are encoded and written as soon as
+    they are fetched, so huge inventories do not need to be held in memory
+    twice. The hosts are checked before anything is written, so a malformed
+    one does not leave half of the document in the stream.
+
+    Args:
+        inventory: inventory object
+        stream: file object to write to
+        compact: emit minimal separators only, indent by 4 spaces otherwise
+        limit: Ansible host pattern, only the hosts matching it (and the
+            groups they belong to) are written
+        groups: names of the groups to write, together with their child
+            groups. Other groups and hosts not belonging to any of them are
+            left out.
+        keys: names of the variables to write, other variables of the hosts
+            are left out
+    """
+    encoder = _json_encoder(compact)
+    key_sep = ':' if compact else ': '
+
+    def indent(level):
+        return '' if compact else '\n' + ' ' * 4 * level
+
+    def write(value, level):
+        # Single host/group is small enough to be encoded in one go, which
+        # lets json use its C accelerated encoder. JSON strings can not
+        # contain raw newlines, so nested values can be indented by prefixing
+        # each line of encoder's output:
+        chunk = encoder.encode(value)
+        stream.write(chunk if compact else chunk.replace('\n', indent(level)))
+
+    def write_key(key, level, first):
+        stream.write(('' if first else ',') + indent(level) + json.dumps(key) +
+                     key_sep)
+
+    names = groups
+    groups = inventory.get_ansible_groups()
+    groups.pop("_meta", None)
+    hosts = None
+    if limit is not None or names is not None:
+        import inventory_tool.pattern as pt
+        index = pt.HostPatternIndex(groups)
+        bits = index.group_bits("all") if limit is None else index.evaluate(limit)
+        if names is not None:
+            names = index.subtree(names)
+            tmp = 0
+            for group in names:
+                tmp |= index.group_bits(group)
+            bits &= tmp
+        groups = index.limit_groups(bits, names)
+        hosts = groups["all"]["hosts"]
+    if keys is not None:
+        keys = frozenset(keys)
+    inventory.check_ansible_hosts(hosts=hosts)
+    stream.write('{')
+    for i, key in enumerate(sorted(list(groups) + ["_meta"])):
+        write_key(key, 1, i == 0)
+        if key != "_meta":
+            write(groups[key], 1)
+            continue
+        stream.write('{')
+        write_key("hostvars", 2, True)
+        stream.write('{')
+        empty = True
+        for host, hostvars in inventory.iter_ansible_hostvars(hosts=hosts):
+            if keys is not None:
+                hostvars = {x: hostvars[x] for x in hostvars if x in keys}
+            write_key(host, 3, empty)
+            write(hostvars, 3)
+            empty = False
+        stream.write(('}' if empty else indent(2) + '}') + indent(1) + '}')
+    stream.write(indent(0) + '}\n')
+
+
+def _show_objects(getter, names, config, compact_json, render=str):
+    """Print objects requested by -s/--show option
+
+    All the objects are fetched before anything is printed, so a missing one
+    does not leave the output half-written. A single object is printed just
+    like it always was, many - each one preceded by its name.
+
+    Args:
+        getter: inventory method fetching objects, i.e. host_get
+        names: a list of names given by -n option, if any
+        config: parsed command line
+        compact_json: format of JSON output
+        render: function converting an object into human-readable form
+
+    Raises:
+        MalformedInputException: no objects have been requested, or some of
+            them do not exist
+    """
+    if config.show_all:
+        names = sorted(getter())
+    else:
+        names = ([] if names is None else list(names)) + config.show
+    if not names:
+        msg = "Names of the objects to show or --all option are required"
+        raise MalformedInputException(msg)
+    objs = [(x, getter(x)) for x in names]
+    if config.json:
+        print(_json_encoder(compact_json).encode(
+            {x: y.get_hash() for x, y in objs}))
+    elif len(objs) == 1 and not config.show_all:
+        print(render(objs[0][1]))
+    else:
+        for x, y in objs:
+            print(x + ":")
+            print(render(y))
 
 
 def main(args, inventory_path, backend_domain, extra_ipaddress_keywords=[],
-         extra_ipnetwork_keywords=[], extra_integer_keywords=[]):
+         extra_ipnetwork_keywords=[], extra_integer_keywords=[], journal=False,
+         backend='yaml'):
     """Main body of the inventory tool
 
     This function takes care of routing of parsed command line arguments to
@@ -39,7 +216,12 @@ def main(args, inventory_path, backend_domain, extra_ipaddress_keywords=[],
 
     Args:
         inventory_path: name of the inventory file to use
+        journal: append changes to the journal file instead of re-writing the
+            whole inventory each time. Only single-file backends support it.
+        backend: storage backend, either 'yaml', 'json', 'binary', 'sharded'
+            or 'sqlite'
     """
+    started = (time.perf_counter(), time.process_time())
 
     if not backend_domain:
         msg = "Backend domain parameter needs to be provided. "
@@ -54,6 +236,18 @@ def main(args, inventory_path, backend_domain, extra_ipaddress_keywords=[],
 
     config = parse_commandline(script_path=args[0], commandline=args[1:])
 
+    if config.profile_dump is not None:
+        pstats_path = config.profile_dump
+    elif config.profile:
+        pstats_path = ""
+    else:
+        pstats_path = prof.parse_env(os.environ.get(prof.ENV_VARIABLE))
+    if pstats_path is not None:
+        # The summary is printed no matter how the script exits:
+        prof.start(pstats_path=pstats_path or None).record("command line",
+                                                           started)
+        atexit.register(prof.stop)
+
     # Setup some basic logging:
     logger = logging.getLogger()
     if not config.std_err:
@@ -78,30 +272,74 @@ def main(args, inventory_path, backend_domain, extra_ipaddress_keywords=[],
     logging.debug("{0} is starting, config: {1}, inventory_path: {2}".format(
                   __file__, str(config), inventory_path))
 
+    lock = InventoryLock(inventory_path)
+    signature = None
+    if backend == 'sharded':
+        from inventory_tool.object.shardedinventory import MANIFEST_NAME
+        # Manifest is re-written each time any of the shards changes:
+        signature_path = os.path.join(inventory_path, MANIFEST_NAME)
+    else:
+        signature_path = inventory_path
     try:
+        # Subcommands modify the inventory basing on its current contents, so
+        # the whole load-modify-save cycle needs to be serialized. Otherwise
+        # i.e. two concurrent ip auto-assignements could hand out the same
+        # address. --list/--host only remember which version of the file they
+        # have read.
+        read_only = config.list or config.host is not None or \
+            config.subcommand in ['stats', 'query']
+        with prof.phase("lock"):
+            if read_only and not config.initialize_inventory:
+                signature = get_file_signature(signature_path)
+            else:
+                lock.acquire()
+
         # Initialize our main data object:
+        prof.begin("load")
         try:
             # initialize=False shares the same path for simplicity's sake, even
             # though it does not drop any exception.
-            inventory = InventoryData(inventory_path,
-                                      initialize=config.initialize_inventory)
+            inventory = open_inventory(inventory_path, backend,
+                                        initialize=config.initialize_inventory,
+                                        journal=journal)
         except IOError as e:
             logging.error("Failed to open inventory file {0}: {1}".format(
                           inventory_path, str(e)))
             sys.exit(1)
-        except yaml.YAMLError as e:
+        except _yaml_errors() as e:
             logging.error("Inventory file {0} is not a proper YAML document: {1}".format(
                           inventory_path, str(e)))
             sys.exit(1)
+        prof.end()
 
         # Do some stuff:
         save_data = False
+        compact = False
+
+        # Whitespace only makes the output bigger for Ansible:
+        compact_json = config.compact_json
+        if compact_json is None:
+            compact_json = not sys.stdout.isatty()
+
+        if config.list:
+            prof.begin("list")
+        elif config.host is not None:
+            prof.begin("host")
+        else:
+            prof.begin(config.subcommand or "command")
 
         if config.list:
             logging.debug("Dumping whole inventory to Json")
-            res = inventory.get_ansible_inventory()
+            write_ansible_inventory(inventory, sys.stdout, compact=compact_json,
+                                    limit=config.list_limit,
+                                    groups=config.groups, keys=config.vars)
             save_data = inventory.is_recalculated()
-            print(json.dumps(res, sort_keys=True, indent=4, separators=(',', ': ')))
+        elif config.host is not None:
+            logging.debug("Dumping variables of host {0} to Json".format(
+                          config.host))
+            res = inventory.get_ansible_hostvars(config.host)
+            save_data = inventory.is_recalculated()
+            print(_json_encoder(compact_json).encode(res))
         elif 'subcommand' in config and config.subcommand == 'ippool':
             if any([config.add, config.assign, config.revoke, config.book,
                     config.cancel]):
@@ -128,10 +366,14 @@ def main(args, inventory_path, backend_domain, extra_ipaddress_keywords=[],
             elif config.delete:
                 inventory.ippool_del(pool=config.ippool_name)
                 save_data = True
-            elif config.show:
-                # Detailed info about ippool
-                data = inventory.ippool_get(pool=config.ippool_name)
-                print(str(data))
+            elif config.show is not None:
+                # Detailed info about ippools
+                _show_objects(inventory.ippool_get,
+                              None if config.ippool_name is None else
+                              [config.ippool_name], config, compact_json,
+                              lambda x: x.describe(free=config.free,
+                                                   limit=config.limit,
+                                                   offset=config.offset))
             elif config.list_all:
                 # Just list the names of available ippools
                 data = inventory.ippool_get()
@@ -140,32 +382,30 @@ def main(args, inventory_path, backend_domain, extra_ipaddress_keywords=[],
         elif 'subcommand' in config and config.subcommand == 'group':
             if any([config.add, config.child_add, config.child_del,
                     config.host_add, config.host_del]):
-                if config.add:
-                    inventory.group_add(group=config.group_name)
-                    save_data = True
-                if config.child_add is not None:
-                    inventory.group_child_add(group=config.group_name,
-                                              child=config.child_add)
-                    save_data = True
-                if config.child_del is not None:
-                    inventory.group_child_del(group=config.group_name,
-                                              child=config.child_del)
-                    save_data = True
-                if config.host_add is not None:
-                    inventory.group_host_add(group=config.group_name,
-                                             host=config.host_add)
-                    save_data = True
-                if config.host_del is not None:
-                    inventory.group_host_del(group=config.group_name,
-                                             host=config.host_del)
-                    save_data = True
+                for group in config.group_name:
+                    if config.add:
+                        inventory.group_add(group=group)
+                    if config.child_add is not None:
+                        inventory.group_child_add(group=group,
+                                                  child=config.child_add)
+                    if config.child_del is not None:
+                        inventory.group_child_del(group=group,
+                                                  child=config.child_del)
+                    if config.host_add is not None:
+                        inventory.group_host_add(group=group,
+                                                 host=config.host_add)
+                    if config.host_del is not None:
+                        inventory.group_host_del(group=group,
+                                                 host=config.host_del)
+                save_data = True
             elif config.delete:
-                inventory.group_del(group=config.group_name)
+                for group in config.group_name:
+                    inventory.group_del(group=group)
                 save_data = True
-            elif config.show:
-                # Detailed info about group
-                data = inventory.group_get(group=config.group_name)
-                print(str(data))
+            elif config.show is not None:
+                # Detailed info about groups
+                _show_objects(inventory.group_get, config.group_name, config,
+                              compact_json)
             elif config.list_all:
                 # Just list the names of available groups
                 data = inventory.group_get()
@@ -176,45 +416,131 @@ def main(args, inventory_path, backend_domain, extra_ipaddress_keywords=[],
                     config.alias_add, config.alias_del, config.group_add,
                     config.group_del]):
                 if config.add:
-                    inventory.host_add(host=config.host_name)
-                    save_data = True
-                if config.group_add is not None:
-                    for group in config.group_add:
-                        inventory.group_host_add(host=config.host_name,
-                                                 group=group)
-                    save_data = True
-                if config.group_del is not None:
-                    for group in config.group_del:
-                        inventory.group_host_del(host=config.host_name,
-                                                 group=group)
-                    save_data = True
-                if config.var_set is not None:
-                    inventory.host_set_vars(host=config.host_name,
-                                            data=config.var_set)
-                    save_data = True
-                if config.var_del is not None:
-                    inventory.host_del_vars(host=config.host_name,
-                                            keys=config.var_del)
-                    save_data = True
-                if config.alias_add is not None:
-                    inventory.host_alias_add(host=config.host_name,
-                                             alias=config.alias_add)
-                    save_data = True
-                if config.alias_del is not None:
-                    inventory.host_alias_del(host=config.host_name,
-                                             alias=config.alias_del)
-                    save_data = True
+                    # New hosts get their groups and variables in bulk, so
+                    # that the ip pools are scanned only once:
+                    inventory.host_add_many(hosts=config.host_name,
+                                            groups=config.group_add or [],
+                                            data=config.var_set or [])
+                for host in config.host_name:
+                    if config.group_add is not None and not config.add:
+                        for group in config.group_add:
+                            inventory.group_host_add(host=host, group=group)
+                    if config.group_del is not None:
+                        for group in config.group_del:
+                            inventory.group_host_del(host=host, group=group)
+                    if config.var_set is not None and not config.add:
+                        # host_set_vars() stores auto-assigned addresses in
+                        # the data it gets, each host needs its own copy:
+                        inventory.host_set_vars(
+                            host=host, data=[dict(x) for x in config.var_set])
+                    if config.var_del is not None:
+                        inventory.host_del_vars(host=host, keys=config.var_del)
+                    if config.alias_add is not None:
+                        inventory.host_alias_add(host=host,
+                                                 alias=config.alias_add)
+                    if config.alias_del is not None:
+                        inventory.host_alias_del(host=host,
+                                                 alias=config.alias_del)
+                save_data = True
             elif config.delete:
-                inventory.host_del(host=config.host_name)
+                for host in config.host_name:
+                    inventory.host_del(host=host)
                 save_data = True
-            elif config.show:
-                # Detailed info about host
-                data = inventory.host_get(host=config.host_name)
-                print(str(data))
+            elif config.show is not None:
+                # Detailed info about hosts
+                _show_objects(inventory.host_get, config.host_name, config,
+                              compact_json)
+            elif config.where is not None:
+                hosts = None
+                for condition in config.where:
+                    tmp = inventory.host_find(**condition)
+                    if hosts is not None:
+                        tmp = set(tmp)
+                        tmp = [x for x in hosts if x in tmp]
+                    hosts = tmp
+                for host in hosts:
+                    print(host)
             elif config.list_all:
                 data = inventory.host_get()
                 for key in data:
                     print(key)
+        elif 'subcommand' in config and config.subcommand == 'compact':
+            logging.debug("Folding the journal into the inventory file")
+            save_data = compact = True
+        elif 'subcommand' in config and config.subcommand in ['export-yaml',
+                                                              'import-yaml']:
+            if backend in FORMATS:
+                msg = "{0} is not supported by the {1} storage backend, use convert"
+                raise MalformedInputException(msg.format(config.subcommand,
+                                                         backend))
+            try:
+                if config.subcommand == 'export-yaml':
+                    logging.debug("Exporting inventory to " + config.path)
+                    inventory.export_yaml(config.path)
+                else:
+                    logging.debug("Importing inventory from " + config.path)
+                    inventory.import_yaml(config.path)
+                    save_data = True
+            except (IOError, _yaml_errors()) as e:
+                logging.error("Failed to process YAML file {0}: {1}".format(
+                              config.path, str(e)))
+                sys.exit(1)
+        elif 'subcommand' in config and config.subcommand == 'import-ansible':
+            import inventory_tool.ansibleimport as ai
+            logging.debug("Importing Ansible inventory from " + config.path)
+            summary = ai.import_inventory(inventory, ai.load(config.path))
+            save_data = True
+            sys.stdout.write(str(summary))
+        elif 'subcommand' in config and config.subcommand == 'convert':
+            file_format = config.format or guess_format(config.path)
+            logging.debug("Writing {0} copy of the inventory to {1}".format(
+                          file_format, config.path))
+            converted = InventoryData(config.path, initialize=True,
+                                      file_format=file_format)
+            converted.load_hash(inventory.get_hash())
+            try:
+                converted.save()
+            except IOError as e:
+                logging.error("Failed to save inventory file {0}: {1}".format(
+                              config.path, str(e)))
+                sys.exit(1)
+        elif 'subcommand' in config and config.subcommand == 'query':
+            import inventory_tool.pattern as pt
+            index = pt.HostPatternIndex(inventory.get_ansible_groups())
+            save_data = inventory.is_recalculated()
+            for host in index.match(config.pattern):
+                print(host)
+        elif 'subcommand' in config and config.subcommand == 'stats':
+            stats = st.collect(inventory, inventory_path, top=config.top)
+            save_data = inventory.is_recalculated()
+            if config.textfile is not None:
+                try:
+                    st.write_textfile(config.textfile,
+                                      st.format_prometheus(stats))
+                except IOError as e:
+                    logging.error("Failed to write metrics to {0}: {1}".format(
+                                  config.textfile, str(e)))
+                    sys.exit(1)
+            elif config.format == 'json':
+                print(_json_encoder(compact_json).encode(stats))
+            elif config.format == 'prometheus':
+                sys.stdout.write(st.format_prometheus(stats))
+            else:
+                sys.stdout.write(st.format_human(stats))
+        prof.end()
+
+        # Make sure that we are not going to overwrite changes made by other
+        # process in the meantime - if the file has changed, re-read it:
+        if save_data and not lock.is_locked():
+            lock.acquire()
+            if get_file_signature(signature_path) != signature:
+                logging.info("Inventory has been modified by other process, " +
+                             "re-reading it.")
+                inventory.close()
+                with prof.phase("load"):
+                    inventory = open_inventory(inventory_path, backend,
+                                                journal=journal)
+                save_data = inventory.is_recalculated()
     except ScriptException as e:
         logging.error(str(e))
         sys.exit(1)
@@ -222,11 +548,14 @@ def main(args, inventory_path, backend_domain, extra_ipaddress_keywords=[],
     # Write updated inventory back, if necessary:
     if save_data or config.initialize_inventory:
         try:
-            inventory.save()
+            with prof.phase("save"):
+                inventory.save(compact=compact)
         except IOError as e:
             logging.error("Failed to save inventory file " +
                           "{0}: {1}".format(inventory_path, str(e)))
             sys.exit(1)
+    inventory.close()
+    lock.release()
     sys.exit(0)
 
 
@@ -244,6 +573,13 @@ def parse_commandline(script_path, commandline):
         A Namespace object that contains variables set according to the
         command line parameters passed in "commandline" param.
     """
+    # Calls made by Ansible itself do not need the full blown parser:
+    if commandline == ["--list"]:
+        return _AnsibleArgs(list=True)
+    if len(commandline) == 2 and commandline[0] == "--host":
+        return _AnsibleArgs(host=commandline[1])
+
+    import argparse
     parser = argparse.ArgumentParser(
         description='Dynamic inventory script for {0}.'.format(script_path),
         epilog="Author: Pawel Rozlach <pawel.rozlach@brainly.com>",
@@ -272,6 +608,61 @@ def parse_commandline(script_path, commandline):
         action='store_true',
         default=False,
         help="Dump all inventory data in JSON (used by Ansible itself).")
+    parser.add_argument(
+        "--host",
+        action='store',
+        default=None,
+        help="Dump variables of given host in JSON (used by Ansible itself).")
+    parser.add_argument(
+        "--limit",
+        action='store',
+        dest="list_limit",
+        default=None,
+        metavar="PATTERN",
+        help="With --list, dump only the hosts matching Ansible host " +
+             "pattern, i.e. 'web:&prod:!canary', and their groups.")
+    parser.add_argument(
+        "--groups",
+        action='store',
+        type=names_list(get_name),
+        default=None,
+        metavar="GROUP[,GROUP...]",
+        help="With --list, dump only given groups, their child groups and " +
+             "their hosts.")
+    parser.add_argument(
+        "--vars",
+        action='store',
+        type=names_list(get_name),
+        default=None,
+        metavar="KEY[,KEY...]",
+        help="With --list, dump only given variables of the hosts.")
+    mutexgroup_json = parser.add_mutually_exclusive_group()
+    mutexgroup_json.add_argument(
+        "--compact",
+        action='store_true',
+        dest='compact_json',
+        default=None,
+        help="Print JSON without any whitespace, default if stdout is not a tty.")
+    mutexgroup_json.add_argument(
+        "--pretty",
+        action='store_false',
+        dest='compact_json',
+        default=None,
+        help="Print JSON indented, default if stdout is a tty.")
+    parser.add_argument(
+        "--profile",
+        action='store_true',
+        help="Print time and memory usage of each phase of the run to " +
+             "stderr. Setting {0} environment variable ".format(prof.ENV_VARIABLE) +
+             "to 1 does the same, i.e. for calls made by Ansible.")
+    parser.add_argument(
+        "--profile-dump",
+        action='store',
+        default=None,
+        metavar="PATH",
+        help="Like --profile, but also dump cProfile statistics to PATH. " +
+             "Setting {0} environment variable to the ".format(prof.ENV_VARIABLE) +
+             "path does the same.")
 
     # HACK, HACK, HACK!
     # This fragment makes my eyes bleed, but unfortunatelly, argparse has
@@ -339,14 +730,47 @@ def parse_commandline(script_path, commandline):
     mutexgroup_ippool = parser_ippool.add_mutually_exclusive_group(required=False)
     mutexgroup_ippool.add_argument(
         "-s", "--show",
-        action="store_true",
-        default=False,
-        help="Detailed information about IP pool.",)
+        action="store",
+        nargs="*",
+        type=get_name,
+        default=None,
+        metavar="ippool",
+        help="Detailed information about IP pools: given ones, the one " +
+             "selected by -n/--ippool-name or all of them (--all).",)
     mutexgroup_ippool.add_argument(
         "-l", "--list-all",
         action="store_true",
         default=False,
         help="List available IP pools.",)
+    parser_ippool.add_argument(
+        "--all",
+        action="store_true",
+        dest="show_all",
+        default=False,
+        help="With -s/--show, show all the IP pools.",)
+    parser_ippool.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="With -s/--show, print the data in JSON.",)
+    parser_ippool.add_argument(
+        "--free",
+        action="store_true",
+        default=False,
+        help="With -s/--show, list free address ranges instead of the " +
+             "allocated and reserved ones.",)
+    parser_ippool.add_argument(
+        "--limit",
+        action="store",
+        type=get_count,
+        default=None,
+        help="With -s/--show, list at most this many ranges of each kind.",)
+    parser_ippool.add_argument(
+        "--offset",
+        action="store",
+        type=get_count,
+        default=0,
+        help="With -s/--show, skip this many ranges of each kind.",)
 
     # Group related
     parser_group = subparsers.add_parser("group",
@@ -354,8 +778,12 @@ def parse_commandline(script_path, commandline):
     parser_group.add_argument(
         "-n", "--group-name",
         action='store',
-        type=get_name,
-        help="Name of the group to work with.")
+        type=names_source(get_name),
+        nargs="+",
+        metavar="group",
+        help="Name(s) of the group(s) to work with, @path to read them from " +
+             "a file (one per line), or - to read them from stdin. All " +
+             "the groups are modified at once, or none if any of them fails.")
     parser_group.add_argument(
         "-a", "--add",
         action="store_true",
@@ -393,14 +821,29 @@ def parse_commandline(script_path, commandline):
     mutexgroup_group = parser_group.add_mutually_exclusive_group(required=False)
     mutexgroup_group.add_argument(
         "-s", "--show",
-        action="store_true",
-        default=False,
-        help="Show group's children and member hosts.",)
+        action="store",
+        nargs="*",
+        type=get_name,
+        default=None,
+        metavar="group",
+        help="Show children and member hosts of groups: given ones, the " +
+             "one selected by -n/--group-name or all of them (--all).",)
     mutexgroup_group.add_argument(
         "-l", "--list-all",
         action='store_true',
         default=False,
         help="List all available groups.")
+    parser_group.add_argument(
+        "--all",
+        action="store_true",
+        dest="show_all",
+        default=False,
+        help="With -s/--show, show all the groups.",)
+    parser_group.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="With -s/--show, print the data in JSON.",)
 
     # Host related
     parser_host = subparsers.add_parser("host",
@@ -408,8 +851,13 @@ def parse_commandline(script_path, commandline):
     parser_host.add_argument(
         "-n", "--host-name",
         action='store',
-        type=get_fqdn,
-        help="Name of the host to work with.")
+        type=names_source(get_fqdn, ranges=True),
+        nargs="+",
+        metavar="host",
+        help="Name(s) of the host(s) to work with, @path to read them from " +
+             "a file (one per line), or - to read them from stdin. Numeric " +
+             "ranges are expanded, i.e. web[001:250].dc1. All the hosts " +
+             "are modified at once, or none if any of them fails.")
     parser_host.add_argument(
         "-a", "--add",
         action="store_true",
@@ -464,36 +912,176 @@ def parse_commandline(script_path, commandline):
     mutexgroup_host = parser_host.add_mutually_exclusive_group(required=False)
     mutexgroup_host.add_argument(
         "-s", "--show",
-        action="store_true",
-        default=False,
-        help="Show hosts data.",)
+        action="store",
+        nargs="*",
+        type=get_fqdn,
+        default=None,
+        metavar="host",
+        help="Show data of hosts: given ones, the one selected by " +
+             "-n/--host-name or all of them (--all).",)
     mutexgroup_host.add_argument(
         "-l", "--list-all",
         action="store_true",
         default=False,
         help="List all hosts.",)
+    mutexgroup_host.add_argument(
+        "-w", "--where",
+        action="append",
+        type=get_condition,
+        default=None,
+        metavar="key=val|key~network",
+        help="List the hosts which variable has given value, or is an ip " +
+             "address from given network, i.e. tunnel_ip~10.9.0.0/16. Given " +
+             "many times, hosts need to meet all the conditions.",)
+    parser_host.add_argument(
+        "--all",
+        action="store_true",
+        dest="show_all",
+        default=False,
+        help="With -s/--show, show all the hosts.",)
+    parser_host.add_argument(
+        "--json",
+        action="store_true",
+        default=False,
+        help="With -s/--show, print the data in JSON.",)
+
+    # Journal related
+    subparsers.add_parser("compact",
+                          help="Fold the journal into the inventory file.")
+
+    # Conversion between storage backends
+    parser_export = subparsers.add_parser(
+        "export-yaml",
+        help="Save the inventory as a single, human-readable YAML file.")
+    parser_export.add_argument(
+        "path",
+        action="store",
+        help="Path of the YAML file.",)
+    parser_import = subparsers.add_parser(
+        "import-yaml",
+        help="Replace the inventory with the contents of a YAML file.")
+    parser_import.add_argument(
+        "path",
+        action="store",
+        help="Path of the YAML file.",)
+    parser_import_ansible = subparsers.add_parser(
+        "import-ansible",
+        help="Add hosts and groups from a static Ansible inventory.")
+    parser_import_ansible.add_argument(
+        "path",
+        action="store",
+        help="Path of the INI or YAML (.yml/.yaml/.json) inventory file. " +
+             "host_vars/ and group_vars/ directories next to it are read " +
+             "as well.",)
+    parser_convert = subparsers.add_parser(
+        "convert",
+        help="Save a copy of the inventory as a single file in given format.")
+    parser_convert.add_argument(
+        "path",
+        action="store",
+        help="Path of the file.",)
+    parser_convert.add_argument(
+        "--format",
+        action="store",
+        choices=FORMATS,
+        default=None,
+        help="Format of the file, guessed from its extension by default.",)
+
+    # Host patterns
+    parser_query = subparsers.add_parser(
+        "query",
+        help="List the hosts matching Ansible host pattern.")
+    parser_query.add_argument(
+        "--pattern",
+        action="store",
+        required=True,
+        help="Ansible host pattern, i.e. 'web:&prod:!canary'.",)
+
+    # Statistics
+    parser_stats = subparsers.add_parser(
+        "stats",
+        help="Show ip pools usage and inventory statistics.")
+    parser_stats.add_argument(
+        "--format",
+        action="store",
+        choices=st.FORMATS,
+        default="human",
+        help="Output format, 'prometheus' is the text exposition format.",)
+    parser_stats.add_argument(
+        "--textfile",
+        action="store",
+        default=None,
+        metavar="PATH",
+        help="Write the statistics in Prometheus format to PATH, i.e. for " +
+             "node_exporter's textfile collector, instead of printing them.",)
+    parser_stats.add_argument(
+        "--top",
+        action="store",
+        type=int,
+        default=10,
+        help="Number of the largest groups to show.",)
 
     args = parser.parse_args(commandline)
 
     # Quick fix for things imposible with argparse:
-    if (not (args.list or args.initialize_inventory)) and args.subcommand is None:
+    if (not (args.list or args.host is not None or args.initialize_inventory)) and \
+            args.subcommand is None:
         print("Nothing to do, please define one of subcommands or use" +
-              "-i/--initialize-inventory/--list switch.", file=sys.stderr)
+              "-i/--initialize-inventory/--list/--host switch.", file=sys.stderr)
+        sys.exit(1)
+    for name, dest in [("limit", "list_limit"), ("groups", "groups"),
+                       ("vars", "vars")]:
+        if getattr(args, dest) is not None and not args.list:
+            print("--{0} requires --list switch.".format(name), file=sys.stderr)
+            sys.exit(1)
+    if args.list and args.host is not None:
+        print("--list and --host switches are mutually exclusive.",
+              file=sys.stderr)
         sys.exit(1)
-    if args.list and args.subcommand is not None:
-        print("Subcommands and --list switch are mutually exclusive.",
+    if (args.list or args.host is not None) and args.subcommand is not None:
+        print("Subcommands and --list/--host switches are mutually exclusive.",
               file=sys.stderr)
         sys.exit(1)
+    if args.subcommand in ["group", "host"]:
+        # Each -n value gives a list of names:
+        dest = "{0}_name".format(args.subcommand)
+        names = getattr(args, dest)
+        if names is not None:
+            # Duplicates would fail i.e. on "--add", keep the order though:
+            names = list(collections.OrderedDict.fromkeys(
+                x for y in names for x in y))
+            if not names:
+                print("-n/--{0}-name option did not give".format(args.subcommand) +
+                      " any names", file=sys.stderr)
+                sys.exit(1)
+            setattr(args, dest, names)
     if args.subcommand in ["ippool", "group", "host"]:
         name = args.__getattribute__("{0}_name".format(
                                      args.subcommand.replace("-", "_")))
-        if args.list_all:
+        if args.show_all:
+            if args.show is None:
+                print("--all requires -s/--show", file=sys.stderr)
+                sys.exit(1)
+            if name is not None or args.show:
+                print("--all, -n/--{0}-name and".format(args.subcommand) +
+                      " names given to -s/--show are mutually exclusive",
+                      file=sys.stderr)
+                sys.exit(1)
+        elif args.list_all:
             if name is not None:
                 print("--list-all/-l and -n/--{0}-name".format(args.subcommand) +
                       " options are mutually exclusive", file=sys.stderr)
                 sys.exit(1)
+        elif args.subcommand == "host" and args.where is not None:
+            if name is not None or any([args.add, args.delete, args.var_set,
+                                        args.var_del, args.group_add,
+                                        args.group_del, args.alias_add,
+                                        args.alias_del]):
+                print("-w/--where can not be combined with -n/--host-name " +
+                      "and options modifying hosts", file=sys.stderr)
+                sys.exit(1)
         else:
-            if name is None:
+            if name is None and not args.show:
                 print("-n/--{0}-name".format(args.subcommand) +
                       " option has not been specified", file=sys.stderr)
                 sys.exit(1)
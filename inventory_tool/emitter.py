@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import yaml
+
+from inventory_tool.loader import ENTITY_SECTIONS, IMPLICIT_RESOLVERS
+from inventory_tool.loader import SIMPLE_STRING
+
+# The warning about missing LibYAML is printed by the loader module:
+try:
+    from yaml import CDumper as Dumper
+except ImportError:
+    from yaml import Dumper
+
+# Keys longer than that are emitted by PyYAML as complex "? key" ones:
+_MAX_SIMPLE_KEY = 127
+
+
+class _Unsupported(Exception):
+    """Data needs to be serialized by PyYAML"""
+    pass
+
+
+def _scalar(value, key=False):
+    """Serialize a scalar the way PyYAML's block style emitter would"""
+    if value.__class__ is int:
+        return str(value)
+    if value.__class__ is not str or not SIMPLE_STRING.match(value) or \
+            (key and len(value) > _MAX_SIMPLE_KEY):
+        raise _Unsupported()
+    # Strings which would be read back as some other type need quoting:
+    for tag, regexp in IMPLICIT_RESOLVERS.get(value[0], ()):
+        if regexp.match(value):
+            return "'" + value + "'"
+    return value
+
+
+def _mapping(data, indent, out):
+    """Serialize a block mapping of scalars and flat lists/mappings of them"""
+    for key in sorted(data):
+        value = data[key]
+        prefix = indent + _scalar(key, key=True) + ':'
+        if value.__class__ is dict:
+            if value:
+                out.append(prefix + '\n')
+                _mapping(value, indent + '  ', out)
+            else:
+                out.append(prefix + ' {}\n')
+        elif value.__class__ is list:
+            if value:
+                out.append(prefix + '\n')
+                # PyYAML does not indent sequences nested in mappings:
+                for item in value:
+                    out.append(indent + '- ' + _scalar(item) + '\n')
+            else:
+                out.append(prefix + ' []\n')
+        else:
+            out.append(prefix + ' ' + _scalar(value) + '\n')
+
+
+def _yaml_dump(data):
+    return yaml.dump(data, Dumper=Dumper, default_flow_style=False)
+
+
+def dump_entity(section, name, data):
+    """Serialize single host/group/ippool
+
+    Args:
+        section: name of the top-level section the entity belongs to
+        name: name of the entity
+        data: serialized entity, as returned by its get_hash() method
+
+    Returns:
+        A string with the entity, as it would appear in the section of the
+        document produced by PyYAML - without the section header line.
+    """
+    out = []
+    try:
+        _mapping({name: data}, '  ', out)
+    except (_Unsupported, TypeError):
+        tmp = _yaml_dump({section: {name: data}})
+        return tmp[tmp.index('\n') + 1:]
+    return ''.join(out)
+
+
+def dump(data):
+    """Serialize inventory data
+
+    Output is byte-identical to:
+        yaml.dump(data, Dumper=Dumper, encoding='utf-8', default_flow_style=False)
+
+    but, as the structure of the inventory is known, most of it is written
+    directly instead of going through PyYAML's representer, serializer and
+    emitter. Entities using anything beyond plain strings, ints and flat
+    lists/mappings of them are passed to PyYAML one by one.
+
+    Args:
+        data: a hash with serialized inventory sections
+
+    Returns:
+        UTF-8 encoded document.
+    """
+    try:
+        keys = sorted(data)
+    except TypeError:
+        keys = None
+    if not keys:
+        return _yaml_dump(data).encode('utf-8')
+    out = []
+    for key in keys:
+        value = data[key]
+        if key in ENTITY_SECTIONS and value.__class__ is dict and value:
+            try:
+                names = sorted(value)
+            except TypeError:
+                out.append(_yaml_dump({key: value}))
+                continue
+            out.append(key + ':\n')
+            for name in names:
+                out.append(dump_entity(key, name, value[name]))
+        else:
+            tmp = []
+            try:
+                _mapping({key: value}, '', tmp)
+            except (_Unsupported, TypeError):
+                tmp = [_yaml_dump({key: value})]
+            out.extend(tmp)
+    return ''.join(out).encode('utf-8')
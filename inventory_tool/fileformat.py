@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import json
+import os
+import struct
+
+from inventory_tool.exception import BadDataException
+
+# On-disk formats of the inventory file. Machine-oriented ones store the same
+# "_meta" section as the YAML one does, and the checksum is calculated over
+# the canonical encoding of the rest of the data:
+# - "json": whole document is a canonical JSON (sorted keys, no whitespace)
+# - "binary": MAGIC, then "_meta" and the data encoded as length-prefixed
+#   values, see encode() for the details
+FORMATS = ['yaml', 'json', 'binary']
+
+# File extensions of the formats other than the default, YAML one:
+EXTENSIONS = {'.json': 'json',
+              '.bin': 'binary',
+              }
+
+MAGIC = b'INVB\x01'
+
+# Type tags of the binary format:
+_NONE, _FALSE, _TRUE, _INT, _NEG_INT, _FLOAT, _STR, _LIST, _DICT = range(9)
+_DOUBLE = struct.Struct('>d')
+
+
+def guess_format(path):
+    """Return the name of the format of the inventory file basing on its name"""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'yaml')
+
+
+def write_atomically(path, data):
+    """Replace the contents of the file, so that readers never see it partial
+
+    Readers ("--list", "--host", etc...) do not take the inventory lock, so
+    the data is written to a temporary file in the same directory first,
+    flushed to the disk, and then renamed over the original one. Permissions
+    of the original file are preserved.
+
+    Args:
+        path: path of the file
+        data: bytes to write
+
+    Raises:
+        IOError: there has been a problem with writing the data.
+    """
+    tmp = "{0}.{1}.tmp".format(path, os.getpid())
+    # Mode of a new file is subject to umask, just like with open():
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        try:
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _encode_uvarint(value, out):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _encode_value(value, out):
+    cls = value.__class__
+    if cls is str:
+        tmp = value.encode('utf-8')
+        out.append(_STR)
+        _encode_uvarint(len(tmp), out)
+        out += tmp
+    elif cls is dict:
+        out.append(_DICT)
+        _encode_uvarint(len(value), out)
+        for key in sorted(value):
+            _encode_value(key, out)
+            _encode_value(value[key], out)
+    elif cls is list:
+        out.append(_LIST)
+        _encode_uvarint(len(value), out)
+        for item in value:
+            _encode_value(item, out)
+    elif value is None:
+        out.append(_NONE)
+    elif cls is bool:
+        out.append(_TRUE if value else _FALSE)
+    elif cls is int:
+        if value >= 0:
+            out.append(_INT)
+            _encode_uvarint(value, out)
+        else:
+            out.append(_NEG_INT)
+            _encode_uvarint(-value - 1, out)
+    elif cls is float:
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    else:
+        msg = "Object of type {0} can not be serialized"
+        raise TypeError(msg.format(cls.__name__))
+
+
+def _decode_uvarint(buf, pos):
+    ret = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        ret |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return ret, pos
+        shift += 7
+
+
+def _decode_value(buf, pos):
+    tag = buf[pos]
+    pos += 1
+    if tag == _STR:
+        size, pos = _decode_uvarint(buf, pos)
+        if pos + size > len(buf):
+            raise ValueError("string exceeds the end of data")
+        return buf[pos:pos + size].decode('utf-8'), pos + size
+    elif tag == _DICT:
+        size, pos = _decode_uvarint(buf, pos)
+        ret = {}
+        for _ in range(size):
+            key, pos = _decode_value(buf, pos)
+            ret[key], pos = _decode_value(buf, pos)
+        return ret, pos
+    elif tag == _LIST:
+        size, pos = _decode_uvarint(buf, pos)
+        ret = []
+        for _ in range(size):
+            item, pos = _decode_value(buf, pos)
+            ret.append(item)
+        return ret, pos
+    elif tag == _NONE:
+        return None, pos
+    elif tag == _FALSE:
+        return False, pos
+    elif tag == _TRUE:
+        return True, pos
+    elif tag == _INT:
+        return _decode_uvarint(buf, pos)
+    elif tag == _NEG_INT:
+        ret, pos = _decode_uvarint(buf, pos)
+        return -ret - 1, pos
+    elif tag == _FLOAT:
+        return _DOUBLE.unpack_from(buf, pos)[0], pos + _DOUBLE.size
+    raise ValueError("unknown type tag {0}".format(tag))
+
+
+def encode(file_format, data):
+    """Serialize inventory data in its canonical form
+
+    Binary encoding of each value starts with a single byte type tag. Ints are
+    stored as LEB128 varints, strings (UTF-8), lists and dicts are prefixed by
+    their length. Keys of dicts are sorted.
+
+    Args:
+        file_format: either "json" or "binary"
+        data: inventory data without "_meta" section
+
+    Returns:
+        Encoded data, ready to be checksummed and written.
+    """
+    if file_format == 'json':
+        return json.dumps(data, sort_keys=True, separators=(',', ':'),
+                          ensure_ascii=False).encode('utf-8')
+    out = bytearray()
+    _encode_value(data, out)
+    return bytes(out)
+
+
+def dump(file_format, meta, body):
+    """Build the contents of the inventory file
+
+    Args:
+        file_format: either "json" or "binary"
+        meta: contents of "_meta" section
+        body: data encoded using encode() function
+
+    Returns:
+        Bytes to be written to the inventory file.
+    """
+    if file_format == 'json':
+        # "_meta" sorts before all the other sections, so the canonical form
+        # of the whole document can be spliced together:
+        meta = b'{"_meta":' + encode('json', meta)
+        return meta + (b'}' if body == b'{}' else b',' + body[1:])
+    return MAGIC + encode('binary', meta) + body
+
+
+def load(file_format, buf):
+    """Parse the contents of the inventory file
+
+    Args:
+        file_format: either "json" or "binary"
+        buf: contents of the inventory file
+
+    Returns:
+        A tuple (meta, data, body) - contents of the "_meta" section, the rest
+        of the data and its canonical encoding the checksum is calculated of.
+
+    Raises:
+        BadDataException: the file is malformed
+    """
+    try:
+        if file_format == 'json':
+            data = json.loads(buf.decode('utf-8'))
+            if not isinstance(data, dict) or "_meta" not in data:
+                raise ValueError("not a mapping of sections with _meta section")
+            meta = data.pop("_meta")
+            body = encode('json', data)
+        else:
+            if not buf.startswith(MAGIC):
+                raise ValueError("bad magic number")
+            meta, pos = _decode_value(buf, len(MAGIC))
+            body = buf[pos:]
+            data, pos = _decode_value(body, 0)
+            if pos != len(body):
+                raise ValueError("trailing data after the inventory")
+            if not isinstance(data, dict):
+                raise ValueError("not a mapping of sections")
+    except (ValueError, IndexError, TypeError, struct.error) as e:
+        msg = "Inventory file is not a proper {0} document: {1}"
+        raise BadDataException(msg.format(file_format, str(e)))
+    if not isinstance(meta, dict):
+        raise BadDataException("Inventory _meta section is malformed")
+    return meta, data, body
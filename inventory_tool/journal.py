@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import errno
+import json
+import logging
+import os
+
+import inventory_tool.object.ippool as i
+import inventory_tool.validators as v
+from inventory_tool.exception import BadDataException
+
+# For Python3 < 3.3, ipaddress module is available as an extra module,
+# under a different name:
+try:
+    from ipaddress import ip_address
+    from ipaddress import ip_network
+except ImportError:
+    from ipaddr import IPAddress as ip_address
+    from ipaddr import IPNetwork as ip_network
+
+
+def _encode_object(obj):
+    """Serialize objects that json module can not handle by itself"""
+    if isinstance(obj, i.IPPool):
+        return obj.get_hash()
+    # ip addresses and networks:
+    return str(obj)
+
+
+def _decode_keyval(keyval):
+    """Restore the type of the keyval's value basing on the key"""
+    val = keyval["val"]
+    if val is not None:
+        if v.KeyWordValidator.is_ipaddress_keyword(keyval["key"]):
+            val = ip_address(val)
+        elif v.KeyWordValidator.is_ipnetwork_keyword(keyval["key"]):
+            val = ip_network(val)
+    return {"key": keyval["key"], "val": val}
+
+
+class Journal:
+    """Append-only log of changes made to the inventory.
+
+    Rewriting the whole inventory file in order to save a single change does
+    not scale well with big inventories. Instead, each change is appended to
+    "<inventory>.journal" file as a single line JSON record, which is then
+    replayed on top of the inventory file during the next load. Compacting
+    the journal is simply saving the whole inventory and removing the journal.
+
+    Records have a form of {"op": <InventoryData method>, "args": <kwargs>}.
+    """
+
+    # Methods of InventoryData that modify the inventory and may be replayed:
+    OPERATIONS = frozenset(['ippool_add', 'ippool_del', 'ippool_assign',
+                            'ippool_revoke', 'ippool_book_ipaddr',
+                            'ippool_cancel_ipaddr', 'group_add', 'group_del',
+                            'group_child_add', 'group_child_del',
+                            'group_host_add', 'group_host_del', 'host_add',
+                            'host_del', 'host_set_vars', 'host_del_vars',
+                            'host_alias_add', 'host_alias_del', 'host_rename',
+                            ])
+
+    __slots__ = ['_path']
+
+    def __init__(self, inventory_path):
+        """Build a new Journal object
+
+        Args:
+            inventory_path: path of the inventory this journal belongs to
+        """
+        self._path = inventory_path + '.journal'
+
+    @staticmethod
+    def encode(op, **kwargs):
+        """Serialize single operation into a journal record
+
+        Args:
+            op: name of the InventoryData method
+            kwargs: arguments the method has been called with. Values must be
+                final, i.e. auto-allocated ip addresses need to be already
+                resolved so that replaying the record gives the same result.
+
+        Returns:
+            A string containing the record, without the trailing newline.
+        """
+        return json.dumps({"op": op, "args": kwargs}, sort_keys=True,
+                          separators=(',', ':'), default=_encode_object)
+
+    @staticmethod
+    def decode(line):
+        """Parse a journal record back into an operation
+
+        Args:
+            line: a string containing single record
+
+        Returns:
+            A tuple (op, kwargs), where kwargs use the same types as the
+            arguments originally passed to the InventoryData method.
+
+        Raises:
+            BadDataException: record is malformed
+        """
+        try:
+            record = json.loads(line)
+            op = record["op"]
+            args = record["args"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise BadDataException("Malformed journal record: " + str(e))
+        if op not in Journal.OPERATIONS:
+            raise BadDataException("Unknown journal operation: " + str(op))
+        try:
+            if op == 'ippool_add':
+                args["pool_obj"] = i.IPPool(**args["pool_obj"])
+            elif op in ['ippool_book_ipaddr', 'ippool_cancel_ipaddr']:
+                args["ipaddr"] = ip_address(args["ipaddr"])
+            elif op == 'host_set_vars':
+                args["data"] = [_decode_keyval(x) for x in args["data"]]
+        except (ValueError, KeyError, TypeError) as e:
+            msg = "Malformed arguments of journal operation {0}: {1}"
+            raise BadDataException(msg.format(op, str(e)))
+        return op, args
+
+    def get_path(self):
+        """Path of the journal file"""
+        return self._path
+
+    def exists(self):
+        """Check if there are any changes in the journal"""
+        return os.path.exists(self._path)
+
+    def read(self):
+        """Read the journal
+
+        A partially written, last record (i.e. the writer has crashed) is
+        ignored.
+
+        Returns:
+            A list of tuples (line number, record string), line numbers start
+            from 1.
+        """
+        try:
+            with open(self._path, 'r', encoding='utf-8') as fh:
+                data = fh.read()
+        except (OSError, IOError) as e:
+            msg = "Failed to read journal {0}: {1}"
+            raise BadDataException(msg.format(self._path, str(e)))
+        lines = data.split('\n')
+        if lines[-1]:
+            logging.warning("Ignoring incomplete journal record: " + lines[-1])
+        return [(n + 1, x) for n, x in enumerate(lines[:-1]) if x]
+
+    def append(self, records):
+        """Durably append records to the journal
+
+        Args:
+            records: list of record strings, as returned by Journal.encode()
+
+        Raises:
+            IOError: there has been a problem with saving the records.
+        """
+        if not records:
+            return
+        with open(self._path, 'a', encoding='utf-8') as fh:
+            fh.write('\n'.join(records) + '\n')
+            fh.flush()
+            os.fsync(fh.fileno())
+        logging.debug("{0} records appended to journal {1}".format(
+                      len(records), self._path))
+
+    def clear(self):
+        """Remove the journal, i.e. after its records were compacted"""
+        try:
+            os.unlink(self._path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import logging
+import re
+import sys
+import yaml
+from yaml.composer import ComposerError
+from yaml.constructor import SafeConstructor
+from yaml.events import AliasEvent, DocumentEndEvent, DocumentStartEvent
+from yaml.events import MappingEndEvent, MappingStartEvent, ScalarEvent
+from yaml.events import SequenceEndEvent, SequenceStartEvent, StreamEndEvent
+from yaml.events import StreamStartEvent
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+from yaml.resolver import Resolver
+
+from inventory_tool.exception import BadDataException
+
+# Try LibYAML first and if unavailable, fall back to pure Python implementation
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    # Logger will not be initialized yet :/
+    print("WARNING! libyaml is unavailable, inventories edited by hand will " +
+          "load slower - pure-python implementation of yaml bindings.",
+          file=sys.stderr)
+    from yaml import Loader
+
+# Top-level sections that contain mappings of named entities:
+ENTITY_SECTIONS = frozenset(['groups', 'hosts', 'ippools'])
+
+# Strings that PyYAML emits verbatim or in single quotes, without escaping or
+# line folding: ASCII only, no whitespace, no indicator as the first char,
+# not ending with ":" and not starting with a document marker. Together with
+# flat block mappings and indentless sequences of them, this is the subset of
+# YAML that the inventory is saved in.
+SIMPLE_STRING = re.compile(r'(?!\.\.\.)[A-Za-z0-9_./=~+][A-Za-z0-9_./:@+=~-]*(?<!:)\Z')
+
+# Regexps of the types that plain scalars may be resolved to, indexed by
+# the first character of the scalar:
+IMPLICIT_RESOLVERS = Resolver.yaml_implicit_resolvers
+
+_INT_TAG = 'tag:yaml.org,2002:int'
+_DECIMAL = re.compile(r'(?:0|[1-9][0-9]*)\Z')
+_KEY_LINE = re.compile(r"('[^']*'|[^' ][^ ]*?):(?: (.+))?\Z")
+
+
+class _Unsupported(Exception):
+    """Document needs to be parsed by PyYAML"""
+    pass
+
+
+def _scalar(text):
+    """Construct a plain or single-quoted scalar from the subset"""
+    if text[:1] == "'":
+        if len(text) < 2 or text[-1] != "'" or "'" in text[1:-1]:
+            raise _Unsupported(text)
+        return text[1:-1]
+    if not SIMPLE_STRING.match(text):
+        raise _Unsupported(text)
+    for tag, regexp in IMPLICIT_RESOLVERS.get(text[0], ()):
+        if regexp.match(text):
+            if tag == _INT_TAG and _DECIMAL.match(text):
+                return int(text)
+            raise _Unsupported(text)
+    return text
+
+
+def _lines(stream):
+    if isinstance(stream, (str, bytes)):
+        stream = stream.splitlines(True)
+    for line in stream:
+        if line.__class__ is bytes:
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError:
+                raise _Unsupported(line)
+        yield line
+
+
+class _SubsetParser:
+    """Line based parser of the YAML subset the inventory is saved in
+
+    Documents written by save() consist solely of "key: value", "key:" and
+    "- item" lines, with mappings indented by two spaces and sequences not
+    indented at all, so there is no need to run them through the full YAML
+    machinery, which is very slow without LibYAML. Anything outside of the
+    subset (comments, flow collections, anchors, other scalar styles and
+    types...) raises _Unsupported, so that the caller may fall back to PyYAML.
+    """
+
+    __slots__ = ['_lines', 'indent', 'item', 'key', 'value']
+
+    def __init__(self, stream):
+        self._lines = _lines(stream)
+        self.advance()
+
+    def advance(self):
+        """Split the next line into indentation, key and value"""
+        line = next(self._lines, None)
+        if line is None:
+            self.indent = -1
+            return
+        if line[-1:] == '\n':
+            line = line[:-1]
+        content = line.lstrip(' ')
+        self.indent = len(line) - len(content)
+        if content[:2] == '- ':
+            self.item = True
+            self.key = None
+            self.value = content[2:]
+        else:
+            match = _KEY_LINE.match(content)
+            if match is None:
+                raise _Unsupported(line)
+            self.item = False
+            self.key = _scalar(match.group(1))
+            self.value = match.group(2)
+
+    def _check_end(self, indent):
+        # Nothing may follow a collection at a deeper level:
+        if self.indent > indent or (self.indent == indent and self.item):
+            raise _Unsupported(self.value)
+
+    def mapping(self, indent):
+        """Parse block mapping which keys are indented by `indent` spaces"""
+        ret = {}
+        while self.indent == indent and not self.item:
+            key, value = self.key, self.value
+            self.advance()
+            ret[key] = self.parse_value(indent, value)
+        self._check_end(indent)
+        return ret
+
+    def parse_value(self, indent, value):
+        """Parse the value of the key indented by `indent` spaces
+
+        Args:
+            indent: indentation of the key
+            value: text following the key on the same line, None if the value
+                is a block collection that starts on the next line
+        """
+        if value is None:
+            if self.item and self.indent == indent:
+                ret = []
+                while self.item and self.indent == indent:
+                    ret.append(_scalar(self.value))
+                    self.advance()
+                if self.indent > indent:
+                    raise _Unsupported(self.value)
+                return ret
+            if not self.item and self.indent == indent + 2:
+                return self.mapping(indent + 2)
+            raise _Unsupported(self.value)
+        if value == '[]':
+            return []
+        if value == '{}':
+            return {}
+        return _scalar(value)
+
+
+def _iter_subset(stream):
+    parser = _SubsetParser(stream)
+    if parser.indent != 0 or parser.item:
+        raise _Unsupported("document is not a block mapping")
+    while parser.indent == 0 and not parser.item:
+        section, value = parser.key, parser.value
+        parser.advance()
+        if section in ENTITY_SECTIONS and value is None and \
+                parser.indent == 2 and not parser.item:
+            while parser.indent == 2 and not parser.item:
+                name, value = parser.key, parser.value
+                parser.advance()
+                yield section, name, parser.parse_value(2, value)
+            if parser.indent > 0:
+                raise _Unsupported(parser.value)
+        else:
+            yield section, None, parser.parse_value(0, value)
+    if parser.indent != -1:
+        raise _Unsupported(parser.value)
+
+
+def _rewind(stream):
+    if not isinstance(stream, (str, bytes)):
+        stream.seek(0)
+
+
+class _EventComposer:
+    """Build YAML nodes out of parser events, one subtree at a time
+
+    This is what yaml.Composer does, but instead of composing the whole
+    document, only the subtree starting at the current event is composed, so
+    that it can be constructed and dropped before the next one is parsed.
+    """
+
+    __slots__ = ['_events', '_next', '_resolver', '_constructor', '_anchors']
+
+    def __init__(self, stream):
+        self._events = yaml.parse(stream, Loader=Loader)
+        self._next = None
+        self._resolver = Resolver()
+        self._constructor = SafeConstructor()
+        self._anchors = {}
+
+    def peek(self):
+        """Return the next event without consuming it"""
+        if self._next is None:
+            self._next = next(self._events)
+        return self._next
+
+    def get(self, event_class=None):
+        """Consume the next event, optionally checking its type
+
+        Raises:
+            BadDataException: the event is not of the expected type
+        """
+        event = self.peek()
+        self._next = None
+        if event_class is not None and not isinstance(event, event_class):
+            msg = "Inventory data is not a mapping of sections, got {0}"
+            raise BadDataException(msg.format(event))
+        return event
+
+    def _resolve(self, kind, event, value):
+        if event.tag is None or event.tag == '!':
+            return self._resolver.resolve(kind, value, event.implicit)
+        return event.tag
+
+    def compose(self):
+        """Compose the node the current event starts"""
+        event = self.get()
+        if isinstance(event, AliasEvent):
+            if event.anchor not in self._anchors:
+                raise ComposerError(None, None, "found undefined alias {0}".format(
+                                    event.anchor), event.start_mark)
+            return self._anchors[event.anchor]
+        if isinstance(event, ScalarEvent):
+            node = ScalarNode(self._resolve(ScalarNode, event, event.value),
+                              event.value, event.start_mark, event.end_mark,
+                              style=event.style)
+        elif isinstance(event, SequenceStartEvent):
+            node = SequenceNode(self._resolve(SequenceNode, event, None), [],
+                                event.start_mark, None,
+                                flow_style=event.flow_style)
+            while not isinstance(self.peek(), SequenceEndEvent):
+                node.value.append(self.compose())
+            node.end_mark = self.get().end_mark
+        elif isinstance(event, MappingStartEvent):
+            node = MappingNode(self._resolve(MappingNode, event, None), [],
+                               event.start_mark, None,
+                               flow_style=event.flow_style)
+            while not isinstance(self.peek(), MappingEndEvent):
+                key = self.compose()
+                node.value.append((key, self.compose()))
+            node.end_mark = self.get().end_mark
+        else:
+            raise ComposerError(None, None, "unexpected event {0}".format(event),
+                                event.start_mark)
+        if event.anchor is not None:
+            self._anchors[event.anchor] = node
+        return node
+
+    def load(self):
+        """Compose and construct the value the current event starts"""
+        return self._constructor.construct_document(self.compose())
+
+
+def _iter_events(stream):
+    """Parse inventory document entity by entity using PyYAML"""
+    composer = _EventComposer(stream)
+    composer.get(StreamStartEvent)
+    if isinstance(composer.peek(), StreamEndEvent):
+        raise BadDataException("Inventory document is empty")
+    composer.get(DocumentStartEvent)
+    composer.get(MappingStartEvent)
+    while not isinstance(composer.peek(), MappingEndEvent):
+        section = composer.load()
+        if section in ENTITY_SECTIONS and \
+                isinstance(composer.peek(), MappingStartEvent):
+            composer.get()
+            if isinstance(composer.peek(), MappingEndEvent):
+                yield section, None, {}
+            while not isinstance(composer.peek(), MappingEndEvent):
+                name = composer.load()
+                yield section, name, composer.load()
+            composer.get()
+        else:
+            yield section, None, composer.load()
+    composer.get(MappingEndEvent)
+    composer.get(DocumentEndEvent)
+    if not isinstance(composer.peek(), StreamEndEvent):
+        raise BadDataException("Inventory file contains more than one document")
+
+
+def iter_inventory(stream):
+    """Parse inventory document entity by entity
+
+    Only the entity that is being yielded is kept in memory, the raw data of
+    already yielded ones can be freed as soon as the caller drops it.
+
+    Documents in the subset of YAML written by save() are parsed directly,
+    anything else falls back to PyYAML.
+
+    Args:
+        stream: file object or string with the inventory document, file
+            objects need to be seekable
+
+    Yields:
+        Tuples (section, name, data), where section is the name of top-level
+        key of the document. For sections listed in ENTITY_SECTIONS each entity
+        is yielded separately, the other sections (i.e. "_meta") and empty
+        ones are yielded as a whole with name set to None.
+
+    Raises:
+        BadDataException: document is not a mapping of sections
+        yaml.YAMLError: document is not a proper YAML document
+    """
+    done = 0
+    try:
+        for entity in _iter_subset(stream):
+            yield entity
+            done += 1
+        return
+    except _Unsupported as e:
+        logging.debug("Inventory is not in the saved format ({0}), parsing "
+                      "it with PyYAML".format(e))
+    _rewind(stream)
+    for n, entity in enumerate(_iter_events(stream)):
+        # Entities parsed before the unsupported construct was found have
+        # already been consumed:
+        if n >= done:
+            yield entity
+
+
+def load(stream):
+    """Load a whole YAML document
+
+    Just like iter_inventory(), documents in the subset of YAML written by
+    save() are parsed directly and anything else by PyYAML.
+
+    Args:
+        stream: file object or string with the document, file objects need to
+            be seekable
+
+    Returns:
+        Loaded data.
+    """
+    try:
+        parser = _SubsetParser(stream)
+        if parser.indent == 0 and not parser.item:
+            data = parser.mapping(0)
+            if parser.indent == -1:
+                return data
+    except _Unsupported:
+        pass
+    _rewind(stream)
+    return yaml.load(stream, Loader=Loader)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import fcntl
+import logging
+import os
+import time
+
+from inventory_tool.exception import GenericException
+
+
+def get_file_signature(path):
+    """Fetch data that identifies given version of a file on disk
+
+    The signature changes each time the file is re-written, so it can be used
+    to detect whether somebody else modified the inventory after we have
+    loaded it.
+
+    Args:
+        path: path to the file
+
+    Returns:
+        A tuple (inode, size, mtime in ns) or None if the file does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class InventoryLock:
+    """Exclusive, inter-process lock protecting the inventory file.
+
+    Each command that modifies the inventory performs a read-modify-write
+    cycle on the whole file. Without serializing these cycles, two processes
+    may load the same data, allocate the same "next free" ip address and
+    the last one to save wins. The lock is an advisory flock() on a separate
+    "<inventory>.lock" file, so that the inventory file itself may be freely
+    re-written by the lock holder.
+    """
+
+    __slots__ = ['_lock_path', '_timeout', '_fh']
+
+    def __init__(self, inventory_path, timeout=60):
+        """Build a new InventoryLock object
+
+        Args:
+            inventory_path: path to the inventory that should be protected
+            timeout: how many seconds to wait for the lock before giving up
+        """
+        self._lock_path = inventory_path + '.lock'
+        self._timeout = timeout
+        self._fh = None
+
+    def acquire(self):
+        """Acquire the lock, wait up to timeout seconds for other holders
+
+        Raises:
+            GenericException: lock could not be acquired within the timeout
+        """
+        if self._fh is not None:
+            return
+        try:
+            fh = open(self._lock_path, 'a')
+        except (OSError, IOError) as e:
+            msg = "Failed to open lock file {0}: {1}"
+            raise GenericException(msg.format(self._lock_path, str(e)))
+        deadline = time.monotonic() + self._timeout
+        delay = 0.005
+        while True:
+            try:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except (OSError, IOError):
+                if time.monotonic() >= deadline:
+                    fh.close()
+                    msg = "Timed out waiting for inventory lock {0}"
+                    raise GenericException(msg.format(self._lock_path))
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        logging.debug("Inventory lock {0} acquired".format(self._lock_path))
+        self._fh = fh
+
+    def release(self):
+        """Release the lock, it is safe to call it if the lock is not held"""
+        if self._fh is None:
+            return
+        fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        self._fh.close()
+        self._fh = None
+        logging.debug("Inventory lock {0} released".format(self._lock_path))
+
+    def is_locked(self):
+        """Check if the lock is held by this object"""
+        return self._fh is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *unused):
+        self.release()
+        return False
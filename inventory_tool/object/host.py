@@ -39,7 +39,7 @@ class Host:
     - human readable representation of hosts
     """
 
-    __slots__ = ['_aliases', '_keyvals', ]
+    __slots__ = ['_aliases', '_keyvals', '_keyval_strs', ]
 
     def __init__(self, aliases=[], keyvals={}):
         """Build a new Host object
@@ -53,6 +53,10 @@ class Host:
         """
         self._aliases = list(aliases)
         self._keyvals = {}
+        # String forms of values, ip addresses/networks are quite expensive to
+        # convert and hosts are serialized each time the inventory is saved or
+        # dumped for Ansible:
+        self._keyval_strs = {}
         for key in keyvals:
             try:
                 if v.KeyWordValidator.is_ipaddress_keyword(key):
@@ -92,10 +96,32 @@ class Host:
             are not very readable after serializing.
         """
         tmp = {"aliases": sorted(self._aliases),
-               "keyvals": {x: str(self._keyvals[x]) for x in self._keyvals},
+               "keyvals": {x: self._keyval_str(x) for x in self._keyvals},
                }
         return tmp
 
+    def _keyval_str(self, key):
+        ret = self._keyval_strs.get(key)
+        if ret is None:
+            ret = self._keyval_strs[key] = str(self._keyvals[key])
+        return ret
+
+    def get_ansible_hostvars(self, str_keywords):
+        """Build host variables in the format used by Ansible
+
+        Args:
+            str_keywords: a set of keys which values need to be converted to
+                strings, i.e. ip addresses and networks
+
+        Returns:
+            A new hash with all the keyvals and "aliases" key.
+        """
+        ret = {}
+        for key, val in self._keyvals.items():
+            ret[key] = self._keyval_str(key) if key in str_keywords else val
+        ret['aliases'] = list(self._aliases)
+        return ret
+
     def get_keyval(self, key=None, reporting=True):
         """Get a value for given key or all keyvals
 
@@ -136,6 +162,7 @@ class Host:
                 {"key": key of the variable, "val": variable's value}
         """
         self._keyvals[keyval["key"]] = keyval["val"]
+        self._keyval_strs.pop(keyval["key"], None)
 
     def del_keyval(self, key):
         """Remove val identified by key
@@ -148,6 +175,7 @@ class Host:
         """
         if key in self._keyvals:
             del self._keyvals[key]
+            self._keyval_strs.pop(key, None)
         else:
             raise MalformedInputException("Key {0} has not been found.".format(key))
 
@@ -14,8 +14,6 @@
 # License for the specific language governing permissions and limitations under
 # the License.
 
-import sys
-import yaml
 import hashlib
 import logging
 
@@ -23,8 +21,13 @@ import inventory_tool
 import inventory_tool.object.group as g
 import inventory_tool.object.host as h
 import inventory_tool.object.ippool as i
+import inventory_tool.object.varsindex as vi
+import inventory_tool.fileformat as ff
+import inventory_tool.journal as j
+import inventory_tool.profiling as prof
 import inventory_tool.validators as v
 from inventory_tool.exception import BadDataException, MalformedInputException
+from inventory_tool.exception import ScriptException
 
 # For Python3 < 3.3, ipaddress module is available as an extra module,
 # under a different name:
@@ -35,14 +38,27 @@ except ImportError:
     from ipaddr import IPAddress as ip_address
     from ipaddr import IPNetwork as ip_network
 
-# Try LibYAML first and if unavailable, fall back to pure Python implementation
-try:
-    from yaml import CLoader as Loader, CDumper as Dumper
-except ImportError:
-    # Logger will not be initialized yet :/
-    print("WARNING! libyaml is unavailable, loading slower - pure-python " +
-          "implementation of yaml bindings.", file=sys.stderr)
-    from yaml import Loader, Dumper
+
+def check_explicit_addresses(hosts, data):
+    """Make sure an explicit ip address is not given to many hosts at once
+
+    Args:
+        hosts: names of the hosts that are being added
+        data: keyvals all the hosts should get, see host_add_many()
+
+    Raises:
+        MalformedInputException: there is more than one host and some of the
+            ip address keyvals has a value.
+    """
+    if len(hosts) < 2:
+        return
+    for keyval in data:
+        if v.KeyWordValidator.is_ipaddress_keyword(keyval["key"]) and \
+                keyval["val"] is not None:
+            msg = "Address {0} of {1} can not be assigned to {2} hosts, "
+            msg += "leave the value out to auto-assign the addresses"
+            raise MalformedInputException(msg.format(
+                keyval["val"], keyval["key"], len(hosts)))
 
 
 class InventoryData:
@@ -55,22 +71,31 @@ class InventoryData:
     - ip address auto-assign handling
     """
 
-    __slots__ = ['_inventory_path', '_data', '_is_recalculated']
+    __slots__ = ['_inventory_path', '_data', '_is_recalculated', '_journal',
+                 '_journal_records', '_full_save', '_format', '_vars_index']
 
-    def __init__(self, inventory_path, initialize=False):
+    def __init__(self, inventory_path, initialize=False, journal=False,
+                 file_format=None):
         """Build a new InventoryData object
 
         Args:
             inventory_path: a patch where the inventory is stored
             initialize: defines whether an empty directory object should be
                 created or already existing one loaded.
+            journal: if True, save() appends changes to the journal instead of
+                re-writing the whole inventory file. Journal left by others
+                is always replayed, no matter the value of this parameter.
+            file_format: on-disk format of the inventory file, one of
+                fileformat.FORMATS. By default it is guessed from the file
+                extension, with YAML used for anything unknown.
 
         Raises:
             BadDataException: stored inventory is malformed and cannot be read.
             MalformedInputException: stored inventory has some incoherent data
         """
-        self._inventory_path = inventory_path
-        self._is_recalculated = False
+        self._init_state(inventory_path, initialize, file_format)
+        self._journal = j.Journal(inventory_path)
+        self._journal_records = [] if journal else None
         if initialize:
             self._data = {"hosts": {},
                           "groups": {},
@@ -81,60 +106,235 @@ class InventoryData:
             return
         else:
             try:
-                with open(self._inventory_path, 'rb') as fh:
-                    tmp = fh.read()
+                fh = open(self._inventory_path, 'rb')
             except (OSError, IOError) as e:
                 msg = "Failed to open {0}: {1}"
                 msg = msg.format(self._inventory_path, str(e))
                 raise MalformedInputException(msg)
-            self._data = yaml.load(tmp, Loader=Loader)
-            # Check if will be able to work with this data:
-            if self._data["_meta"]["version"] < \
-                    inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT:
-                msg = "Inventory format: {0}, min supported format: {1}".format(
-                      self._data["_meta"]["version"],
-                      inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT)
-                logging.debug(msg)
-                raise BadDataException("Inventory data is in unsuported/old " +
-                                       "format, please update your tools")
-            # Calculate checksum before parsing data into objects:
-            checksum_hash = self._data.copy()  # Shallow copy
-            del checksum_hash["_meta"]
-            tmp = yaml.dump(checksum_hash, Dumper=Dumper, encoding='utf-8',
-                            default_flow_style=False)
-            checksum = hashlib.sha256(tmp).hexdigest()
-            # Parse IPPools into objects:
-            logging.debug("Parsing ippools into objects")
-            for ippool in self._data["ippools"]:
-                tmp = self._data["ippools"][ippool]
-                obj = i.IPPool(network=tmp["network"],
-                             allocated=tmp["allocated"],
-                             reserved=tmp["reserved"],)
-                self._data["ippools"][ippool] = obj
-            # Parse Hosts into objects:
-            logging.debug("Parsing hosts into objects")
-            for host in self._data["hosts"]:
-                self._data["hosts"][host] = h.Host(
-                    aliases=self._data["hosts"][host]['aliases'],
-                    keyvals=self._data["hosts"][host]['keyvals'],
-                    )
-            # Parse Groups into objects:
-            logging.debug("Parsing groups into objects")
-            for group in self._data["groups"]:
-                self._data["groups"][group] = g.Group(
-                    hosts=self._data["groups"][group]['hosts'],
-                    children=self._data["groups"][group]['children'],
-                    ippools=self._data["groups"][group]['ippools'],
-                    )
+            with fh:
+                if self._format == 'yaml':
+                    checksum_ok = self._load(fh)
+                else:
+                    with prof.phase("read"):
+                        buf = fh.read()
+                    checksum_ok = self._load_packed(buf)
             # Check if somebody did not mess with the inventory:
-            if self._data["_meta"]["checksum"] != checksum:
+            if not checksum_ok:
                 # FIXME - later it can be divided into recalculating only the
                 # sections that changed.
                 logging.warning("File checksum mismatch, manual edition detected!")
                 self.recalculate_inventory()
+            # Apply changes that have not been compacted yet:
+            if self._journal.exists():
+                with prof.phase("journal replay"):
+                    self._journal_replay()
             logging.debug("Inventory {0} has been loaded.".format(
                           self._inventory_path))
 
+    def _init_state(self, inventory_path, initialize, file_format):
+        """Set the attributes shared by all the file based inventories
+
+        Args:
+            inventory_path: a path where the inventory is stored
+            initialize: whether an empty inventory is being created
+            file_format: on-disk format of the inventory, guessed from the
+                file extension if None
+
+        Raises:
+            MalformedInputException: file format is not supported
+        """
+        self._inventory_path = inventory_path
+        self._is_recalculated = False
+        # Built when the hosts are searched by their variables for the first
+        # time, see host_find():
+        self._vars_index = None
+        self._full_save = initialize
+        if file_format is None:
+            file_format = ff.guess_format(inventory_path)
+        elif file_format not in ff.FORMATS:
+            msg = "Unsupported inventory file format: {0}".format(file_format)
+            raise MalformedInputException(msg)
+        self._format = file_format
+
+    def _load(self, stream):
+        """Load the inventory document, building objects as it is parsed
+
+        The raw data of each host/group/ippool is converted into an object
+        as soon as its mapping is parsed, so the whole document never needs to
+        be held in memory.
+
+        Args:
+            stream: file object with the inventory document
+
+        Returns:
+            True if the checksum stored in the inventory matches its data,
+            False otherwise.
+        """
+        # PyYAML is imported only for inventories that are kept in YAML, it
+        # takes a significant part of the startup time otherwise:
+        import inventory_tool.emitter as em
+        import inventory_tool.loader as ld
+
+        self._data = {"hosts": {},
+                      "groups": {},
+                      "ippools": {},
+                      }
+        # section -> [(name, serialized entity)], or the serialized section
+        # itself if it is not split into entities:
+        dumps = {}
+        for section, name, raw in prof.iterate("parse",
+                                               ld.iter_inventory(stream)):
+            if section == "_meta":
+                self._check_meta(raw)
+                self._data["_meta"] = raw
+                continue
+            # Serializing raw data entity by entity gives the same pieces
+            # save() calculates the checksum of, they only have to be put in
+            # the same order:
+            with prof.phase("checksum"):
+                if name is None:
+                    dumps[section] = em.dump({section: raw})
+                else:
+                    dumps.setdefault(section, []).append(
+                        (name, em.dump_entity(section, name, raw).encode('utf-8')))
+            if name is not None:
+                with prof.phase("objects"):
+                    self._data[section][name] = self._parse_object(section, raw)
+        if "_meta" not in self._data:
+            raise BadDataException("Inventory data does not contain _meta section")
+        with prof.phase("checksum"):
+            checksum = self._checksum_dumps(dumps)
+        return self._data["_meta"]["checksum"] == checksum
+
+    @staticmethod
+    def _checksum_dumps(dumps):
+        """Checksum of serialized entities, in the order save() writes them
+
+        Entities of inventories saved by the tool come sorted already, but the
+        ones edited by hand do not have to.
+
+        Args:
+            dumps: a hash section -> list of (name, serialized entity) tuples,
+                or the whole serialized section
+
+        Returns:
+            Hex digest of the sha256 checksum.
+        """
+        checksum = hashlib.sha256()
+        for section in sorted(dumps):
+            tmp = dumps[section]
+            if isinstance(tmp, bytes):
+                checksum.update(tmp)
+                continue
+            try:
+                tmp = sorted(tmp, key=lambda x: x[0])
+            except TypeError:
+                # save() would not write such a section anyway:
+                pass
+            checksum.update(section.encode('utf-8') + b':\n')
+            for _, entity in tmp:
+                checksum.update(entity)
+        return checksum.hexdigest()
+
+    def _load_packed(self, buf):
+        """Load the inventory stored in one of machine-oriented formats
+
+        Args:
+            buf: contents of the inventory file
+
+        Returns:
+            True if the checksum stored in the inventory matches its data,
+            False otherwise.
+        """
+        with prof.phase("parse"):
+            meta, data, body = ff.load(self._format, buf)
+        self._check_meta(meta)
+        self._data = {"_meta": meta}
+        for section in ["hosts", "groups", "ippools"]:
+            self._data[section] = data.get(section, {})
+            if not isinstance(self._data[section], dict):
+                msg = "Inventory section {0} is not a mapping".format(section)
+                raise BadDataException(msg)
+        with prof.phase("objects"):
+            self._parse_objects()
+        with prof.phase("checksum"):
+            return meta.get("checksum") == hashlib.sha256(body).hexdigest()
+
+    @staticmethod
+    def _check_meta(meta):
+        """Check if will be able to work with this data"""
+        if meta["version"] < inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT:
+            msg = "Inventory format: {0}, min supported format: {1}".format(
+                  meta["version"],
+                  inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT)
+            logging.debug(msg)
+            raise BadDataException("Inventory data is in unsuported/old " +
+                                   "format, please update your tools")
+
+    @staticmethod
+    def _parse_object(section, raw):
+        """Convert serialized host/group/ippool into an object"""
+        if section == "ippools":
+            return i.IPPool(network=raw["network"],
+                            allocated=raw["allocated"],
+                            reserved=raw["reserved"],)
+        elif section == "hosts":
+            return h.Host(aliases=raw['aliases'],
+                          keyvals=raw['keyvals'],)
+        else:
+            return g.Group(hosts=raw['hosts'],
+                           children=raw['children'],
+                           ippools=raw['ippools'],)
+
+    def _parse_objects(self):
+        """Convert serialized inventory data into objects, in place"""
+        for section in ["ippools", "hosts", "groups"]:
+            logging.debug("Parsing {0} into objects".format(section))
+            for name in self._data[section]:
+                self._data[section][name] = self._parse_object(
+                    section, self._data[section][name])
+
+    def _journal_record(self, op, **kwargs):
+        """Remember a change so that it can be appended to the journal
+
+        Args:
+            op: name of the method that has changed the inventory
+            kwargs: arguments passed to the method, with final values
+        """
+        if self._journal_records is not None:
+            self._journal_records.append(j.Journal.encode(op, **kwargs))
+
+    def _journal_replay(self):
+        """Apply changes stored in the journal on top of loaded data
+
+        Records that can not be applied (i.e. inventory file has been edited
+        by hand) are skipped, and the journal will be compacted during the next
+        save in order to get rid of them.
+
+        Raises:
+            MalformedInputException: a record has been edited by hand and its
+                arguments do not fit the operation
+        """
+        records = self._journal.read()
+        logging.debug("Replaying {0} journal records".format(len(records)))
+        pending, self._journal_records = self._journal_records, None
+        try:
+            for lineno, record in records:
+                try:
+                    op, kwargs = j.Journal.decode(record)
+                    getattr(self, op)(**kwargs)
+                except ScriptException as e:
+                    msg = "Skipping journal record {0}: {1}"
+                    logging.warning(msg.format(record, str(e)))
+                    self._full_save = True
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    msg = "Malformed record in line {0} of journal {1}: {2}: {3}"
+                    raise MalformedInputException(msg.format(
+                        lineno, self._journal.get_path(), type(e).__name__,
+                        str(e))) from e
+        finally:
+            self._journal_records = pending
+
     def _ippool_overlaps(self, other=None):
         """Check if two ip pool overlap
 
@@ -227,6 +427,20 @@ class InventoryData:
                                   host, group))
                     self._data['groups'][group].del_host(host)
 
+    def _alias_owner(self, alias):
+        """Find the host that given alias is assigned to
+
+        Args:
+            alias: normalized name of the alias
+
+        Returns:
+            Name of the host or None if the alias is not assigned to any host.
+        """
+        for host in self._data['hosts']:
+            if self._data['hosts'][host].get_aliases(alias, reporting=False):
+                return host
+        return None
+
     def _ippool_find_and_assign(self, ip):
         """Assign orphaned ips to ip pools
 
@@ -269,6 +483,14 @@ class InventoryData:
         """
         return self._is_recalculated
 
+    def close(self):
+        """Release the resources held by the inventory
+
+        Inventory files are not kept open, so there is nothing to release -
+        the method exists for compatibility with SQLiteInventoryData.
+        """
+        pass
+
     def host_to_groups(self, host):
         """Find groups that given host belongs to."""
         ret = []
@@ -283,13 +505,49 @@ class InventoryData:
         This method makes sure that inventory is sane and coherent by
         calling internal cleanup functions.
         """
-        self._ippool_overlaps()
-        self._ippool_refresh()
-        self._groups_cleanup()
-        self._hosts_cleanup()
+        self._vars_index = None
+        with prof.phase("recalculate"):
+            self._ippool_overlaps()
+            self._ippool_refresh()
+            self._groups_cleanup()
+            self._hosts_cleanup()
         self._is_recalculated = True
 
-    def save(self):
+    def get_hash(self):
+        """Extract data from object in a way suitable for serializing
+
+        Returns:
+            A hash with "ippools", "hosts" and "groups" keys, each containing
+            serialized objects of given type, indexed by their names.
+        """
+        ret = {"ippools": {},
+               "hosts": {},
+               "groups": {},
+               }
+        for ippool in self._data["ippools"]:
+            ret["ippools"][ippool] = self._data["ippools"][ippool].get_hash()
+        for host in self._data['hosts']:
+            ret["hosts"][host] = self._data['hosts'][host].get_hash()
+        for group in self._data['groups']:
+            ret["groups"][group] = self._data['groups'][group].get_hash()
+        return ret
+
+    def load_hash(self, data):
+        """Replace the contents of the inventory with serialized data
+
+        Args:
+            data: a hash in the format returned by get_hash() method
+        """
+        self._data = {"ippools": dict(data["ippools"]),
+                      "hosts": dict(data["hosts"]),
+                      "groups": dict(data["groups"]),
+                      "_meta": self._data["_meta"],
+                      }
+        self._parse_objects()
+        self._vars_index = None
+        self._full_save = True
+
+    def save(self, compact=False):
         """Serialize object and save it in human-readable format
 
         Using .get_hash() methods, iterate over each and every object this
@@ -299,65 +557,143 @@ class InventoryData:
         It should be noted that this approach complicates stuff - pickle module
         could have been used without introducing additional boilerplate, but
         it is desirable to have a way to easily compare the changes using git-diff
-        and allow users to inspect changes introduced by the tool.
+        and allow users to inspect changes introduced by the tool. Inventories
+        that are only ever edited through the tool may use the faster JSON or
+        binary format instead, with the same "_meta" section and checksum.
+
+        If journaling is enabled, only the changes made since the last save are
+        appended to the journal. The whole inventory is written (and the
+        journal removed) only if it has been initialized or recalculated, or
+        when compaction has been requested explicitly.
+
+        Args:
+            compact: fold the journal into the inventory file.
 
         Raises:
             IOError: there has been a problem with saving serialized data.
         """
-        ret = {"ippools": {},
-               "hosts": {},
-               "groups": {},
-               }
-        for ippool in self._data["ippools"]:
-            ret["ippools"][ippool] = self._data["ippools"][ippool].get_hash()
-        for host in self._data['hosts']:
-            ret["hosts"][host] = self._data['hosts'][host].get_hash()
-        for group in self._data['groups']:
-            ret["groups"][group] = self._data['groups'][group].get_hash()
+        if self._journal_records is not None and not \
+                (compact or self._full_save or self._is_recalculated):
+            self._journal.append(self._journal_records)
+            self._journal_records = []
+            return
 
-        tmp = yaml.dump(ret, Dumper=Dumper, encoding='utf-8',
-                        default_flow_style=False)
-        checksum = hashlib.sha256(tmp).hexdigest()
+        with prof.phase("serialize"):
+            if self._format == 'yaml':
+                import inventory_tool.emitter as em
+                tmp = em.dump(self.get_hash())
+            else:
+                tmp = ff.encode(self._format, self.get_hash())
+        with prof.phase("checksum"):
+            checksum = hashlib.sha256(tmp).hexdigest()
         logging.debug("Serialized hosts data is {0} bytes, ".format(len(tmp)) +
                       "checksum is {0}.".format(checksum))
 
-        ret["_meta"] = {"version": inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT,
-                        "checksum": checksum, }
+        meta = {"version": inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT,
+                "checksum": checksum, }
+        if self._format == 'yaml':
+            # "_meta" is the first key of the document, so there is no need to
+            # serialize everything once again:
+            tmp = em.dump({"_meta": meta}) + tmp
+        else:
+            tmp = ff.dump(self._format, meta, tmp)
+
+        with prof.phase("write"):
+            ff.write_atomically(self._inventory_path, tmp)
+        # All the changes are in the inventory file now:
+        self._journal.clear()
+        if self._journal_records is not None:
+            self._journal_records = []
+        self._full_save = False
+
+    @staticmethod
+    def _ansible_hostvars(host, host_obj, str_keywords):
+        """Convert variables of the host into format digestable by ansible"""
+        ret = host_obj.get_ansible_hostvars(str_keywords)
+        # ansible_ssh_host key is mandatory:
+        if "ansible_ssh_host" not in ret:
+            msg = "Host {0} does not provide ".format(host)
+            msg += "ansible_ssh_host variable."
+            raise BadDataException(msg)
+        return ret
 
-        with open(self._inventory_path, 'wb') as fh:
-            yaml.dump(ret, stream=fh, Dumper=Dumper, encoding='utf-8',
-                      default_flow_style=False)
+    @staticmethod
+    def _ansible_str_keywords():
+        """Keys which values are ip objects and have to be passed as strings"""
+        return frozenset(v.KeyWordValidator.get_ipaddress_keywords() +
+                         v.KeyWordValidator.get_ipnetwork_keywords())
 
-    def get_ansible_inventory(self):
-        """Provide inventory data in format digestable by ansible
+    def get_ansible_hostvars(self, host):
+        """Provide variables of a single host in format digestable by ansible
 
-        This function shallow-copies inventory data and reorganizes it in a way
-        that it makes it usable for "--list" option used by ansible. It also masks
-        some internal data that is not needed by Ansible itself, and should be
-        considered private, and it provides "all" group that contains all the
-        host in the inventory.
+        This is what "--host" option of the inventory script returns. Ansible
+        does not use it as long as "--list" output contains "_meta" section,
+        but other tools might.
 
-        Return:
-            A hash that conforms to:
-               http://docs.ansible.com/developing_inventory.html#tuning-the-external-inventory-script
+        Args:
+            host: name of the host
 
-            Please read the document for more details.
+        Returns:
+            A hash with host's variables, just like the one in the
+            "_meta"/"hostvars" section of get_ansible_inventory() output, or an
+            empty hash if there is no such host.
         """
-        ret = {"_meta": {"hostvars": {}}}
-        for host in self._data['hosts']:
-            keyvals = self._data['hosts'][host].get_keyval()
-            # ansible_ssh_host key is mandatory:
-            if "ansible_ssh_host" not in keyvals:
+        try:
+            host_obj = self.host_get(host)
+        except MalformedInputException:
+            return {}
+        return self._ansible_hostvars(host, host_obj,
+                                      self._ansible_str_keywords())
+
+    def iter_ansible_hostvars(self, hosts=None):
+        """Provide variables of all the hosts, one host at a time
+
+        Args:
+            hosts: names of the hosts to provide the variables of, all the
+                hosts by default
+
+        Yields:
+            Tuples (host, hostvars), sorted by the name of the host, with
+            hostvars in the format returned by get_ansible_hostvars().
+
+        Raises:
+            BadDataException: host does not provide ansible_ssh_host variable,
+                raised only when the host is reached.
+        """
+        names = hosts
+        hosts = self._data['hosts']
+        str_keywords = self._ansible_str_keywords()
+        for host in sorted(hosts if names is None else names):
+            yield host, self._ansible_hostvars(host, hosts[host], str_keywords)
+
+    def check_ansible_hosts(self, hosts=None):
+        """Make sure that the hosts can be passed to Ansible
+
+        Lets the callers of iter_ansible_hostvars() report a malformed host
+        before any output has been written.
+
+        Args:
+            hosts: names of the hosts to check, all the hosts by default
+
+        Raises:
+            BadDataException: host does not provide ansible_ssh_host variable
+        """
+        names = hosts
+        hosts = self._data['hosts']
+        for host in sorted(hosts if names is None else names):
+            if hosts[host].get_keyval("ansible_ssh_host", reporting=False) is None:
                 msg = "Host {0} does not provide ".format(host)
                 msg += "ansible_ssh_host variable."
                 raise BadDataException(msg)
-            ret["_meta"]["hostvars"][host] = {}
-            for key in keyvals:
-                if key in v.KeyWordValidator.get_ipaddress_keywords() + \
-                        v.KeyWordValidator.get_ipnetwork_keywords():
-                    ret["_meta"]["hostvars"][host][key] = str(keyvals[key])
-                else:
-                    ret["_meta"]["hostvars"][host][key] = keyvals[key]
+
+    def get_ansible_groups(self):
+        """Provide groups of the inventory in format digestable by ansible
+
+        Returns:
+            A hash with all the groups, including the special "all" group, in
+            the format used by get_ansible_inventory().
+        """
+        ret = {}
         for group in self._data['groups']:
             ret[group] = {"hosts": self._data['groups'][group].get_hosts(),
                           "vars": {},
@@ -366,9 +702,56 @@ class InventoryData:
         ret["all"] = {"hosts": sorted(self._data['hosts']),
                       "vars": {},
                       "children": []}
+        return ret
 
+    def get_ansible_inventory(self):
+        """Provide inventory data in format digestable by ansible
+
+        This function shallow-copies inventory data and reorganizes it in a way
+        that it makes it usable for "--list" option used by ansible. It also masks
+        some internal data that is not needed by Ansible itself, and should be
+        considered private, and it provides "all" group that contains all the
+        host in the inventory.
+
+        Return:
+            A hash that conforms to:
+               http://docs.ansible.com/developing_inventory.html#tuning-the-external-inventory-script
+
+            Please read the document for more details.
+        """
+        ret = self.get_ansible_groups()
+        ret["_meta"] = {"hostvars": dict(self.iter_ansible_hostvars())}
         return ret
 
+    def get_stats(self, top=10):
+        """Compute statistics of the inventory
+
+        Args:
+            top: number of the largest groups to report
+
+        Returns:
+            A hash with following keys:
+            - hosts, aliases, groups, ippools: number of objects of given type
+            - largest_groups: a list of (group, number of hosts) tuples,
+              biggest groups first
+            - pools: usage statistics of each pool, as returned by
+              IPPool.get_stats(), indexed by the pool name
+        """
+        aliases = 0
+        for host in self._data['hosts']:
+            aliases += len(self._data['hosts'][host].get_aliases())
+        sizes = [(group, len(self._data['groups'][group].get_hosts()))
+                 for group in self._data['groups']]
+        sizes.sort(key=lambda x: (-x[1], x[0]))
+        return {"hosts": len(self._data['hosts']),
+                "aliases": aliases,
+                "groups": len(self._data['groups']),
+                "ippools": len(self._data['ippools']),
+                "largest_groups": sizes[:top],
+                "pools": {x: self._data['ippools'][x].get_stats()
+                          for x in self._data['ippools']},
+                }
+
     def ippool_add(self, pool, pool_obj):
         """Add new ip pool object to inventory
 
@@ -382,6 +765,7 @@ class InventoryData:
         self._ippool_overlaps(pool_obj)
         if pool not in self._data['ippools']:
             self._data['ippools'][pool] = pool_obj
+            self._journal_record('ippool_add', pool=pool, pool_obj=pool_obj)
         else:
             raise MalformedInputException("Ippool with name {0}".format(pool) +
                                           "already exists!")
@@ -402,6 +786,7 @@ class InventoryData:
             for group in self._data['groups']:
                 self._data['groups'][group].del_pool_by_pool(pool)
             del self._data['ippools'][pool]
+            self._journal_record('ippool_del', pool=pool)
 
     def ippool_get(self, pool=None):
         """Fetch IPPool object
@@ -443,6 +828,8 @@ class InventoryData:
         else:
             self._data['groups'][group].set_pool(var=pool_related_var,
                                                  name=pool)
+            self._journal_record('ippool_assign', pool=pool, group=group,
+                                 pool_related_var=pool_related_var)
 
     def ippool_revoke(self, pool, group, pool_related_var):
         """Revoke pool from group
@@ -459,6 +846,8 @@ class InventoryData:
             raise MalformedInputException(msg)
         else:
             self._data['groups'][group].del_pool_by_var(var=pool_related_var)
+            self._journal_record('ippool_revoke', pool=pool, group=group,
+                                 pool_related_var=pool_related_var)
 
     def ippool_book_ipaddr(self, pool, ipaddr):
         """Exclude an ip address from the ip pool
@@ -476,6 +865,7 @@ class InventoryData:
             raise MalformedInputException("IP Pool {0} does not exist".format(pool))
         else:
             self._data['ippools'][pool].book(ipaddr)
+            self._journal_record('ippool_book_ipaddr', pool=pool, ipaddr=ipaddr)
 
     def ippool_cancel_ipaddr(self, pool, ipaddr):
         """Cancel exclusion of an ip address from the ip pool
@@ -493,6 +883,8 @@ class InventoryData:
             raise MalformedInputException("IP Pool {0} does not exist".format(pool))
         else:
             self._data['ippools'][pool].cancel(ipaddr)
+            self._journal_record('ippool_cancel_ipaddr', pool=pool,
+                                 ipaddr=ipaddr)
 
     def group_add(self, group):
         """Add a new group to inventory.
@@ -505,6 +897,7 @@ class InventoryData:
         """
         if group not in self._data['groups']:
             self._data['groups'][group] = g.Group()
+            self._journal_record('group_add', group=group)
         else:
             raise MalformedInputException("Group {0} already exists!".format(group))
 
@@ -526,6 +919,7 @@ class InventoryData:
             # list):
             for p_group in self._data['groups']:
                 self._data['groups'][p_group].del_child(group, reporting=False)
+            self._journal_record('group_del', group=group)
         else:
             raise MalformedInputException("Group {0} does not exist!".format(group))
 
@@ -567,6 +961,7 @@ class InventoryData:
         if group in self._data['groups']:
             if child in self._data['groups']:
                 self._data['groups'][group].add_child(child)
+                self._journal_record('group_child_add', group=group, child=child)
             else:
                 msg = "Child group {0} does not exist!".format(child)
                 raise MalformedInputException(msg)
@@ -586,6 +981,7 @@ class InventoryData:
         """
         if group in self._data['groups']:
             self._data['groups'][group].del_child(child)
+            self._journal_record('group_child_del', group=group, child=child)
         else:
             msg = "Group with name {0} does not exist!".format(group)
             raise MalformedInputException(msg)
@@ -605,6 +1001,7 @@ class InventoryData:
             host_n = v.HostnameParser.normalize_hostname(host)
             if host_n in self._data['hosts']:
                 self._data['groups'][group].add_host(host_n)
+                self._journal_record('group_host_add', group=group, host=host_n)
             else:
                 msg = "Host {0} does not exist!".format(host_n)
                 raise MalformedInputException(msg)
@@ -624,6 +1021,7 @@ class InventoryData:
         """
         if group in self._data['groups']:
             self._data['groups'][group].del_host(host)
+            self._journal_record('group_host_del', group=group, host=host)
         else:
             msg = "Group with name {0} does not exist!".format(group)
             raise MalformedInputException(msg)
@@ -669,14 +1067,171 @@ class InventoryData:
         """
         host_n = v.HostnameParser.normalize_hostname(host)
         if host_n not in self._data['hosts']:
-            for tmp in self._data['hosts']:
-                if self._data['hosts'][tmp].get_aliases(alias=host_n, reporting=False):
-                    msg = "Host {0} already has alias with the name of new host"
-                    raise MalformedInputException(msg.format(tmp))
+            tmp = self._alias_owner(host_n)
+            if tmp is not None:
+                msg = "Host {0} already has alias with the name of new host"
+                raise MalformedInputException(msg.format(tmp))
             self._data['hosts'][host_n] = h.Host()
+            self._journal_record('host_add', host=host_n)
         else:
             raise MalformedInputException("Host {0} already exist!".format(host_n))
 
+    def _alias_index(self):
+        """Build alias -> host index of all the hosts"""
+        ret = {}
+        for host in self._data['hosts']:
+            for alias in self._data['hosts'][host].get_aliases():
+                ret[alias] = host
+        return ret
+
+    def _ippool_for_groups(self, groups, key):
+        """Find the ip pool that hosts of given groups get addresses from
+
+        Returns:
+            Name of the pool or None if none of the groups has a pool for the
+            key.
+        """
+        for group in groups:
+            tmp = self._data['groups'][group].get_pool(key)
+            if tmp is not None:
+                return tmp
+        return None
+
+    def host_add_many(self, hosts, groups=[], data=[]):
+        """Add many hosts to inventory, with groups and variables
+
+        Does the same as calling host_add(), group_host_add() and
+        host_set_vars() for each of the hosts, but all the checks are done
+        upfront and each of the ip pools is scanned only once while
+        auto-assigning addresses.
+
+        Args:
+            hosts: names of the new hosts
+            groups: names of the groups all the hosts should be added to
+            data: keyvals all the hosts should get, in the format used by
+                host_set_vars(). Ip address keyvals without a value are
+                auto-assigned from the pool of one of the groups.
+
+        Raises:
+            MalformedInputException: any of the hosts already exists, groups
+                do not exist, there is no pool to auto-assign address from, or
+                an explicit ip address is given to more than one host.
+            GenericException: some ip pool has run out of free addresses.
+        """
+        hosts_n = [v.HostnameParser.normalize_hostname(x) for x in hosts]
+        aliases = self._alias_index()
+        for host_n in hosts_n:
+            if host_n in self._data['hosts']:
+                raise MalformedInputException("Host {0} already exist!".format(host_n))
+            if host_n in aliases:
+                msg = "Host {0} already has alias with the name of new host"
+                raise MalformedInputException(msg.format(aliases[host_n]))
+        if len(set(hosts_n)) != len(hosts_n):
+            raise MalformedInputException("Host names are not unique.")
+        for group in groups:
+            if group not in self._data['groups']:
+                raise MalformedInputException("Group {0} does not exist!".format(group))
+        check_explicit_addresses(hosts_n, data)
+
+        # Values of each keyval, for all the hosts:
+        values = []
+        for keyval in data:
+            if v.KeyWordValidator.is_ipaddress_keyword(keyval["key"]) and \
+                    keyval["val"] is None:
+                ippool = self._ippool_for_groups(groups, keyval["key"])
+                if ippool is None:
+                    msg = "There are no ippools suitable for assigning"
+                    msg += " an IP to " + keyval["key"] + " variable for"
+                    msg += " these hosts"
+                    raise MalformedInputException(msg)
+                values.append(self._data['ippools'][ippool].allocate_many(
+                    len(hosts_n)))
+            else:
+                values.append([keyval["val"]] * len(hosts_n))
+
+        for i, host_n in enumerate(hosts_n):
+            self._data['hosts'][host_n] = h.Host()
+            self._journal_record('host_add', host=host_n)
+            for group in groups:
+                self._data['groups'][group].add_host(host_n)
+                self._journal_record('group_host_add', group=group, host=host_n)
+            if data:
+                host_data = [{"key": x["key"], "val": y[i]}
+                             for x, y in zip(data, values)]
+                for keyval, orig in zip(host_data, data):
+                    if v.KeyWordValidator.is_ipaddress_keyword(keyval["key"]) \
+                            and orig["val"] is not None:
+                        self._ippool_find_and_assign(keyval["val"])
+                    self._vars_index_update(host_n, keyval["key"], keyval["val"])
+                    self._data['hosts'][host_n].set_keyval(keyval)
+                self._journal_record('host_set_vars', host=host_n,
+                                     data=host_data)
+
+    def host_import(self, hosts):
+        """Add many hosts with their aliases and variables
+
+        Meant for importing hosts from other inventories. All the checks are
+        done upfront, and addresses of the hosts are marked as allocated in
+        their ip pools in bulk.
+
+        Args:
+            hosts: a hash host name -> data of the host in the format
+                returned by Host.get_hash()
+
+        Raises:
+            MalformedInputException: any of the hosts or aliases already
+                exists, or some address can not be allocated.
+            BadDataException: some address is malformed
+        """
+        objs = {}
+        taken = self._alias_index()
+        for host in hosts:
+            host_n = v.HostnameParser.normalize_hostname(host)
+            if host_n in self._data['hosts'] or host_n in objs:
+                raise MalformedInputException("Host {0} already exist!".format(host_n))
+            if host_n in taken:
+                msg = "Host {0} already has alias with the name of new host"
+                raise MalformedInputException(msg.format(taken[host_n]))
+            aliases = [v.HostnameParser.normalize_hostname(x)
+                       for x in hosts[host]["aliases"]]
+            for alias in aliases:
+                if alias in taken or alias in self._data['hosts'] or \
+                        alias in objs or alias in hosts:
+                    msg = "Alias {0} is already in use".format(alias)
+                    raise MalformedInputException(msg)
+                taken[alias] = host_n
+            objs[host_n] = h.Host(aliases=aliases, keyvals=hosts[host]["keyvals"])
+
+        # Addresses of each ip pool:
+        ips = {}
+        for host_n, obj in objs.items():
+            for var in v.KeyWordValidator.get_ipaddress_keywords():
+                ip = obj.get_keyval(var, reporting=False)
+                if ip is None:
+                    continue
+                for ippool in self._data["ippools"]:
+                    if ip in self._data["ippools"][ippool]:
+                        ips.setdefault(ippool, []).append(ip)
+                        break
+        for ippool in ips:
+            self._data["ippools"][ippool].allocate_ips(ips[ippool])
+
+        for host_n, obj in objs.items():
+            self._data['hosts'][host_n] = obj
+            if self._vars_index is not None:
+                self._vars_index.add_host(host_n, obj)
+            if self._journal_records is not None:
+                tmp = obj.get_hash()
+                self._journal_record('host_add', host=host_n)
+                for alias in tmp["aliases"]:
+                    self._journal_record('host_alias_add', host=host_n,
+                                         alias=alias)
+                if tmp["keyvals"]:
+                    data = [{"key": x, "val": obj.get_keyval(x)}
+                            for x in sorted(tmp["keyvals"])]
+                    self._journal_record('host_set_vars', host=host_n,
+                                         data=data)
+
     def host_del(self, host):
         """Delete host from inventory
 
@@ -702,10 +1257,55 @@ class InventoryData:
                     if ip is not None and ip in self._data["ippools"][ippool]:
                         self._data["ippools"][ippool].release(ip)
             # And finally remove the host itself
+            if self._vars_index is not None:
+                self._vars_index.remove_host(host_n, self._data['hosts'][host_n])
             del self._data['hosts'][host_n]
+            self._journal_record('host_del', host=host_n)
         else:
             raise MalformedInputException("Host {0} does not exist!".format(host_n))
 
+    def _vars_index_update(self, host, key, val):
+        """Keep the index of variables in sync with a change of a variable
+
+        Needs to be called before the variable is changed.
+
+        Args:
+            host: normalized name of the host
+            key: name of the variable
+            val: new value, None if the variable is being removed
+        """
+        if self._vars_index is None:
+            return
+        old = self._data['hosts'][host].get_keyval(key, reporting=False)
+        if old is not None:
+            self._vars_index.remove(host, key, old)
+        if val is not None:
+            self._vars_index.add(host, key, val)
+
+    def host_find(self, key, val=None, network=None):
+        """Find hosts by the value of their variable
+
+        The index of variables is built the first time this method is called,
+        and then kept up to date by the methods modifying the hosts, so that
+        subsequent searches do not need to go through all the hosts.
+
+        Args:
+            key: name of the variable
+            val: value of the variable, compared in its string form, i.e. as
+                it is written in the inventory file
+            network: ip_network object, find the hosts which variable is an
+                ip address from this network instead
+
+        Returns:
+            A sorted list of host names.
+        """
+        if self._vars_index is None:
+            with prof.phase("vars index"):
+                self._vars_index = vi.VarsIndex(self._data['hosts'])
+        if network is not None:
+            return self._vars_index.find_in_network(key, network)
+        return self._vars_index.find(key, val)
+
     def host_set_vars(self, host, data):
         """Set keyval parameter for a host.
 
@@ -759,7 +1359,10 @@ class InventoryData:
                                 self._data['ippools'][ippool].allocate()
                     else:
                         self._ippool_find_and_assign(keyval["val"])
+                self._vars_index_update(host_n, keyval["key"], keyval["val"])
                 self._data['hosts'][host_n].set_keyval(keyval)
+            # Auto-assigned addresses have been already stored in "data":
+            self._journal_record('host_set_vars', host=host_n, data=data)
         else:
             raise MalformedInputException("Host {0} does not exist!".format(host_n))
 
@@ -785,7 +1388,9 @@ class InventoryData:
                     ip = self._data['hosts'][host_n].get_keyval(key, reporting=False)
                     if ip is not None:
                         self._ippool_find_and_deallocate(ip)
+                self._vars_index_update(host_n, key, None)
                 self._data['hosts'][host_n].del_keyval(key)
+            self._journal_record('host_del_vars', host=host_n, keys=keys)
         else:
             raise MalformedInputException("Host {0} does not exist!".format(host_n))
 
@@ -804,12 +1409,14 @@ class InventoryData:
         if host_n in self._data['hosts']:
             alias_n = v.HostnameParser.normalize_hostname(alias)
             if alias_n not in self._data['hosts']:
-                for tmp in self._data['hosts']:
-                    if self._data['hosts'][tmp].get_aliases(alias_n, reporting=False):
-                        msg = "Alias {0} is already assigned to host {1}"
-                        raise MalformedInputException(msg.format(alias_n, tmp))
+                tmp = self._alias_owner(alias_n)
+                if tmp is not None:
+                    msg = "Alias {0} is already assigned to host {1}"
+                    raise MalformedInputException(msg.format(alias_n, tmp))
                 else:
                     self._data['hosts'][host_n].alias_add(alias_n)
+                    self._journal_record('host_alias_add', host=host_n,
+                                         alias=alias_n)
             else:
                 msg = "There exists host with the same name as an alias {0}."
                 raise MalformedInputException(msg.format(alias_n))
@@ -829,6 +1436,7 @@ class InventoryData:
         host_n = v.HostnameParser.normalize_hostname(host)
         if host_n in self._data['hosts']:
             self._data['hosts'][host_n].alias_del(alias)
+            self._journal_record('host_alias_del', host=host_n, alias=alias)
         else:
             raise MalformedInputException("Host {0} does not exist!".format(host))
 
@@ -840,17 +1448,28 @@ class InventoryData:
             host_new: new hostname
 
         Raises:
-            MalformedInputException: host_old does not exist, or both hostnames
-                are malformed.
+            MalformedInputException: host_old does not exist, host_new already
+                exists or is an alias of some host, or both hostnames are
+                malformed.
         """
         # Sanity checking first:
         if host_old not in self._data['hosts']:
             msg = "Host {0} does not exist, and thus cannot be renamed"
             raise MalformedInputException(msg.format(host_old))
         host_new_n = v.HostnameParser.normalize_hostname(host_new)
+        if host_new_n != host_old and host_new_n in self._data['hosts']:
+            msg = "Host {0} already exists, {1} cannot be renamed"
+            raise MalformedInputException(msg.format(host_new_n, host_old))
+        tmp = self._alias_owner(host_new_n)
+        if tmp is not None:
+            msg = "Host {0} already has alias with the name of new host"
+            raise MalformedInputException(msg.format(tmp))
 
         # First, lets rename it in "hosts" hash:
         self._data['hosts'][host_new_n] = self._data['hosts'].pop(host_old)
+        if self._vars_index is not None:
+            self._vars_index.remove_host(host_old, self._data['hosts'][host_new_n])
+            self._vars_index.add_host(host_new_n, self._data['hosts'][host_new_n])
 
         # And now lets rename all references in groups:
         for group in self._data['groups']:
@@ -860,3 +1479,5 @@ class InventoryData:
                 pass
             else:
                 self._data['groups'][group].add_host(host_new_n)
+        self._journal_record('host_rename', host_old=host_old,
+                             host_new=host_new_n)
@@ -123,6 +123,67 @@ class IPPool:
             msg = "The pool has run out of free ip addresses."
             raise GenericException(msg)
 
+    def allocate_many(self, count):
+        """Allocate next free addresses from the pool in one go
+
+        Gives the same addresses as calling allocate() count times would, but
+        the pool is scanned only once.
+
+        Args:
+            count: number of addresses to allocate
+
+        Returns:
+            A list of allocated ipaddress.ip_address objects.
+
+        Raises:
+            GenericException - pool does not have that many free addresses,
+                nothing is allocated then
+        """
+        cls = getattr(self._network, ipaddress_name_network).__class__
+        ret = []
+        for first, last in self._free_ranges():
+            if len(ret) >= count:
+                break
+            ret.extend(cls(x) for x in
+                       range(first, min(last, first + count - len(ret) - 1) + 1))
+        if len(ret) < count:
+            msg = "The pool has run out of free ip addresses: "
+            msg += "{0} requested, {1} available.".format(count, len(ret))
+            raise GenericException(msg)
+        logging.info("{0} IPs have been auto-assigned.".format(count))
+        self._allocated.extend(ret)
+        return ret
+
+    def allocate_ips(self, ips):
+        """Mark many addresses as allocated in one go
+
+        Does the same checks as allocate() does for each of the addresses,
+        but without scanning the lists of the addresses in use again and
+        again.
+
+        Args:
+            ips: a list of ipaddress.ip_address objects
+
+        Raises:
+            MalformedInputException - any of the addresses can not be
+                allocated, nothing is allocated then
+        """
+        allocated = set(self._allocated)
+        reserved = set(self._reserved)
+        for ip in ips:
+            if ip not in self._network:
+                msg = "Attempt to allocate IP from outside of the pool: "
+                msg += "{0} is not in {1}.".format(ip, self._network)
+                raise MalformedInputException(msg)
+            if ip in allocated:
+                msg = "Attempt to allocate already allocated IP: " + str(ip)
+                raise MalformedInputException(msg)
+            elif ip in reserved:
+                msg = "Attempt to allocate from reserved pool: " + str(ip)
+                raise MalformedInputException(msg)
+            allocated.add(ip)
+        self._allocated.extend(ips)
+
     def release(self, ip):
         """Mark given IP as free, available for allocation.
 
@@ -205,19 +266,142 @@ class IPPool:
             msg = "Could not determine membership of the object {0}".format(other)
             raise MalformedInputException(msg)
 
+    def _usable_range(self):
+        """First and last address that can be auto-allocated, as integers
+
+        Network and broadcast addresses are never handed out, so for the
+        smallest networks the range is empty (last < first).
+        """
+        first = int(getattr(self._network, ipaddress_name_network)) + 1
+        last = int(getattr(self._network, ipaddress_name_broadcast)) - 1
+        return first, last
+
+    def _free_ranges(self):
+        """Find ranges of addresses which are neither allocated nor reserved
+
+        Works on the sorted list of the addresses that are in use, so the cost
+        does not depend on the size of the network.
+
+        Returns:
+            A list of (first, last) tuples of integers, sorted.
+        """
+        first, last = self._usable_range()
+        used = sorted(set(int(x) for x in self._allocated + self._reserved
+                          if first <= int(x) <= last))
+        ret = []
+        for ip in used:
+            if ip > first:
+                ret.append((first, ip - 1))
+            first = ip + 1
+        if first <= last:
+            ret.append((first, last))
+        return ret
+
+    def get_stats(self):
+        """Compute usage statistics of the pool
+
+        Returns:
+            A hash with following keys:
+            - network: network of the pool
+            - size: number of addresses available for allocation, i.e. without
+              the network and broadcast addresses
+            - allocated/reserved: number of allocated/reserved addresses
+            - free: number of addresses that can be still auto-allocated
+            - free_ranges: number of continuous ranges of free addresses
+            - largest_free_range: size of the largest one
+            - fragmentation: 1 - largest_free_range / free, 0 for pools
+              without free addresses
+        """
+        first, last = self._usable_range()
+        ranges = self._free_ranges()
+        free = sum(x[1] - x[0] + 1 for x in ranges)
+        largest = max([x[1] - x[0] + 1 for x in ranges] or [0])
+        return {"network": str(self._network),
+                "size": max(last - first + 1, 0),
+                "allocated": len(self._allocated),
+                "reserved": len(self._reserved),
+                "free": free,
+                "free_ranges": len(ranges),
+                "largest_free_range": largest,
+                "fragmentation": 1 - largest / free if free else 0.0,
+                }
+
+    @staticmethod
+    def _collapse(values):
+        """Collapse integers into ranges of consecutive values
+
+        Returns:
+            A sorted list of (first, last) tuples.
+        """
+        ret = []
+        for value in sorted(set(values)):
+            if ret and ret[-1][1] == value - 1:
+                ret[-1] = (ret[-1][0], value)
+            else:
+                ret.append((value, value))
+        return ret
+
+    def get_ranges(self, kind):
+        """Get allocated, reserved or free addresses as collapsed ranges
+
+        Free ranges are computed from the addresses in use, so the network is
+        never enumerated.
+
+        Args:
+            kind: one of "allocated", "reserved", "free"
+
+        Returns:
+            A sorted list of (first, last) tuples of ip address objects,
+            first == last for single addresses.
+        """
+        if kind == "free":
+            ranges = self._free_ranges()
+        elif kind == "allocated":
+            ranges = self._collapse(int(x) for x in self._allocated)
+        elif kind == "reserved":
+            ranges = self._collapse(int(x) for x in self._reserved)
+        else:
+            raise ValueError("Unknown kind of ip ranges: {0}".format(kind))
+        # ip_address() would treat small integers as IPv4 addresses:
+        cls = getattr(self._network, ipaddress_name_network).__class__
+        return [(cls(x), cls(y)) for x, y in ranges]
+
+    def describe(self, free=False, limit=None, offset=0):
+        """Present object in human-readable form, with addresses collapsed
+
+        Args:
+            free: list free ranges instead of the allocated and reserved ones
+            limit: maximum number of ranges listed in each section, None if
+                all of them should be listed
+            offset: number of ranges to skip at the beginning of each section
+        """
+        stats = self.get_stats()
+        lines = ["Network: {0}".format(self._network),
+                 "Size: {0}, allocated: {1}, reserved: {2}, free: {3}".format(
+                     stats["size"], stats["allocated"], stats["reserved"],
+                     stats["free"])]
+        for kind in (["free"] if free else ["allocated", "reserved"]):
+            lines.append(kind.capitalize() + ":")
+            ranges = self.get_ranges(kind)
+            if not ranges:
+                lines.append("\t<None>")
+                continue
+            end = len(ranges) if limit is None else offset + limit
+            shown = ranges[offset:end]
+            for first, last in shown:
+                if first == last:
+                    lines.append("\t- {0}".format(first))
+                else:
+                    lines.append("\t- {0}-{1}".format(first, last))
+            if len(shown) < len(ranges):
+                if shown:
+                    lines.append("\t(ranges {0}-{1} of {2})".format(
+                        offset + 1, offset + len(shown), len(ranges)))
+                else:
+                    lines.append("\t(no ranges after offset {0}, {1} in total)".format(
+                        offset, len(ranges)))
+        return "\n".join(lines) + "\n"
+
     def __str__(self):
         """Present object in human-readable form"""
-        msg = "Network: {0}\n".format(self._network)
-        msg += "Allocated:\n"
-        if self._allocated:
-            for tmp in self._allocated:
-                msg += "\t- {0}\n".format(tmp)
-        else:
-            msg += "\t<None>\n"
-        msg += "Reserved:\n"
-        if self._reserved:
-            for tmp in self._reserved:
-                msg += "\t- {0}\n".format(tmp)
-        else:
-            msg += "\t<None>\n"
-        return msg
+        return self.describe()
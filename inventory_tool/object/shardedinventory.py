@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import errno
+import hashlib
+import logging
+import os
+
+import inventory_tool
+import inventory_tool.emitter as em
+import inventory_tool.fileformat as ff
+import inventory_tool.loader as ld
+import inventory_tool.object.host as h
+import inventory_tool.object.inventory as iv
+from inventory_tool.exception import BadDataException, MalformedInputException
+
+MANIFEST_NAME = 'manifest.yml'
+GROUPS_SHARD = 'groups.yml'
+IPPOOLS_SHARD = 'ippools.yml'
+HOSTS_DIR = 'hosts'
+
+
+def _checksum(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def host_shard(host):
+    """Name of the shard given host is stored in
+
+    Shards are picked basing on the hash of the hostname instead of i.e. its
+    first letters, as hostnames tend to share common prefixes.
+    """
+    digest = hashlib.sha1(host.encode('utf-8')).hexdigest()
+    return HOSTS_DIR + '/' + digest[:2] + '.yml'
+
+
+class _HostShards:
+    """Hosts mapping that loads shards on demand
+
+    Only the subset of the dict interface used by InventoryData is provided.
+    Looking up a single host loads only the shard it belongs to, iterating
+    over the mapping loads all of them. Checksum of each shard is verified
+    when the shard is loaded.
+    """
+
+    __slots__ = ['_base_path', '_shards', '_hosts', '_loaded', '_aliases',
+                 '_checksums', '_on_mismatch']
+
+    def __init__(self, base_path, shards, aliases, checksums=None,
+                 on_mismatch=None):
+        """Build a new _HostShards object
+
+        Args:
+            base_path: directory where the sharded inventory is stored
+            shards: names of host shards that exist on disk
+            aliases: alias -> host index of hosts stored on disk
+            checksums: shard -> checksum hash, with the checksums recorded in
+                the manifest. Updated in place with the real checksums of the
+                shards that turn out to differ.
+            on_mismatch: function called with the name of the shard when its
+                checksum differs from the recorded one, after its hosts have
+                been loaded
+        """
+        self._base_path = base_path
+        self._shards = set(shards)
+        self._hosts = {}
+        self._loaded = set()
+        self._aliases = aliases
+        self._checksums = {} if checksums is None else checksums
+        self._on_mismatch = on_mismatch
+
+    def _load(self, shard):
+        if shard in self._loaded:
+            return
+        self._loaded.add(shard)
+        if shard not in self._shards:
+            return
+        logging.debug("Loading shard {0}".format(shard))
+        with open(os.path.join(self._base_path, shard), 'rb') as fh:
+            buf = fh.read()
+        data = ld.load(buf)
+        for host in data:
+            self._hosts[host] = h.Host(aliases=data[host]['aliases'],
+                                       keyvals=data[host]['keyvals'])
+        checksum = _checksum(buf)
+        if self._checksums.get(shard) != checksum:
+            self._checksums[shard] = checksum
+            if self._on_mismatch is not None:
+                self._on_mismatch(shard)
+
+    def load_all(self):
+        """Load all the shards that have not been loaded yet"""
+        for shard in self._shards - self._loaded:
+            self._load(shard)
+
+    def clear(self):
+        """Remove all hosts, shards will be removed during save"""
+        self.load_all()
+        self._hosts.clear()
+
+    def __contains__(self, host):
+        self._load(host_shard(host))
+        return host in self._hosts
+
+    def __getitem__(self, host):
+        self._load(host_shard(host))
+        return self._hosts[host]
+
+    def __setitem__(self, host, obj):
+        self._load(host_shard(host))
+        self._hosts[host] = obj
+
+    def __delitem__(self, host):
+        self._load(host_shard(host))
+        del self._hosts[host]
+
+    def pop(self, host):
+        self._load(host_shard(host))
+        return self._hosts.pop(host)
+
+    def __iter__(self):
+        self.load_all()
+        # Callers rename hosts while iterating:
+        return iter(list(self._hosts))
+
+    def __len__(self):
+        self.load_all()
+        return len(self._hosts)
+
+    def alias_owner(self, alias):
+        """Find the host given alias is assigned to, without loading shards
+
+        Returns:
+            Name of the host or None if the alias is not assigned to any host.
+        """
+        for host in self._hosts:
+            if self._hosts[host].get_aliases(alias, reporting=False):
+                return host
+        owner = self._aliases.get(alias)
+        if owner is not None and host_shard(owner) not in self._loaded:
+            return owner
+        return None
+
+    def get_aliases(self):
+        """Alias -> host index of all the hosts, loaded or not"""
+        ret = {x: self._aliases[x] for x in self._aliases
+               if host_shard(self._aliases[x]) not in self._loaded}
+        for host in self._hosts:
+            for alias in self._hosts[host].get_aliases():
+                ret[alias] = host
+        return ret
+
+    def get_loaded_shards(self):
+        """Hosts of all the shards that have been loaded
+
+        Returns:
+            A hash shard name -> {hostname: Host object}, shards with no hosts
+            left are included as well.
+        """
+        ret = {x: {} for x in self._loaded}
+        for host in self._hosts:
+            ret.setdefault(host_shard(host), {})[host] = self._hosts[host]
+        return ret
+
+
+class ShardedInventoryData(iv.InventoryData):
+    """Inventory split into multiple YAML files.
+
+    The inventory is stored in a directory with following layout:
+    - manifest.yml: format version, checksums of all the shards and an index
+      of host aliases
+    - groups.yml, ippools.yml: all the groups and ip pools
+    - hosts/<xx>.yml: hosts, split into up to 256 shards basing on the hash
+      of the hostname
+
+    Groups and ip pools are always loaded, host shards only when a host stored
+    in them is accessed, so commands working with a couple of hosts do not need
+    to parse the whole inventory. save() re-writes only the shards which
+    contents have changed. Smaller files also mean fewer merge conflicts when
+    the inventory is kept in a repository.
+
+    Just like with the single-file inventory, a checksum mismatch of any of the
+    shards means that the inventory has been edited by hand and needs to be
+    recalculated, which requires loading all the shards. Host shards are
+    verified when they are loaded, so the inventory may turn out to need the
+    recalculation only when an edited host is accessed.
+    """
+
+    __slots__ = ['_checksums']
+
+    def __init__(self, inventory_path, initialize=False):
+        """Build a new ShardedInventoryData object
+
+        Args:
+            inventory_path: directory where the inventory is stored
+            initialize: defines whether an empty inventory should be created
+                or already existing one loaded.
+
+        Raises:
+            BadDataException: stored inventory is malformed and cannot be read.
+            MalformedInputException: stored inventory has some incoherent data
+        """
+        # All the shards are YAML documents:
+        self._init_state(inventory_path, initialize, 'yaml')
+        self._journal = None
+        self._journal_records = None
+        self._checksums = {}
+        self._data = {"hosts": _HostShards(inventory_path, [], {}),
+                      "groups": {},
+                      "ippools": {},
+                      "_meta": {"version": inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT},
+                      }
+        if initialize:
+            return
+        try:
+            manifest = self._read(MANIFEST_NAME)
+            hosts_dir = os.path.join(inventory_path, HOSTS_DIR)
+            shards = [HOSTS_DIR + '/' + x for x in os.listdir(hosts_dir)
+                      if x.endswith('.yml')]
+            data = {x: self._read(x) for x in [GROUPS_SHARD, IPPOOLS_SHARD]}
+        except (OSError, IOError) as e:
+            msg = "Failed to open {0}: {1}"
+            raise MalformedInputException(msg.format(inventory_path, str(e)))
+        manifest = ld.load(manifest)
+        if manifest["_meta"]["version"] < \
+                inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT:
+            raise BadDataException("Inventory data is in unsuported/old " +
+                                   "format, please update your tools")
+        self._data["_meta"] = manifest["_meta"]
+        # Host shards are read and verified only when needed, until then the
+        # checksums from the manifest are assumed to be right:
+        recorded = manifest["checksums"]
+        self._checksums = {x: recorded.get(x) for x in shards}
+        for shard in data:
+            self._checksums[shard] = _checksum(data[shard])
+        self._data["hosts"] = _HostShards(inventory_path, shards,
+                                          manifest["aliases"], self._checksums,
+                                          self._shard_mismatch)
+        for key, shard in [("groups", GROUPS_SHARD), ("ippools", IPPOOLS_SHARD)]:
+            self._data[key] = ld.load(data[shard])
+        self._parse_objects()
+        # Check if somebody did not mess with the inventory. Shards that have
+        # been added or removed by hand are detected here, edited ones - when
+        # they are loaded:
+        if recorded != self._checksums:
+            logging.warning("Shard checksum mismatch, manual edition detected!")
+            self._recalculate_once()
+        logging.debug("Inventory {0} has been loaded.".format(inventory_path))
+
+    def _shard_mismatch(self, shard):
+        logging.warning("Shard {0} checksum mismatch, ".format(shard) +
+                        "manual edition detected!")
+        self._recalculate_once()
+
+    def _recalculate_once(self):
+        # Recalculation loads all the shards, the ones that have been edited
+        # must not trigger it again:
+        if not self._is_recalculated:
+            self._is_recalculated = True
+            self.recalculate_inventory()
+
+    def _read(self, name):
+        with open(os.path.join(self._inventory_path, name), 'rb') as fh:
+            return fh.read()
+
+    def _write(self, name, data):
+        ff.write_atomically(os.path.join(self._inventory_path, name), data)
+
+    def _parse_objects(self):
+        """Convert serialized groups and ip pools into objects, in place
+
+        Hosts are parsed when their shards are loaded, unless they were set
+        in serialized form by load_hash().
+        """
+        hosts, self._data["hosts"] = self._data["hosts"], {}
+        super()._parse_objects()
+        self._data["hosts"] = hosts
+
+    def _alias_owner(self, alias):
+        return self._data['hosts'].alias_owner(alias)
+
+    def _alias_index(self):
+        return self._data['hosts'].get_aliases()
+
+    def load_hash(self, data):
+        """Replace the contents of the inventory with serialized data
+
+        Args:
+            data: a hash in the format returned by get_hash() method
+        """
+        self._data["hosts"].clear()
+        for host in data["hosts"]:
+            self._data["hosts"][host] = h.Host(
+                aliases=data["hosts"][host]['aliases'],
+                keyvals=data["hosts"][host]['keyvals'],
+                )
+        self._data["groups"] = dict(data["groups"])
+        self._data["ippools"] = dict(data["ippools"])
+        self._parse_objects()
+        self._vars_index = None
+        self._full_save = True
+
+    def export_yaml(self, path):
+        """Save the inventory as a single-file YAML inventory
+
+        Args:
+            path: path of the YAML file
+
+        Raises:
+            IOError: there has been a problem with saving serialized data.
+        """
+        tmp = iv.InventoryData(path, initialize=True)
+        tmp.load_hash(self.get_hash())
+        tmp.save()
+
+    def import_yaml(self, path):
+        """Replace the contents of the inventory with single-file YAML inventory
+
+        Args:
+            path: path of the YAML file
+        """
+        self.load_hash(iv.InventoryData(path).get_hash())
+
+    def save(self, compact=False):
+        """Re-write the shards that have changed and the manifest
+
+        Args:
+            compact: check all the shards, not only the loaded ones.
+
+        Raises:
+            IOError: there has been a problem with saving serialized data.
+        """
+        hosts = self._data["hosts"]
+        if compact:
+            hosts.load_all()
+        shards = {}
+        for key, shard in [("groups", GROUPS_SHARD), ("ippools", IPPOOLS_SHARD)]:
+            shards[shard] = {x: self._data[key][x].get_hash()
+                             for x in self._data[key]}
+        loaded = hosts.get_loaded_shards()
+        for shard in loaded:
+            shards[shard] = {x: loaded[shard][x].get_hash() for x in loaded[shard]}
+
+        try:
+            os.makedirs(os.path.join(self._inventory_path, HOSTS_DIR))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        written = 0
+        for shard in sorted(shards):
+            if not shards[shard] and shard.startswith(HOSTS_DIR):
+                if shard in self._checksums:
+                    os.unlink(os.path.join(self._inventory_path, shard))
+                    del self._checksums[shard]
+                    written += 1
+                continue
+            data = em.dump(shards[shard])
+            checksum = _checksum(data)
+            if self._checksums.get(shard) != checksum:
+                self._write(shard, data)
+                self._checksums[shard] = checksum
+                written += 1
+        logging.debug("{0} shards have been written".format(written))
+        if compact or self._full_save or self._is_recalculated:
+            # Get rid of the shards left by the previous inventory:
+            for name in os.listdir(os.path.join(self._inventory_path, HOSTS_DIR)):
+                if HOSTS_DIR + '/' + name not in self._checksums:
+                    os.unlink(os.path.join(self._inventory_path, HOSTS_DIR, name))
+
+        if written or self._full_save or self._is_recalculated:
+            manifest = {"_meta": {"version": self._data["_meta"]["version"]},
+                        "checksums": self._checksums,
+                        "aliases": hosts.get_aliases(),
+                        }
+            self._write(MANIFEST_NAME, em.dump(manifest))
+        self._full_save = False
@@ -0,0 +1,1180 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import contextlib
+import logging
+import os
+import sqlite3
+
+import inventory_tool
+import inventory_tool.object.group as g
+import inventory_tool.object.host as h
+import inventory_tool.object.inventory as iv
+import inventory_tool.object.ippool as i
+import inventory_tool.validators as v
+from inventory_tool.exception import BadDataException, MalformedInputException
+
+# For Python3 < 3.3, ipaddress module is available as an extra module,
+# under a different name:
+try:
+    from ipaddress import ip_address
+except ImportError:
+    from ipaddr import IPAddress as ip_address
+
+# "groups" is a keyword in newer SQLite versions, hence the "grp" prefix.
+_SCHEMA = """
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value NOT NULL
+);
+CREATE TABLE ippools (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    network TEXT NOT NULL
+);
+CREATE TABLE ippool_addresses (
+    pool_id INTEGER NOT NULL REFERENCES ippools(id) ON DELETE CASCADE,
+    state TEXT NOT NULL CHECK (state IN ('allocated', 'reserved')),
+    address TEXT NOT NULL,
+    PRIMARY KEY (pool_id, state, address)
+);
+CREATE TABLE hosts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE keyvals (
+    host_id INTEGER NOT NULL REFERENCES hosts(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value NOT NULL,
+    PRIMARY KEY (host_id, key)
+);
+CREATE INDEX keyvals_key_value ON keyvals (key, value);
+CREATE TABLE aliases (
+    host_id INTEGER NOT NULL REFERENCES hosts(id) ON DELETE CASCADE,
+    alias TEXT NOT NULL UNIQUE
+);
+CREATE INDEX aliases_host ON aliases (host_id);
+CREATE TABLE grp (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE grp_hosts (
+    group_id INTEGER NOT NULL REFERENCES grp(id) ON DELETE CASCADE,
+    host_id INTEGER NOT NULL REFERENCES hosts(id) ON DELETE CASCADE,
+    PRIMARY KEY (group_id, host_id)
+);
+CREATE INDEX grp_hosts_host ON grp_hosts (host_id);
+CREATE TABLE grp_children (
+    group_id INTEGER NOT NULL REFERENCES grp(id) ON DELETE CASCADE,
+    child_id INTEGER NOT NULL REFERENCES grp(id) ON DELETE CASCADE,
+    PRIMARY KEY (group_id, child_id)
+);
+CREATE INDEX grp_children_child ON grp_children (child_id);
+CREATE TABLE grp_ippools (
+    group_id INTEGER NOT NULL REFERENCES grp(id) ON DELETE CASCADE,
+    var TEXT NOT NULL,
+    pool_id INTEGER NOT NULL REFERENCES ippools(id) ON DELETE CASCADE,
+    PRIMARY KEY (group_id, var)
+);
+CREATE INDEX grp_ippools_pool ON grp_ippools (pool_id);
+"""
+
+_TABLES = ['grp_ippools', 'grp_children', 'grp_hosts', 'grp', 'aliases',
+           'keyvals', 'hosts', 'ippool_addresses', 'ippools', 'meta']
+
+
+def _db_value(val):
+    """Convert keyval's value into something SQLite can store
+
+    Integers and strings are stored as-is, ip addresses and networks as
+    strings - Host objects will convert them back basing on the key.
+    """
+    if isinstance(val, (int, str)):
+        return val
+    return str(val)
+
+
+class SQLiteInventoryData:
+    """Inventory stored in SQLite database.
+
+    This class provides the same interface as InventoryData, but instead of
+    loading and re-writing the whole YAML document, each operation is mapped
+    to indexed queries. All the changes made since the inventory has been
+    opened are kept in a single transaction, which is committed by save(),
+    so just like with InventoryData nothing is persisted unless save() is
+    called. Each method is executed in its own savepoint, so a failed method
+    does not leave partial changes behind.
+
+    Objects returned by *_get methods are snapshots of the database contents,
+    modifying them does not change the inventory.
+
+    The human-readable YAML file can still be kept in the repository for
+    reviewing the changes - see export_yaml()/import_yaml() methods.
+    """
+
+    __slots__ = ['_inventory_path', '_db', '_is_recalculated']
+
+    def __init__(self, inventory_path, initialize=False):
+        """Open SQLite inventory
+
+        Args:
+            inventory_path: path to the SQLite database
+            initialize: defines whether an empty inventory should be created
+                or already existing one used.
+
+        Raises:
+            BadDataException: stored inventory is malformed and cannot be read.
+            MalformedInputException: inventory file does not exist
+        """
+        self._inventory_path = inventory_path
+        self._is_recalculated = False
+        if not initialize and not os.path.exists(inventory_path):
+            msg = "Failed to open {0}: file does not exist"
+            raise MalformedInputException(msg.format(inventory_path))
+        self._db = None
+        try:
+            # Transactions are managed explicitly:
+            self._db = sqlite3.connect(inventory_path, isolation_level=None)
+            self._db.execute("PRAGMA foreign_keys = ON")
+            # Let readers (i.e. --list) work on a snapshot instead of blocking
+            # the commit:
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("BEGIN")
+            if initialize:
+                self._create_schema()
+            version = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.DatabaseError as e:
+            if self._db is not None:
+                self._db.close()
+            msg = "Inventory {0} is not a proper SQLite inventory: {1}"
+            raise BadDataException(msg.format(inventory_path, str(e)))
+        if version is None or \
+                version[0] < inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT:
+            self._db.close()
+            raise BadDataException("Inventory data is in unsuported/old " +
+                                   "format, please update your tools")
+        logging.debug("Inventory {0} has been opened.".format(inventory_path))
+
+    def _create_schema(self):
+        """Drop all the data and create empty tables"""
+        for table in _TABLES:
+            self._db.execute("DROP TABLE IF EXISTS " + table)
+        for statement in _SCHEMA.split(';'):
+            if statement.strip():
+                self._db.execute(statement)
+        self._db.execute("INSERT INTO meta (key, value) VALUES ('version', ?)",
+                         (inventory_tool.MIN_SUPPORTED_INVENTORY_FORMAT,))
+
+    @contextlib.contextmanager
+    def _savepoint(self):
+        """Make the enclosed statements atomic"""
+        self._db.execute("SAVEPOINT op")
+        try:
+            yield
+        except:
+            self._db.execute("ROLLBACK TO op")
+            self._db.execute("RELEASE op")
+            raise
+        else:
+            self._db.execute("RELEASE op")
+
+    def _fetch_id(self, table, name):
+        row = self._db.execute("SELECT id FROM {0} WHERE name = ?".format(table),
+                               (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def _alias_owner(self, alias):
+        """Name of the host given alias is assigned to, or None"""
+        row = self._db.execute(
+            "SELECT h.name FROM aliases a JOIN hosts h ON h.id = a.host_id " +
+            "WHERE a.alias = ?", (alias,)).fetchone()
+        return None if row is None else row[0]
+
+    def _host_id(self, host):
+        host_id = self._fetch_id('hosts', host)
+        if host_id is None:
+            raise MalformedInputException("Host {0} does not exist!".format(host))
+        return host_id
+
+    def _group_id(self, group):
+        group_id = self._fetch_id('grp', group)
+        if group_id is None:
+            raise MalformedInputException("Group {0} does not exist!".format(group))
+        return group_id
+
+    def _pool_id(self, pool):
+        pool_id = self._fetch_id('ippools', pool)
+        if pool_id is None:
+            raise MalformedInputException("IP Pool {0} does not exist".format(pool))
+        return pool_id
+
+    def _ippool_load(self, pool_id):
+        """Build IPPool object basing on the database contents"""
+        network = self._db.execute("SELECT network FROM ippools WHERE id = ?",
+                                   (pool_id,)).fetchone()[0]
+        addresses = {"allocated": [], "reserved": []}
+        for state, address in self._db.execute(
+                "SELECT state, address FROM ippool_addresses WHERE pool_id = ?",
+                (pool_id,)):
+            addresses[state].append(address)
+        return i.IPPool(network=network, allocated=addresses["allocated"],
+                        reserved=addresses["reserved"])
+
+    def _ippool_find(self, ip):
+        """Find the id of the ip pool that contains given ip, None otherwise"""
+        for pool_id, network in self._db.execute(
+                "SELECT id, network FROM ippools").fetchall():
+            if ip in i.IPPool(network):
+                return pool_id
+        return None
+
+    def _ippool_find_and_assign(self, ip):
+        """Mark the ip as allocated in the ip pool it belongs to, if any"""
+        if isinstance(ip, str):
+            ip = ip_address(ip)
+        pool_id = self._ippool_find(ip)
+        if pool_id is not None:
+            self._ippool_load(pool_id).allocate(ip)
+            self._db.execute("INSERT INTO ippool_addresses (pool_id, state, " +
+                             "address) VALUES (?, 'allocated', ?)",
+                             (pool_id, str(ip)))
+
+    def _ippool_find_and_deallocate(self, ip):
+        """Release the ip from the ip pool it belongs to, if any"""
+        pool_id = self._ippool_find(ip)
+        if pool_id is not None:
+            self._ippool_load(pool_id).release(ip)
+            self._db.execute("DELETE FROM ippool_addresses WHERE pool_id = ? " +
+                             "AND state = 'allocated' AND address = ?",
+                             (pool_id, str(ip)))
+
+    def _host_ipaddrs(self, host_id):
+        """Fetch the values of all ip address keyvals of the host"""
+        ret = []
+        for key, val in self._db.execute(
+                "SELECT key, value FROM keyvals WHERE host_id = ?", (host_id,)):
+            if v.KeyWordValidator.is_ipaddress_keyword(key):
+                ret.append(ip_address(val))
+        return ret
+
+    def is_recalculated(self):
+        """Check if inventory was recalculated.
+
+        Returns:
+            True if inventory was recalculated and need saving, False
+            otherwise.
+        """
+        return self._is_recalculated
+
+    def host_to_groups(self, host):
+        """Find groups that given host belongs to."""
+        host_n = v.HostnameParser.normalize_hostname(host)
+        return [x[0] for x in self._db.execute(
+            "SELECT g.name FROM grp g JOIN grp_hosts gh ON gh.group_id = g.id " +
+            "JOIN hosts h ON h.id = gh.host_id WHERE h.name = ? ORDER BY g.name",
+            (host_n,))]
+
+    def recalculate_inventory(self):
+        """Recheck/recalaculate inventory
+
+        Stale group members and child groups can not exist thanks to foreign
+        keys, so only ip pools and host names need to be verified.
+        """
+        with self._savepoint():
+            pools = {}
+            for pool_id, name in self._db.execute("SELECT id, name FROM ippools"):
+                pools[pool_id] = (name, self._ippool_load(pool_id))
+            # Overlapping ip pools:
+            tmp = list(pools.values())
+            for x in range(len(tmp) - 1):
+                for y in range(x + 1, len(tmp)):
+                    if tmp[x][1].overlaps(tmp[y][1]):
+                        msg = "Ippool {0} overlaps with {1}"
+                        raise BadDataException(msg.format(tmp[x][0], tmp[y][0]))
+            # Ip pools usage:
+            logging.info("Recalculating ip pools usage")
+            self._db.execute("DELETE FROM ippool_addresses " +
+                             "WHERE state = 'allocated'")
+            for pool_id in pools:
+                pools[pool_id][1].release_all()
+            for key, val in self._db.execute(
+                    "SELECT key, value FROM keyvals").fetchall():
+                if not v.KeyWordValidator.is_ipaddress_keyword(key):
+                    continue
+                for pool_id in pools:
+                    if val in pools[pool_id][1]:
+                        pools[pool_id][1].allocate(ip_address(val))
+                        self._db.execute(
+                            "INSERT INTO ippool_addresses (pool_id, state, " +
+                            "address) VALUES (?, 'allocated', ?)",
+                            (pool_id, str(ip_address(val))))
+            # Host names and aliases:
+            logging.info("Normalizing host names and aliases")
+            for host_id, alias in self._db.execute(
+                    "SELECT host_id, alias FROM aliases").fetchall():
+                alias_n = v.HostnameParser.normalize_hostname(alias)
+                if alias != alias_n:
+                    msg = "Non-standard alias detected: {0} vs {1}, fixing"
+                    logging.warning(msg.format(alias, alias_n))
+                    self._db.execute("UPDATE aliases SET alias = ? WHERE " +
+                                     "alias = ?", (alias_n, alias))
+            for (host,) in self._db.execute("SELECT name FROM hosts").fetchall():
+                host_n = v.HostnameParser.normalize_hostname(host)
+                if host != host_n:
+                    msg = "Non-standard hostname detected: {0} vs {1}, renaming"
+                    logging.warning(msg.format(host, host_n))
+                    self.host_rename(host, host_n)
+        self._is_recalculated = True
+
+    def save(self, compact=False):
+        """Commit all the changes made to the inventory
+
+        Args:
+            compact: additionally, rebuild the database file in order to
+                reclaim unused space.
+
+        Raises:
+            IOError: there has been a problem with saving the data.
+        """
+        try:
+            self._db.execute("COMMIT")
+            if compact:
+                self._db.execute("VACUUM")
+            self._db.execute("BEGIN")
+        except sqlite3.Error as e:
+            raise IOError(str(e))
+
+    def rollback(self):
+        """Discard all the changes made since the last save()"""
+        self._db.execute("ROLLBACK")
+        self._db.execute("BEGIN")
+
+    def close(self):
+        """Close the database, changes made since the last save() are discarded
+
+        The object can not be used afterwards.
+        """
+        self._db.close()
+
+    def get_hash(self):
+        """Extract data from the database in a way suitable for serializing
+
+        Returns:
+            A hash in the same format as InventoryData.get_hash() does.
+        """
+        ret = {"ippools": {}, "hosts": {}, "groups": {}}
+        pools = {}
+        for pool_id, name, network in self._db.execute(
+                "SELECT id, name, network FROM ippools"):
+            pools[pool_id] = name
+            ret["ippools"][name] = {"network": network, "allocated": [],
+                                    "reserved": []}
+        for pool_id, state, address in self._db.execute(
+                "SELECT pool_id, state, address FROM ippool_addresses"):
+            ret["ippools"][pools[pool_id]][state].append(address)
+        hosts = {}
+        for host_id, name in self._db.execute("SELECT id, name FROM hosts"):
+            hosts[host_id] = name
+            ret["hosts"][name] = {"aliases": [], "keyvals": {}}
+        for host_id, alias in self._db.execute(
+                "SELECT host_id, alias FROM aliases"):
+            ret["hosts"][hosts[host_id]]["aliases"].append(alias)
+        for host_id, key, val in self._db.execute(
+                "SELECT host_id, key, value FROM keyvals"):
+            ret["hosts"][hosts[host_id]]["keyvals"][key] = str(val)
+        groups = {}
+        for group_id, name in self._db.execute("SELECT id, name FROM grp"):
+            groups[group_id] = name
+            ret["groups"][name] = {"hosts": [], "children": [], "ippools": {}}
+        for group_id, host_id in self._db.execute(
+                "SELECT group_id, host_id FROM grp_hosts"):
+            ret["groups"][groups[group_id]]["hosts"].append(hosts[host_id])
+        for group_id, child_id in self._db.execute(
+                "SELECT group_id, child_id FROM grp_children"):
+            ret["groups"][groups[group_id]]["children"].append(groups[child_id])
+        for group_id, var, pool_id in self._db.execute(
+                "SELECT group_id, var, pool_id FROM grp_ippools"):
+            ret["groups"][groups[group_id]]["ippools"][var] = pools[pool_id]
+        for section in ret.values():
+            for item in section.values():
+                for key in item:
+                    if isinstance(item[key], list):
+                        item[key].sort()
+        return ret
+
+    def load_hash(self, data):
+        """Replace the contents of the inventory with serialized data
+
+        Args:
+            data: a hash in the format returned by get_hash() method
+        """
+        with self._savepoint():
+            self._create_schema()
+            db = self._db
+            pools = {}
+            for name in data["ippools"]:
+                pool = data["ippools"][name]
+                pools[name] = db.execute(
+                    "INSERT INTO ippools (name, network) VALUES (?, ?)",
+                    (name, pool["network"])).lastrowid
+                for state in ["allocated", "reserved"]:
+                    db.executemany(
+                        "INSERT INTO ippool_addresses (pool_id, state, address) " +
+                        "VALUES (?, ?, ?)",
+                        [(pools[name], state, x) for x in pool[state]])
+            hosts = {}
+            for name in data["hosts"]:
+                host = h.Host(aliases=data["hosts"][name]["aliases"],
+                              keyvals=data["hosts"][name]["keyvals"])
+                hosts[name] = db.execute("INSERT INTO hosts (name) VALUES (?)",
+                                         (name,)).lastrowid
+                keyvals = host.get_keyval()
+                db.executemany("INSERT INTO aliases (host_id, alias) VALUES (?, ?)",
+                               [(hosts[name], x) for x in keyvals.pop('aliases')])
+                db.executemany("INSERT INTO keyvals (host_id, key, value) " +
+                               "VALUES (?, ?, ?)",
+                               [(hosts[name], x, _db_value(keyvals[x]))
+                                for x in keyvals])
+            groups = {}
+            for name in data["groups"]:
+                groups[name] = db.execute("INSERT INTO grp (name) VALUES (?)",
+                                          (name,)).lastrowid
+            for name in data["groups"]:
+                group = data["groups"][name]
+                # Stale entries are silently dropped, just like the
+                # recalculation of YAML inventory would do:
+                db.executemany("INSERT INTO grp_hosts (group_id, host_id) " +
+                               "VALUES (?, ?)",
+                               [(groups[name], hosts[x]) for x in group["hosts"]
+                                if x in hosts])
+                db.executemany("INSERT INTO grp_children (group_id, child_id) " +
+                               "VALUES (?, ?)",
+                               [(groups[name], groups[x]) for x in group["children"]
+                                if x in groups])
+                db.executemany("INSERT INTO grp_ippools (group_id, var, pool_id) " +
+                               "VALUES (?, ?, ?)",
+                               [(groups[name], x, pools[group["ippools"][x]])
+                                for x in group["ippools"]
+                                if group["ippools"][x] in pools])
+
+    def export_yaml(self, path):
+        """Save the inventory as a human-readable YAML inventory file
+
+        Args:
+            path: path of the YAML file
+
+        Raises:
+            IOError: there has been a problem with saving serialized data.
+        """
+        tmp = iv.InventoryData(path, initialize=True)
+        tmp.load_hash(self.get_hash())
+        tmp.save()
+
+    def import_yaml(self, path):
+        """Replace the contents of the inventory with YAML inventory file
+
+        Args:
+            path: path of the YAML file
+        """
+        self.load_hash(iv.InventoryData(path).get_hash())
+
+    def get_ansible_hostvars(self, host):
+        """Provide variables of a single host in format digestable by ansible
+
+        Please check InventoryData.get_ansible_hostvars() for details.
+        """
+        try:
+            host_n = v.HostnameParser.normalize_hostname(host)
+        except MalformedInputException:
+            return {}
+        host_id = self._fetch_id('hosts', host_n)
+        if host_id is None:
+            return {}
+        ret = dict(self._db.execute(
+            "SELECT key, value FROM keyvals WHERE host_id = ?", (host_id,)))
+        if "ansible_ssh_host" not in ret:
+            msg = "Host {0} does not provide ".format(host_n)
+            msg += "ansible_ssh_host variable."
+            raise BadDataException(msg)
+        ret["aliases"] = [x[0] for x in self._db.execute(
+            "SELECT alias FROM aliases WHERE host_id = ? ORDER BY alias",
+            (host_id,))]
+        return ret
+
+    def iter_ansible_hostvars(self, hosts=None):
+        """Provide variables of all the hosts, one host at a time
+
+        Please check InventoryData.iter_ansible_hostvars() for details.
+        """
+        hostvars = {}
+        if hosts is None:
+            for (host,) in self._db.execute("SELECT name FROM hosts"):
+                hostvars[host] = {"aliases": []}
+        else:
+            for host in hosts:
+                hostvars[host] = {"aliases": []}
+        for host, alias in self._db.execute(
+                "SELECT h.name, a.alias FROM aliases a JOIN hosts h ON " +
+                "h.id = a.host_id ORDER BY a.alias"):
+            if host in hostvars:
+                hostvars[host]["aliases"].append(alias)
+        for host, key, val in self._db.execute(
+                "SELECT h.name, k.key, k.value FROM keyvals k JOIN hosts h ON " +
+                "h.id = k.host_id"):
+            if host in hostvars:
+                hostvars[host][key] = val
+        for host in sorted(hostvars):
+            if "ansible_ssh_host" not in hostvars[host]:
+                msg = "Host {0} does not provide ".format(host)
+                msg += "ansible_ssh_host variable."
+                raise BadDataException(msg)
+            yield host, hostvars[host]
+
+    def check_ansible_hosts(self, hosts=None):
+        """Make sure that the hosts can be passed to Ansible
+
+        Please check InventoryData.check_ansible_hosts() for details.
+        """
+        hosts = None if hosts is None else frozenset(hosts)
+        for (host,) in self._db.execute(
+                "SELECT name FROM hosts WHERE id NOT IN (SELECT host_id FROM " +
+                "keyvals WHERE key = 'ansible_ssh_host') ORDER BY name"):
+            if hosts is None or host in hosts:
+                msg = "Host {0} does not provide ".format(host)
+                msg += "ansible_ssh_host variable."
+                raise BadDataException(msg)
+
+    def get_ansible_groups(self):
+        """Provide groups of the inventory in format digestable by ansible
+
+        Please check InventoryData.get_ansible_groups() for details.
+        """
+        ret = {}
+        for (group,) in self._db.execute("SELECT name FROM grp"):
+            ret[group] = {"hosts": [], "vars": {}, "children": []}
+        for group, host in self._db.execute(
+                "SELECT g.name, h.name FROM grp_hosts gh JOIN grp g ON " +
+                "g.id = gh.group_id JOIN hosts h ON h.id = gh.host_id " +
+                "ORDER BY h.name"):
+            ret[group]["hosts"].append(host)
+        for group, child in self._db.execute(
+                "SELECT g.name, c.name FROM grp_children gc JOIN grp g ON " +
+                "g.id = gc.group_id JOIN grp c ON c.id = gc.child_id " +
+                "ORDER BY c.name"):
+            ret[group]["children"].append(child)
+        # Add special "all group" to which all hosts belong:
+        ret["all"] = {"hosts": [x[0] for x in self._db.execute(
+                                "SELECT name FROM hosts ORDER BY name")],
+                      "vars": {},
+                      "children": []}
+        return ret
+
+    def get_ansible_inventory(self):
+        """Provide inventory data in format digestable by ansible
+
+        Please check InventoryData.get_ansible_inventory() for details.
+        """
+        ret = self.get_ansible_groups()
+        ret["_meta"] = {"hostvars": dict(self.iter_ansible_hostvars())}
+        return ret
+
+    def get_stats(self, top=10):
+        """Compute statistics of the inventory, see InventoryData.get_stats()"""
+        counts = {}
+        for key, table in [("hosts", "hosts"), ("aliases", "aliases"),
+                           ("groups", "grp"), ("ippools", "ippools")]:
+            counts[key] = self._db.execute(
+                "SELECT COUNT(*) FROM " + table).fetchone()[0]
+        counts["largest_groups"] = [tuple(x) for x in self._db.execute(
+            "SELECT g.name, COUNT(gh.host_id) AS size FROM grp g LEFT JOIN " +
+            "grp_hosts gh ON gh.group_id = g.id GROUP BY g.id " +
+            "ORDER BY size DESC, g.name LIMIT ?", (top,))]
+        counts["pools"] = {name: self._ippool_load(pool_id).get_stats()
+                           for pool_id, name in self._db.execute(
+                               "SELECT id, name FROM ippools").fetchall()}
+        return counts
+
+    def ippool_add(self, pool, pool_obj):
+        """Add new ip pool object to inventory
+
+        Args:
+            pool: name of the pool
+            pool_object: an IPPool object
+
+        Raises:
+            MalformedInputException: ip pool with given name already exists or
+                overlaps with other pool
+        """
+        logging.info("Checking for overlapping ip pools")
+        for name, network in self._db.execute("SELECT name, network FROM ippools"):
+            if pool_obj.overlaps(i.IPPool(network)):
+                msg = "Ippool {0} overlaps with {1}".format(pool, name)
+                raise MalformedInputException(msg)
+        if self._fetch_id('ippools', pool) is not None:
+            raise MalformedInputException("Ippool with name {0}".format(pool) +
+                                          "already exists!")
+        data = pool_obj.get_hash()
+        with self._savepoint():
+            pool_id = self._db.execute(
+                "INSERT INTO ippools (name, network) VALUES (?, ?)",
+                (pool, data["network"])).lastrowid
+            for state in ["allocated", "reserved"]:
+                self._db.executemany(
+                    "INSERT INTO ippool_addresses (pool_id, state, address) " +
+                    "VALUES (?, ?, ?)", [(pool_id, state, x) for x in data[state]])
+
+    def ippool_del(self, pool):
+        """Delete pool, and unassign it from all the groups
+
+        Args:
+            pool: name of the ip pool to delete
+
+        Raises:
+            MalformedInputException: pool with given name does not exist
+        """
+        self._db.execute("DELETE FROM ippools WHERE id = ?", (self._pool_id(pool),))
+
+    def ippool_get(self, pool=None):
+        """Fetch IPPool object or names of all the pools
+
+        Args:
+            name of the IPPool to fetch, None if all names should be returned
+
+        Raises:
+            MalformedInputException: pool with given name does not exist
+        """
+        if pool is not None:
+            return self._ippool_load(self._pool_id(pool))
+        else:
+            return [x[0] for x in self._db.execute(
+                "SELECT name FROM ippools ORDER BY name")]
+
+    def ippool_assign(self, pool, group, pool_related_var):
+        """Assign pool to group via keyval var
+
+        Args:
+            pool: name of the pool to assign
+            pool_related_var: keyval that shoul use given pool for ip address
+                auto-assignement
+            group: name of the group given pool should be assigned to
+
+        Raises:
+            MalformedInputException: input data is malformed
+        """
+        group_id = self._group_id(group)
+        pool_id = self._pool_id(pool)
+        self._db.execute("INSERT OR REPLACE INTO grp_ippools (group_id, var, " +
+                         "pool_id) VALUES (?, ?, ?)",
+                         (group_id, pool_related_var, pool_id))
+
+    def ippool_revoke(self, pool, group, pool_related_var):
+        """Revoke pool from group
+
+        Args:
+            pool: name of the pool to revoke
+            pool_related_var: keyval that has been using given pool for ip address
+                auto-assignement
+            group: name of the group given pool should be revoked from
+        """
+        group_id = self._group_id(group)
+        cur = self._db.execute("DELETE FROM grp_ippools WHERE group_id = ? " +
+                               "AND var = ?", (group_id, pool_related_var))
+        if cur.rowcount == 0:
+            msg = "Trying to remove a pool from var that has not been assigned yet"
+            raise MalformedInputException(msg)
+
+    def ippool_book_ipaddr(self, pool, ipaddr):
+        """Exclude an ip address from the ip pool
+
+        Args:
+            pool: name of the ip pool where ip address should be booked
+            ipaddr: ipaddress.ip_address object which should be booked
+
+        Raises:
+            MalformedInputException: input data is malformed
+        """
+        pool_id = self._pool_id(pool)
+        self._ippool_load(pool_id).book(ipaddr)
+        self._db.execute("INSERT INTO ippool_addresses (pool_id, state, " +
+                         "address) VALUES (?, 'reserved', ?)",
+                         (pool_id, str(ipaddr)))
+
+    def ippool_cancel_ipaddr(self, pool, ipaddr):
+        """Cancel exclusion of an ip address from the ip pool
+
+        Args:
+            pool: name of the ip pool where ip address should be canceled
+            ipaddr: ipaddress.ip_address object which should be canceled
+
+        Raises:
+            MalformedInputException: input data is malformed
+        """
+        pool_id = self._pool_id(pool)
+        cur = self._db.execute("DELETE FROM ippool_addresses WHERE pool_id = ? " +
+                               "AND state = 'reserved' AND address = ?",
+                               (pool_id, str(ipaddr)))
+        if cur.rowcount == 0:
+            msg = "IP {0} has not been reserved yet".format(ipaddr)
+            raise MalformedInputException(msg)
+
+    def group_add(self, group):
+        """Add a new group to inventory.
+
+        Args:
+            group: name of the new group
+
+        Raises:
+            MalformedInputException: group with such name already exists
+        """
+        if self._fetch_id('grp', group) is not None:
+            raise MalformedInputException("Group {0} already exists!".format(group))
+        self._db.execute("INSERT INTO grp (name) VALUES (?)", (group,))
+
+    def group_del(self, group):
+        """Delete the group, also from the children lists of other groups
+
+        Args:
+            group: name of the group to delete
+
+        Raises:
+            MalformedInputException: group with such name does not exists already
+        """
+        self._db.execute("DELETE FROM grp WHERE id = ?", (self._group_id(group),))
+
+    def group_get(self, group=None):
+        """Get a Group object identified by name.
+
+        Args:
+            group: name of the group to get, or None if all object names should
+                returned
+
+        Returns:
+            Depending on the value of group param, either all object *names* are
+            returned, or the *object* identified by group param
+
+        Raises:
+            MalformedInputException: group with given name does not exists.
+        """
+        if group is None:
+            return [x[0] for x in self._db.execute(
+                "SELECT name FROM grp ORDER BY name")]
+        group_id = self._group_id(group)
+        hosts = [x[0] for x in self._db.execute(
+            "SELECT h.name FROM grp_hosts gh JOIN hosts h ON h.id = gh.host_id " +
+            "WHERE gh.group_id = ?", (group_id,))]
+        children = [x[0] for x in self._db.execute(
+            "SELECT g.name FROM grp_children gc JOIN grp g ON g.id = gc.child_id " +
+            "WHERE gc.group_id = ?", (group_id,))]
+        ippools = dict(self._db.execute(
+            "SELECT gp.var, p.name FROM grp_ippools gp JOIN ippools p ON " +
+            "p.id = gp.pool_id WHERE gp.group_id = ?", (group_id,)))
+        return g.Group(hosts=hosts, children=children, ippools=ippools)
+
+    def group_child_add(self, group, child):
+        """Add a child group to group
+
+        Args:
+            group: name of the group to add child to
+            child: name of the child group
+
+        Raises:
+            MalformedInputException: either child group or a parent group does
+                not exists, or the child has already been added.
+        """
+        group_id = self._group_id(group)
+        child_id = self._fetch_id('grp', child)
+        if child_id is None:
+            msg = "Child group {0} does not exist!".format(child)
+            raise MalformedInputException(msg)
+        try:
+            self._db.execute("INSERT INTO grp_children (group_id, child_id) " +
+                             "VALUES (?, ?)", (group_id, child_id))
+        except sqlite3.IntegrityError:
+            msg = "Child {0} has already been added to this group"
+            raise MalformedInputException(msg.format(child))
+
+    def group_child_del(self, group, child):
+        """Remove a child group from a group
+
+        Args:
+            group: name of the group to remove child from
+            child: name of the child group
+
+        Raises:
+            MalformedInputException: either child group or a parent group does
+                exists
+        """
+        group_id = self._group_id(group)
+        cur = self._db.execute(
+            "DELETE FROM grp_children WHERE group_id = ? AND child_id = " +
+            "(SELECT id FROM grp WHERE name = ?)", (group_id, child))
+        if cur.rowcount == 0:
+            raise MalformedInputException(
+                "Child group {0} could".format(child) +
+                " not be found in this group.")
+
+    def group_host_add(self, group, host):
+        """Add a host to a group
+
+        Args:
+            host: name of the host
+            group: name of the group
+
+        Raises:
+            MalformedInputException: either host or group does not exist, or
+                host name is malformed.
+        """
+        group_id = self._group_id(group)
+        host_n = v.HostnameParser.normalize_hostname(host)
+        host_id = self._host_id(host_n)
+        try:
+            self._db.execute("INSERT INTO grp_hosts (group_id, host_id) " +
+                             "VALUES (?, ?)", (group_id, host_id))
+        except sqlite3.IntegrityError:
+            msg = "Host {0} has already been added to this group"
+            raise MalformedInputException(msg.format(host_n))
+
+    def group_host_del(self, group, host):
+        """Remove a host from a group
+
+        Args:
+            host: name of the host
+            group: name of the group
+
+        Raises:
+            MalformedInputException: either host or group does not exist
+        """
+        group_id = self._group_id(group)
+        host_n = v.HostnameParser.normalize_hostname(host)
+        cur = self._db.execute(
+            "DELETE FROM grp_hosts WHERE group_id = ? AND host_id = " +
+            "(SELECT id FROM hosts WHERE name = ?)", (group_id, host_n))
+        if cur.rowcount == 0:
+            raise MalformedInputException("Host {0} could".format(host_n) +
+                                          " not be found in this group.")
+
+    def host_get(self, host=None):
+        """Get a Host object identified by name.
+
+        Args:
+            host: name of the host to get, or None if all object names should
+                returned
+
+        Returns:
+            Depending on the value of group param, either all object *names* are
+            returned, or the *object* identified by group param
+
+        Raises:
+            MalformedInputException: host with given name does not exists or is
+                malformed.
+        """
+        if host is None:
+            return [x[0] for x in self._db.execute(
+                "SELECT name FROM hosts ORDER BY name")]
+        host_n = v.HostnameParser.normalize_hostname(host)
+        host_id = self._fetch_id('hosts', host_n)
+        if host_id is None:
+            raise MalformedInputException("Host {0} does not exist".format(host_n))
+        aliases = [x[0] for x in self._db.execute(
+            "SELECT alias FROM aliases WHERE host_id = ?", (host_id,))]
+        keyvals = dict(self._db.execute(
+            "SELECT key, value FROM keyvals WHERE host_id = ?", (host_id,)))
+        return h.Host(aliases=aliases, keyvals=keyvals)
+
+    def host_add(self, host):
+        """Add a host to inventory
+
+        Args:
+            host: name of the new host
+
+        Raises:
+            MalformedInputException: host with that name already exists, or is
+                malformed
+        """
+        host_n = v.HostnameParser.normalize_hostname(host)
+        if self._fetch_id('hosts', host_n) is not None:
+            raise MalformedInputException("Host {0} already exist!".format(host_n))
+        owner = self._alias_owner(host_n)
+        if owner is not None:
+            msg = "Host {0} already has alias with the name of new host"
+            raise MalformedInputException(msg.format(owner))
+        self._db.execute("INSERT INTO hosts (name) VALUES (?)", (host_n,))
+
+    def host_add_many(self, hosts, groups=[], data=[]):
+        """Add many hosts to inventory, with groups and variables
+
+        Please check InventoryData.host_add_many() for details.
+
+        Raises:
+            MalformedInputException: any of the hosts already exists, groups
+                do not exist, there is no pool to auto-assign address from, or
+                an explicit ip address is given to more than one host.
+            GenericException: some ip pool has run out of free addresses.
+        """
+        hosts_n = [v.HostnameParser.normalize_hostname(x) for x in hosts]
+        group_ids = [self._group_id(x) for x in groups]
+        iv.check_explicit_addresses(hosts_n, data)
+        with self._savepoint():
+            # Values of each keyval, for all the hosts:
+            values = []
+            for keyval in data:
+                if v.KeyWordValidator.is_ipaddress_keyword(keyval["key"]) and \
+                        keyval["val"] is None:
+                    row = None
+                    for group_id in group_ids:
+                        row = self._db.execute(
+                            "SELECT pool_id FROM grp_ippools WHERE " +
+                            "group_id = ? AND var = ?",
+                            (group_id, keyval["key"])).fetchone()
+                        if row is not None:
+                            break
+                    if row is None:
+                        msg = "There are no ippools suitable for assigning"
+                        msg += " an IP to " + keyval["key"] + " variable for"
+                        msg += " these hosts"
+                        raise MalformedInputException(msg)
+                    ips = self._ippool_load(row[0]).allocate_many(len(hosts_n))
+                    self._db.executemany(
+                        "INSERT INTO ippool_addresses (pool_id, state, " +
+                        "address) VALUES (?, 'allocated', ?)",
+                        [(row[0], str(x)) for x in ips])
+                    values.append(ips)
+                else:
+                    values.append([keyval["val"]] * len(hosts_n))
+
+            for i, host_n in enumerate(hosts_n):
+                self.host_add(host_n)
+                host_id = self._fetch_id('hosts', host_n)
+                self._db.executemany("INSERT INTO grp_hosts (group_id, " +
+                                     "host_id) VALUES (?, ?)",
+                                     [(x, host_id) for x in group_ids])
+                for keyval, vals in zip(data, values):
+                    if v.KeyWordValidator.is_ipaddress_keyword(keyval["key"]) \
+                            and keyval["val"] is not None:
+                        self._ippool_find_and_assign(keyval["val"])
+                    self._db.execute("INSERT OR REPLACE INTO keyvals (host_id, " +
+                                     "key, value) VALUES (?, ?, ?)",
+                                     (host_id, keyval["key"], _db_value(vals[i])))
+
+    def host_import(self, hosts):
+        """Add many hosts with their aliases and variables
+
+        Please check InventoryData.host_import() for details.
+
+        Raises:
+            MalformedInputException: any of the hosts or aliases already
+                exists, or some address can not be allocated.
+            BadDataException: some address is malformed
+        """
+        with self._savepoint():
+            for host in hosts:
+                # Validates the data the same way InventoryData does:
+                obj = h.Host(aliases=hosts[host]["aliases"],
+                             keyvals=hosts[host]["keyvals"])
+                self.host_add(host)
+                for alias in obj.get_aliases():
+                    self.host_alias_add(host, alias)
+                keyvals = obj.get_keyval()
+                del keyvals["aliases"]
+                if keyvals:
+                    self.host_set_vars(host, [{"key": x, "val": keyvals[x]}
+                                              for x in sorted(keyvals)])
+
+    def host_del(self, host):
+        """Delete host from inventory, its groups and ip pools
+
+        Args:
+            host: name of the host to remove
+
+        Raises:
+            MalformedInputException: host with given name does not exists, or is
+                malformed
+        """
+        host_n = v.HostnameParser.normalize_hostname(host)
+        host_id = self._host_id(host_n)
+        with self._savepoint():
+            for ip in self._host_ipaddrs(host_id):
+                self._ippool_find_and_deallocate(ip)
+            self._db.execute("DELETE FROM hosts WHERE id = ?", (host_id,))
+
+    def host_find(self, key, val=None, network=None):
+        """Find hosts by the value of their variable
+
+        Please check InventoryData.host_find() for details. The (key, value)
+        index of the keyvals table is used for the exact values, addresses
+        from the network are checked one by one.
+        """
+        if network is None:
+            # Numbers are stored as integers:
+            val = str(val)
+            num = int(val) if val.isdigit() else val
+            return [x[0] for x in self._db.execute(
+                "SELECT h.name FROM keyvals k JOIN hosts h ON h.id = k.host_id " +
+                "WHERE k.key = ? AND k.value IN (?, ?) ORDER BY h.name",
+                (key, val, num))]
+        ret = []
+        for host, val in self._db.execute(
+                "SELECT h.name, k.value FROM keyvals k JOIN hosts h ON " +
+                "h.id = k.host_id WHERE k.key = ? ORDER BY h.name", (key,)):
+            try:
+                ip = ip_address(val)
+            except ValueError:
+                continue
+            if ip.version == network.version and ip in network:
+                ret.append(host)
+        return ret
+
+    def host_set_vars(self, host, data):
+        """Set keyval parameter for a host.
+
+        Please check InventoryData.host_set_vars() for details.
+
+        Args:
+            host: name of the host keyval should be assigned to
+            data: a list of hashes with two keys:
+                {"key": key of the variable, "val": variable's value}
+
+        Raises:
+            MalformedInputException: provided data does not make sense.
+        """
+        host_n = v.HostnameParser.normalize_hostname(host)
+        host_id = self._host_id(host_n)
+        with self._savepoint():
+            for keyval in data:
+                if v.KeyWordValidator.is_ipaddress_keyword(keyval["key"]):
+                    # First, lets deallocate old ip (if any):
+                    row = self._db.execute(
+                        "SELECT value FROM keyvals WHERE host_id = ? AND key = ?",
+                        (host_id, keyval["key"])).fetchone()
+                    if row is not None:
+                        self._ippool_find_and_deallocate(ip_address(row[0]))
+                    if keyval["val"] is None:
+                        # Lets find a group with a pool capable of assigning an
+                        # address to us
+                        row = self._db.execute(
+                            "SELECT gp.pool_id FROM grp_hosts gh JOIN " +
+                            "grp_ippools gp ON gp.group_id = gh.group_id " +
+                            "WHERE gh.host_id = ? AND gp.var = ?",
+                            (host_id, keyval["key"])).fetchone()
+                        if row is None:
+                            msg = "There are no ippools suitable for assigning"
+                            msg += " an IP to " + keyval["key"] + " variable for"
+                            msg += " this host"
+                            raise MalformedInputException(msg)
+                        keyval["val"] = self._ippool_load(row[0]).allocate()
+                        self._db.execute(
+                            "INSERT INTO ippool_addresses (pool_id, state, " +
+                            "address) VALUES (?, 'allocated', ?)",
+                            (row[0], str(keyval["val"])))
+                    else:
+                        self._ippool_find_and_assign(keyval["val"])
+                self._db.execute("INSERT OR REPLACE INTO keyvals (host_id, key, " +
+                                 "value) VALUES (?, ?, ?)",
+                                 (host_id, keyval["key"], _db_value(keyval["val"])))
+
+    def host_del_vars(self, host, keys):
+        """Remove keyvals from host, deallocate ip addresses if applicable
+
+        Args:
+            host: name of the host keyval should be removed from
+            key: keys used to identify keyvals destined for deletion
+
+        Raises:
+            MalformedInputException: host or key with given name does not exists,
+                or host is malformed
+        """
+        host_n = v.HostnameParser.normalize_hostname(host)
+        host_id = self._host_id(host_n)
+        with self._savepoint():
+            for key in keys:
+                row = self._db.execute(
+                    "SELECT value FROM keyvals WHERE host_id = ? AND key = ?",
+                    (host_id, key)).fetchone()
+                if row is None:
+                    msg = "Key {0} has not been found.".format(key)
+                    raise MalformedInputException(msg)
+                if v.KeyWordValidator.is_ipaddress_keyword(key):
+                    self._ippool_find_and_deallocate(ip_address(row[0]))
+                self._db.execute("DELETE FROM keyvals WHERE host_id = ? AND " +
+                                 "key = ?", (host_id, key))
+
+    def host_alias_add(self, host, alias):
+        """Assign an alias to the host
+
+        Raises:
+            MalformedInputException: either host to which alias should be assigned
+                does not exists, or a host/alias with such name already exists,
+                or host/alias are malformed.
+        """
+        host_n = v.HostnameParser.normalize_hostname(host)
+        host_id = self._host_id(host_n)
+        alias_n = v.HostnameParser.normalize_hostname(alias)
+        if self._fetch_id('hosts', alias_n) is not None:
+            msg = "There exists host with the same name as an alias {0}."
+            raise MalformedInputException(msg.format(alias_n))
+        owner = self._alias_owner(alias_n)
+        if owner is not None:
+            msg = "Alias {0} is already assigned to host {1}"
+            raise MalformedInputException(msg.format(alias_n, owner))
+        self._db.execute("INSERT INTO aliases (host_id, alias) VALUES (?, ?)",
+                         (host_id, alias_n))
+
+    def host_alias_del(self, host, alias):
+        """Remove an alias from the host
+
+        Args:
+            alias: name of the alias to remove
+
+        Raises:
+            MalformedInputException: either alias or host does not exist, or are
+                malformed.
+        """
+        host_n = v.HostnameParser.normalize_hostname(host)
+        host_id = self._host_id(host_n)
+        cur = self._db.execute("DELETE FROM aliases WHERE host_id = ? AND " +
+                               "alias = ?", (host_id, alias))
+        if cur.rowcount == 0:
+            raise MalformedInputException("Alias {0} has not been ".format(alias) +
+                                          "assigned to this host yet.")
+
+    def host_rename(self, host_old, host_new):
+        """Rename a host
+
+        Args:
+            host_old: old hostname
+            host_new: new hostname
+
+        Raises:
+            MalformedInputException: host_old does not exist, host_new already
+                exists or is an alias of some host, or both hostnames are
+                malformed.
+        """
+        host_id = self._fetch_id('hosts', host_old)
+        if host_id is None:
+            msg = "Host {0} does not exist, and thus cannot be renamed"
+            raise MalformedInputException(msg.format(host_old))
+        host_new_n = v.HostnameParser.normalize_hostname(host_new)
+        owner = self._alias_owner(host_new_n)
+        if owner is not None:
+            msg = "Host {0} already has alias with the name of new host"
+            raise MalformedInputException(msg.format(owner))
+        try:
+            self._db.execute("UPDATE hosts SET name = ? WHERE id = ?",
+                             (host_new_n, host_id))
+        except sqlite3.IntegrityError:
+            msg = "Host {0} already exists, {1} cannot be renamed"
+            raise MalformedInputException(msg.format(host_new_n, host_old))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import bisect
+
+# For Python3 < 3.3, ipaddress module is available as an extra module,
+# under a different name:
+try:
+    from ipaddress import IPv4Address, IPv6Address, ip_address
+except ImportError:
+    from ipaddr import IPv4Address, IPv6Address
+    from ipaddr import IPAddress as ip_address
+
+import inventory_tool.validators as v
+
+_ADDRESS_TYPES = (IPv4Address, IPv6Address)
+
+
+def _address(key, val):
+    """Value of the variable as an ip address object, None if it is not one
+
+    Variables set in the current process keep the values they were given,
+    which for ip address keywords may still be strings.
+    """
+    if isinstance(val, _ADDRESS_TYPES):
+        return val
+    if isinstance(val, str) and v.KeyWordValidator.is_ipaddress_keyword(key):
+        try:
+            return ip_address(val)
+        except ValueError:
+            return None
+    return None
+
+
+class VarsIndex:
+    """Inverted index of the variables of the hosts.
+
+    For each key, hosts are indexed by the string form of the value, which is
+    also what the value looks like in the inventory file and in the output
+    for Ansible, so the type it has been loaded with does not matter. Values
+    that are ip addresses are additionally kept in arrays sorted by the integer
+    value of the address, one per ip version, so that all the addresses from
+    a network are a single slice of the array.
+    """
+
+    __slots__ = ['_values', '_addrs']
+
+    def __init__(self, hosts):
+        """Build a new VarsIndex object
+
+        Args:
+            hosts: a hash host name -> Host object
+        """
+        self._values = {}
+        # key -> ip version -> ([addresses as ints], [host names])
+        self._addrs = {}
+        addrs = {}
+        for host in hosts:
+            keyvals = hosts[host].get_keyval()
+            del keyvals['aliases']
+            for key, val in keyvals.items():
+                if val is None:
+                    continue
+                addr = _address(key, val)
+                if addr is not None:
+                    val = addr
+                    addrs.setdefault((key, addr.version), []).append(
+                        (int(addr), host))
+                self._values.setdefault(key, {}).setdefault(
+                    str(val), set()).add(host)
+        # Sorting once is much cheaper than inserting the addresses one by one:
+        for (key, version), tmp in addrs.items():
+            tmp.sort()
+            self._addrs.setdefault(key, {})[version] = \
+                ([x[0] for x in tmp], [x[1] for x in tmp])
+
+    def add(self, host, key, val):
+        """Index the value of host's variable"""
+        if val is None:
+            return
+        addr = _address(key, val)
+        if addr is not None:
+            val = addr
+            ints, hosts = self._addrs.setdefault(key, {}).setdefault(
+                addr.version, ([], []))
+            pos = bisect.bisect_right(ints, int(addr))
+            ints.insert(pos, int(addr))
+            hosts.insert(pos, host)
+        self._values.setdefault(key, {}).setdefault(str(val), set()).add(host)
+
+    def remove(self, host, key, val):
+        """Forget the value of host's variable"""
+        if val is None:
+            return
+        addr = _address(key, val)
+        if addr is not None:
+            val = addr
+        tmp = self._values[key][str(val)]
+        tmp.discard(host)
+        if not tmp:
+            del self._values[key][str(val)]
+        if addr is not None:
+            ints, hosts = self._addrs[key][addr.version]
+            pos = bisect.bisect_left(ints, int(addr))
+            while hosts[pos] != host:
+                pos += 1
+            del ints[pos]
+            del hosts[pos]
+
+    def add_host(self, host, host_obj):
+        """Index all the variables of the host"""
+        keyvals = host_obj.get_keyval()
+        del keyvals['aliases']
+        for key, val in keyvals.items():
+            self.add(host, key, val)
+
+    def remove_host(self, host, host_obj):
+        """Forget all the variables of the host"""
+        keyvals = host_obj.get_keyval()
+        del keyvals['aliases']
+        for key, val in keyvals.items():
+            self.remove(host, key, val)
+
+    def find(self, key, val):
+        """Names of the hosts which variable has given value, sorted"""
+        return sorted(self._values.get(key, {}).get(str(val), ()))
+
+    def find_in_network(self, key, network):
+        """Names of the hosts which variable is an address from the network
+
+        Args:
+            key: name of the variable
+            network: ip_network object
+
+        Returns:
+            A sorted list of host names.
+        """
+        tmp = self._addrs.get(key, {}).get(network.version)
+        if tmp is None:
+            return []
+        ints, hosts = tmp
+        start = bisect.bisect_left(ints, int(network.network_address))
+        end = bisect.bisect_right(ints, int(network.broadcast_address))
+        return sorted(hosts[start:end])
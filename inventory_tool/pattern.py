@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import fnmatch
+import logging
+import re
+
+from inventory_tool.exception import MalformedInputException
+
+_GLOB_CHARS = frozenset('*?[')
+
+
+def split_pattern(pattern):
+    """Split Ansible host pattern into terms
+
+    Just like Ansible does, terms are separated by "," if there is any in the
+    pattern, by ":" otherwise.
+
+    Returns:
+        A list of non-empty terms, with whitespace stripped.
+    """
+    sep = ',' if ',' in pattern else ':'
+    return [x.strip() for x in pattern.split(sep) if x.strip()]
+
+
+class HostPatternIndex:
+    """Evaluator of Ansible host patterns, i.e. "web:&prod:!canary"
+
+    Hosts are numbered densely in the order of their names, and the hosts of
+    each group, including the hosts of all its child groups, are represented
+    as an integer which n-th bit is set if n-th host belongs to the group. Each
+    term of the pattern is resolved into such a bitset, so unions,
+    intersections and exclusions are single bit operations no matter how big
+    the groups are.
+
+    Just like in Ansible, regular terms are added together first, then the
+    intersections ("&") and exclusions ("!") are applied, whatever their
+    position in the pattern is. Patterns with no regular terms start with all
+    the hosts. A term is one of:
+    - "all" or "*": all the hosts
+    - name of a group or a host
+    - shell-style wildcard, i.e. "web*", matched against group and host names
+    - "~" followed by a regular expression, matched the same way
+    """
+
+    __slots__ = ['_hosts', '_index', '_groups', '_direct', '_bits']
+
+    def __init__(self, groups):
+        """Build a new HostPatternIndex object
+
+        Args:
+            groups: groups of the inventory, in the format returned by
+                get_ansible_groups() method of the inventory object
+        """
+        self._hosts = sorted(groups["all"]["hosts"])
+        self._index = {x: n for n, x in enumerate(self._hosts)}
+        self._groups = groups
+        # Bitsets are built only for the groups the patterns refer to:
+        self._direct = {}
+        self._bits = {"all": (1 << len(self._hosts)) - 1}
+
+    def bitset(self, hosts):
+        """Convert a list of host names into a bitset"""
+        # Setting the bits one by one would create a new, up to len(hosts) bit
+        # long integer each time:
+        buf = bytearray((len(self._hosts) + 7) // 8)
+        for host in hosts:
+            n = self._index[host]
+            buf[n >> 3] |= 1 << (n & 7)
+        return int.from_bytes(buf, 'little')
+
+    def hosts(self, bits):
+        """Convert a bitset into a sorted list of host names"""
+        ret = []
+        buf = bits.to_bytes((len(self._hosts) + 7) // 8, 'little')
+        for i, byte in enumerate(buf):
+            while byte:
+                low = byte & -byte
+                ret.append(self._hosts[i * 8 + low.bit_length() - 1])
+                byte ^= low
+        return ret
+
+    def _direct_bits(self, group):
+        """Bitset of the hosts that are members of the group itself"""
+        ret = self._direct.get(group)
+        if ret is None:
+            ret = self.bitset(self._groups[group]["hosts"])
+            self._direct[group] = ret
+        return ret
+
+    def group_bits(self, group):
+        """Bitset of the hosts of the group and all its child groups"""
+        ret = self._bits.get(group)
+        if ret is not None:
+            return ret
+        ret = 0
+        # Children are followed iteratively, as the nesting can be deep:
+        seen = set([group])
+        stack = [group]
+        while stack:
+            tmp = stack.pop()
+            known = self._bits.get(tmp)
+            if known is not None:
+                ret |= known
+                continue
+            ret |= self._direct_bits(tmp)
+            for child in self._groups[tmp]["children"]:
+                if child not in seen and child in self._groups:
+                    seen.add(child)
+                    stack.append(child)
+        self._bits[group] = ret
+        return ret
+
+    def _match_names(self, matches):
+        ret = 0
+        for group in self._groups:
+            if matches(group):
+                ret |= self.group_bits(group)
+        return ret | self.bitset(x for x in self._hosts if matches(x))
+
+    def term_bits(self, term):
+        """Resolve a single term of the pattern into a bitset
+
+        Raises:
+            MalformedInputException: regular expression is malformed
+        """
+        if term in ("all", "*"):
+            return self._bits["all"]
+        if term.startswith("~"):
+            try:
+                regexp = re.compile(term[1:])
+            except re.error as e:
+                msg = "{0} is not a proper regular expression: {1}"
+                raise MalformedInputException(msg.format(term[1:], str(e)))
+            ret = self._match_names(regexp.match)
+        elif _GLOB_CHARS.intersection(term):
+            regexp = re.compile(fnmatch.translate(term))
+            ret = self._match_names(regexp.match)
+        elif term in self._groups:
+            ret = self.group_bits(term)
+        elif term in self._index:
+            ret = 1 << self._index[term]
+        else:
+            ret = 0
+        if not ret:
+            logging.warning("Could not match supplied host pattern: " + term)
+        return ret
+
+    def evaluate(self, pattern):
+        """Resolve the pattern into a bitset of matching hosts
+
+        Raises:
+            MalformedInputException: pattern is malformed
+        """
+        union, intersections, exclusions = None, [], []
+        for term in split_pattern(pattern):
+            if term.startswith("&"):
+                intersections.append(term[1:])
+            elif term.startswith("!"):
+                exclusions.append(term[1:])
+            else:
+                union = (union or 0) | self.term_bits(term)
+        if union is None:
+            if not intersections and not exclusions:
+                msg = "Host pattern {0!r} does not contain any terms"
+                raise MalformedInputException(msg.format(pattern))
+            union = self._bits["all"]
+        for term in intersections:
+            union &= self.term_bits(term)
+        for term in exclusions:
+            union &= ~self.term_bits(term)
+        return union
+
+    def match(self, pattern):
+        """Names of the hosts matching the pattern, sorted"""
+        return self.hosts(self.evaluate(pattern))
+
+    def subtree(self, groups):
+        """Names of the groups and all their descendants
+
+        Args:
+            groups: list of group names
+
+        Returns:
+            A set of group names.
+
+        Raises:
+            MalformedInputException: some of the groups do not exist
+        """
+        ret = set()
+        stack = []
+        for group in groups:
+            if group not in self._groups:
+                msg = "Group {0} does not exist".format(group)
+                raise MalformedInputException(msg)
+            stack.append(group)
+        while stack:
+            tmp = stack.pop()
+            if tmp in ret:
+                continue
+            ret.add(tmp)
+            stack.extend(x for x in self._groups[tmp]["children"]
+                         if x in self._groups)
+        return ret
+
+    def limit_groups(self, bits, groups=None):
+        """Restrict the groups to the hosts from the bitset
+
+        Groups with none of the hosts, including the ones of their children,
+        are left out.
+
+        Args:
+            bits: bitset of the hosts, i.e. returned by evaluate()
+            groups: if set, only these groups are considered (and the "all"
+                group, which is always present)
+
+        Returns:
+            A hash in the format of get_ansible_groups() output.
+        """
+        ret = {}
+        for group in self._groups:
+            if group != "all" and (not self.group_bits(group) & bits or
+                                   groups is not None and group not in groups):
+                continue
+            ret[group] = dict(self._groups[group])
+            ret[group]["hosts"] = self.hosts(self._direct_bits(group) & bits)
+        ret["all"]["hosts"] = self.hosts(bits)
+        for group in ret:
+            ret[group]["children"] = [x for x in ret[group]["children"]
+                                      if x in ret]
+        return ret
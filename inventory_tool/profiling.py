@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import sys
+import time
+
+# Ansible does not let the user pass arguments to the inventory script, so
+# profiling of its calls can be enabled through the environment too. Value
+# "1" enables the summary only, anything else is treated as a path where
+# cProfile statistics should be dumped to:
+ENV_VARIABLE = "INVENTORY_TOOL_PROFILE"
+
+# Profiler of the current run, None if profiling is disabled:
+_active = None
+
+
+def _max_rss():
+    """Return peak resident set size of the process, in bytes"""
+    # Not available on all platforms, memory usage is simply not reported
+    # then. Imported here, as profiling is disabled most of the time:
+    try:
+        import resource
+    except ImportError:
+        return 0
+    tmp = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, OS X - bytes:
+    return tmp if sys.platform == 'darwin' else tmp * 1024
+
+
+class _Stats:
+    __slots__ = ['wall', 'cpu', 'calls', 'rss_growth', 'rss_peak']
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.calls = 0
+        self.rss_growth = 0
+        self.rss_peak = 0
+
+
+class Profiler:
+    """Collect wall/cpu time and memory usage of the phases of the run
+
+    Phases can be nested, and each of them is identified by its path, i.e.
+    ("load", "parse"). Times of the phases that are entered many times under
+    the same parent (i.e. once per each host) are summed up.
+    """
+
+    __slots__ = ['_stats', '_order', '_stack', '_started', '_pstats_path',
+                 '_cprofile']
+
+    def __init__(self, pstats_path=None, since=None):
+        """Start collecting data
+
+        Args:
+            pstats_path: where to dump cProfile statistics, None if cProfile
+                should not be used.
+            since: a tuple with perf_counter() and process_time() values from
+                the beginning of the run, if it started before the profiler.
+        """
+        self._stats = {}
+        # Phases are reported in the order they have been entered for the
+        # first time:
+        self._order = {}
+        self._stack = []
+        self._pstats_path = pstats_path
+        self._cprofile = None
+        now = (time.perf_counter(), time.process_time(), _max_rss())
+        self._started = now if since is None else tuple(since) + (0,)
+        if pstats_path:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def begin(self, name):
+        """Enter a new phase, nested in the current one"""
+        self._enter(name, time.perf_counter(), time.process_time())
+
+    def _enter(self, name, wall, cpu):
+        path = (self._stack[-1][0] if self._stack else ()) + (name,)
+        self._order.setdefault(path, len(self._order))
+        self._stack.append((path, wall, cpu, _max_rss()))
+
+    def end(self):
+        """Leave the current phase"""
+        if not self._stack:
+            return
+        path, wall, cpu, rss = self._stack.pop()
+        stats = self._stats.get(path)
+        if stats is None:
+            stats = self._stats[path] = _Stats()
+        stats.wall += time.perf_counter() - wall
+        stats.cpu += time.process_time() - cpu
+        stats.calls += 1
+        stats.rss_peak = _max_rss()
+        stats.rss_growth += stats.rss_peak - rss
+
+    def record(self, name, since):
+        """Record a phase which has started before the profiler did
+
+        Args:
+            name: name of the phase
+            since: a tuple with perf_counter() and process_time() values from
+                the beginning of the phase.
+        """
+        self._enter(name, since[0], since[1])
+        self.end()
+
+    def stop(self):
+        """Close all the phases that are still open and stop cProfile"""
+        while self._stack:
+            self.end()
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self._pstats_path)
+            self._cprofile = None
+
+    def summary(self):
+        """Format collected data as a human-readable table"""
+        wall = time.perf_counter() - self._started[0]
+        cpu = time.process_time() - self._started[1]
+        fmt = "{0:<28} {1:>9} {2:>9} {3:>7} {4:>10} {5:>10}\n"
+        ret = fmt.format("phase", "wall[s]", "cpu[s]", "calls",
+                         "rss+[MiB]", "peak[MiB]")
+        # Nested phases go right after their parents:
+        order = sorted(self._stats, key=lambda p: [self._order[p[:i]] for i in
+                                                   range(1, len(p) + 1)])
+        for path in order:
+            stats = self._stats[path]
+            ret += fmt.format("  " * (len(path) - 1) + path[-1],
+                              "{0:.3f}".format(stats.wall),
+                              "{0:.3f}".format(stats.cpu),
+                              stats.calls,
+                              "{0:.1f}".format(stats.rss_growth / 2 ** 20),
+                              "{0:.1f}".format(stats.rss_peak / 2 ** 20))
+        ret += fmt.format("total", "{0:.3f}".format(wall),
+                          "{0:.3f}".format(cpu), "",
+                          "", "{0:.1f}".format(_max_rss() / 2 ** 20))
+        if self._pstats_path:
+            ret += "cProfile statistics: {0}\n".format(self._pstats_path)
+        return ret
+
+
+class _Phase:
+    __slots__ = ['_name']
+
+    def __init__(self, name):
+        self._name = name
+
+    def __enter__(self):
+        if _active is not None:
+            _active.begin(self._name)
+
+    def __exit__(self, *exc_info):
+        if _active is not None:
+            _active.end()
+
+
+class _NullPhase:
+    __slots__ = []
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_phase = _NullPhase()
+
+
+def parse_env(value):
+    """Parse the value of ENV_VARIABLE
+
+    Returns:
+        None if profiling should be disabled, an empty string if only the
+        summary should be printed, or a path for cProfile statistics.
+    """
+    if value in [None, "", "0"]:
+        return None
+    return "" if value == "1" else value
+
+
+def start(pstats_path=None, since=None):
+    """Enable profiling of the phases of the current run
+
+    Args:
+        pstats_path, since: see Profiler.__init__()
+    """
+    global _active
+    _active = Profiler(pstats_path=pstats_path, since=since)
+    return _active
+
+
+def stop(stream=None):
+    """Disable profiling and write the summary to stream/stderr
+
+    Does nothing if profiling has not been enabled.
+    """
+    global _active
+    if _active is None:
+        return
+    profiler, _active = _active, None
+    profiler.stop()
+    (sys.stderr if stream is None else stream).write(profiler.summary())
+
+
+def is_enabled():
+    return _active is not None
+
+
+def phase(name):
+    """Context manager that profiles a phase, if profiling is enabled"""
+    return _null_phase if _active is None else _Phase(name)
+
+
+def begin(name):
+    """Enter a phase without context manager, see Profiler.begin()"""
+    if _active is not None:
+        _active.begin(name)
+
+
+def end():
+    """Leave the phase entered with begin()"""
+    if _active is not None:
+        _active.end()
+
+
+def iterate(name, iterable):
+    """Profile each step of iteration over an iterable as a phase
+
+    Useful for lazy parsers, where the time is spent in generating the
+    items, interleaved with the processing of them.
+    """
+    if _active is None:
+        return iterable
+    return _iterate(name, iterable)
+
+
+def _iterate(name, iterable):
+    iterator = iter(iterable)
+    while True:
+        begin(name)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            end()
+        yield item
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import logging
+
+from inventory_tool.exception import GenericException, MalformedInputException
+from inventory_tool.lock import InventoryLock
+from inventory_tool.object.inventory import InventoryData
+from inventory_tool.validators import KeyWordValidator, HostnameParser
+
+
+def open_inventory(inventory_path, backend, initialize=False, journal=False):
+    """Create inventory object using selected storage backend"""
+    if backend == 'sqlite':
+        from inventory_tool.object.sqlinventory import SQLiteInventoryData
+        return SQLiteInventoryData(inventory_path, initialize=initialize)
+    elif backend == 'sharded':
+        from inventory_tool.object.shardedinventory import ShardedInventoryData
+        return ShardedInventoryData(inventory_path, initialize=initialize)
+    elif backend == 'yaml':
+        # Format of the file is guessed from its extension:
+        return InventoryData(inventory_path, initialize=initialize,
+                             journal=journal)
+    elif backend in ['json', 'binary']:
+        return InventoryData(inventory_path, initialize=initialize,
+                             journal=journal, file_format=backend)
+    else:
+        msg = "Unsupported storage backend: {0}".format(backend)
+        raise MalformedInputException(msg)
+
+
+class InventorySession:
+    """Batch of changes made to the inventory by a program embedding the tool.
+
+    The inventory is locked and loaded once, then any number of operations
+    may be performed using the methods of the inventory object, which are
+    available directly on the session, and the result is saved only once:
+
+        with InventorySession(path, backend_domain="example.com") as inv:
+            inv.host_add(host="foo")
+            inv.group_host_add(group="front", host="foo")
+
+    Leaving the "with" block normally commits the changes. If it is left due
+    to an exception (i.e. ScriptException raised by one of the operations), the
+    changes are rolled back and the exception is propagated, so none of the
+    operations of the batch reaches the disk.
+    Long-running programs may also call commit() and rollback() by themselves
+    and keep the session (and the lock) open between the batches.
+
+    Rolling back re-reads the inventory from disk, which is unchanged since the
+    last commit as the lock is held, so a successful batch does not pay for
+    taking a snapshot of the in-memory data. The inventory object is replaced
+    in the process, references to it obtained via .inventory should not be kept
+    across rollbacks.
+    """
+
+    __slots__ = ['_inventory_path', '_backend', '_journal', '_initialize',
+                 '_inventory', '_lock']
+
+    def __init__(self, inventory_path, backend_domain, backend='yaml',
+                 initialize=False, journal=False, extra_ipaddress_keywords=[],
+                 extra_ipnetwork_keywords=[], extra_integer_keywords=[],
+                 lock_timeout=60):
+        """Build a new InventorySession object
+
+        Args:
+            inventory_path: name of the inventory file to use
+            backend_domain: domain the hostnames are relative to
+            backend: storage backend, either 'yaml', 'json', 'binary',
+                'sharded' or 'sqlite'
+            initialize: create an empty inventory instead of loading one
+            journal: append changes to the journal file instead of re-writing
+                the whole inventory each time.
+            extra_*_keywords: like the same parameters of cmdline.main()
+            lock_timeout: how many seconds to wait for the inventory lock
+        """
+        HostnameParser.set_backend_domain(backend_domain)
+        KeyWordValidator.set_extra_ipaddress_keywords(extra_ipaddress_keywords)
+        KeyWordValidator.set_extra_ipnetwork_keywords(extra_ipnetwork_keywords)
+        KeyWordValidator.set_extra_integer_keywords(extra_integer_keywords)
+        self._inventory_path = inventory_path
+        self._backend = backend
+        self._journal = journal
+        self._initialize = initialize
+        self._inventory = None
+        self._lock = InventoryLock(inventory_path, timeout=lock_timeout)
+
+    @property
+    def inventory(self):
+        """Inventory object of the session, (re-)loaded if necessary
+
+        Raises:
+            GenericException: session has not been opened
+        """
+        if self._inventory is None:
+            if not self._lock.is_locked():
+                raise GenericException("Inventory session is not open")
+            self._inventory = open_inventory(self._inventory_path,
+                                             self._backend,
+                                             initialize=self._initialize,
+                                             journal=self._journal)
+        return self._inventory
+
+    def __getattr__(self, name):
+        # Only called for attributes the session itself does not have:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.inventory, name)
+
+    def open(self):
+        """Lock and load the inventory
+
+        Raises:
+            GenericException: lock could not be acquired
+            BadDataException, MalformedInputException: inventory can not be
+                loaded
+        """
+        self._lock.acquire()
+        try:
+            self.inventory
+        except:
+            self._lock.release()
+            raise
+
+    def commit(self, compact=False):
+        """Save all the changes made since the last commit/rollback
+
+        Args:
+            compact: passed to the save() method of the inventory
+
+        Raises:
+            IOError: there has been a problem with saving the data.
+        """
+        self.inventory.save(compact=compact)
+        self._initialize = False
+
+    def rollback(self):
+        """Discard all the changes made since the last commit/rollback"""
+        if self._inventory is None:
+            return
+        logging.debug("Rolling back changes to {0}".format(
+                      self._inventory_path))
+        # I.e. uncommitted SQLite transaction holds the database lock:
+        self._inventory.close()
+        self._inventory = None
+
+    def close(self):
+        """Release the lock, changes that were not committed are discarded"""
+        self.rollback()
+        self._lock.release()
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, *unused):
+        # Any exception, ScriptException included, rolls back the batch:
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.close()
+        return False
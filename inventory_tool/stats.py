@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2014 Pawel Rozlach, Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+import os
+
+# Output formats of the "stats" subcommand:
+FORMATS = ['human', 'json', 'prometheus']
+
+_PREFIX = "inventory_tool_"
+
+# Metrics of each pool: (key of IPPool.get_stats(), help text)
+_POOL_METRICS = [
+    ("size", "Number of addresses available for allocation."),
+    ("allocated", "Number of allocated addresses."),
+    ("reserved", "Number of reserved addresses."),
+    ("free", "Number of addresses that can be still auto-allocated."),
+    ("free_ranges", "Number of continuous ranges of free addresses."),
+    ("largest_free_range", "Size of the largest range of free addresses."),
+    ("fragmentation", "1 - largest free range / free addresses."),
+]
+
+
+def file_size(path):
+    """Return the size of the inventory in bytes
+
+    Args:
+        path: path of the inventory file, or the directory of the sharded
+            inventory
+
+    Returns:
+        Size of the file or total size of all the files in the directory,
+        None if the inventory does not exist.
+    """
+    if os.path.isdir(path):
+        ret = 0
+        for root, _, files in os.walk(path):
+            ret += sum(os.path.getsize(os.path.join(root, x)) for x in files)
+        return ret
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def collect(inventory, inventory_path, top=10):
+    """Gather statistics of the inventory
+
+    Args:
+        inventory: inventory object
+        inventory_path: where the inventory is stored
+        top: number of the largest groups to report
+
+    Returns:
+        A hash returned by inventory's get_stats(), with "file_size" key
+        added.
+    """
+    ret = inventory.get_stats(top=top)
+    ret["file_size"] = file_size(inventory_path)
+    return ret
+
+
+def format_human(stats):
+    """Format statistics in human-readable form"""
+    ret = "Hosts: {0}\n".format(stats["hosts"])
+    ret += "Aliases: {0}\n".format(stats["aliases"])
+    ret += "Groups: {0}\n".format(stats["groups"])
+    ret += "IP pools: {0}\n".format(stats["ippools"])
+    if stats["file_size"] is not None:
+        ret += "File size: {0} bytes\n".format(stats["file_size"])
+    ret += "Largest groups:\n"
+    if stats["largest_groups"]:
+        for group, size in stats["largest_groups"]:
+            ret += "\t{0}: {1} hosts\n".format(group, size)
+    else:
+        ret += "\t<None>\n"
+    ret += "IP pools usage:\n"
+    if stats["pools"]:
+        for name in sorted(stats["pools"]):
+            pool = stats["pools"][name]
+            used = pool["size"] - pool["free"]
+            ret += "\t{0} ({1}): {2}/{3} used ({4:.1f}%), ".format(
+                name, pool["network"], used, pool["size"],
+                100.0 * used / pool["size"] if pool["size"] else 100.0)
+            ret += "{0} allocated, {1} reserved, {2} free in {3} ranges, ".format(
+                pool["allocated"], pool["reserved"], pool["free"],
+                pool["free_ranges"])
+            ret += "fragmentation {0:.2f}\n".format(pool["fragmentation"])
+    else:
+        ret += "\t<None>\n"
+    return ret
+
+
+def _label(value):
+    """Escape label value as required by Prometheus text format"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric(name, help_text, samples):
+    """Format a single gauge with all its samples
+
+    Args:
+        samples: a list of (labels, value) tuples, labels being a list of
+            (name, value) tuples
+    """
+    ret = "# HELP {0}{1} {2}\n".format(_PREFIX, name, help_text)
+    ret += "# TYPE {0}{1} gauge\n".format(_PREFIX, name)
+    for labels, value in samples:
+        tmp = ",".join('{0}="{1}"'.format(x, _label(y)) for x, y in labels)
+        ret += "{0}{1}{2} {3}\n".format(_PREFIX, name,
+                                        "{" + tmp + "}" if tmp else "", value)
+    return ret
+
+
+def format_prometheus(stats):
+    """Format statistics in Prometheus text exposition format"""
+    ret = _metric("hosts", "Number of hosts.", [([], stats["hosts"])])
+    ret += _metric("aliases", "Number of host aliases.", [([], stats["aliases"])])
+    ret += _metric("groups", "Number of groups.", [([], stats["groups"])])
+    ret += _metric("ippools", "Number of IP pools.", [([], stats["ippools"])])
+    if stats["file_size"] is not None:
+        ret += _metric("file_size_bytes", "Size of the inventory on disk.",
+                       [([], stats["file_size"])])
+    ret += _metric("group_hosts", "Number of hosts of the largest groups.",
+                   [([("group", x)], y) for x, y in stats["largest_groups"]])
+    for key, help_text in _POOL_METRICS:
+        samples = [([("pool", x), ("network", stats["pools"][x]["network"])],
+                    stats["pools"][x][key]) for x in sorted(stats["pools"])]
+        ret += _metric("ippool_" + key, help_text, samples)
+    return ret
+
+
+def write_textfile(path, text):
+    """Atomically replace a file read by node_exporter's textfile collector
+
+    The collector may read the file at any time, so it must never see it
+    half-written.
+    """
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as fh:
+        fh.write(text)
+    os.rename(tmp, path)
@@ -14,8 +14,8 @@
 # License for the specific language governing permissions and limitations under
 # the License.
 
-import argparse
 import re
+import sys
 
 from inventory_tool.exception import MalformedInputException
 import inventory_tool.object.ippool as i
@@ -30,6 +30,16 @@ except ImportError:
     from ipaddr import IPNetwork as ip_network
 
 
+def _argument_error(msg):
+    """Build argparse.ArgumentTypeError exception
+
+    argparse is imported only when it is needed, as importing it is a
+    significant part of the startup time of "--list" calls.
+    """
+    import argparse
+    return argparse.ArgumentTypeError(msg)
+
+
 class KeyWordValidator():
     _default_ipaddres_keywords = ["ansible_ssh_host", ]
     _ipaddres_keywords = _default_ipaddres_keywords
@@ -86,6 +96,10 @@ class KeyWordValidator():
 
 class HostnameParser():
     _backend_domain = None
+    # Hostnames are normalized by nearly every operation on the inventory, the
+    # suffix is built only once, when the backend domain is set:
+    _suffix = None
+
     @classmethod
     def normalize_hostname(cls, name):
         """Remove backend domain from hostname
@@ -104,15 +118,19 @@ class HostnameParser():
             msg = "{0} contains default backend domain, append '.' to the end " + \
                   "to force absolute dns names"
             raise MalformedInputException(msg.format(name))
-        suffix = '.' + cls._backend_domain + '.'
-        if re.search(suffix + '$', name):
-            return name[:-len(suffix)]
+        if name.endswith(cls._suffix):
+            return name[:-len(cls._suffix)]
         else:
             return name
 
     @classmethod
     def set_backend_domain(cls, domain):
         cls._backend_domain = domain
+        cls._suffix = None if domain is None else '.' + domain + '.'
+
+    @classmethod
+    def get_backend_domain(cls):
+        return cls._backend_domain
 
 
 def get_ippool(string):
@@ -135,7 +153,7 @@ def get_ippool(string):
     except ValueError as e:
         msg = "IPPool network requires proper " + \
               "ipv4/ipv6 network as a value: " + str(e)
-        raise argparse.ArgumentTypeError(msg)
+        raise _argument_error(msg)
     return tmp
 
 
@@ -159,10 +177,54 @@ def get_ipaddr(string):
         tmp = ip_address(string)
     except ValueError as e:
         msg = "A valid ipv4/ipv6 addreess is required: " + str(e)
-        raise argparse.ArgumentTypeError(msg)
+        raise _argument_error(msg)
     return tmp
 
 
+# Limits from RFC 1035, the length of the name does not include the trailing
+# dot:
+_MAX_LABEL_LENGTH = 63
+_MAX_DOMAIN_NAME_LENGTH = 253
+_LABEL_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789-')
+
+# A single character class, so matching never backtracks:
+_NAME_REGEXP = re.compile(r'[\w\-\.]{2,}\Z')
+
+
+def _domain_name_error(name):
+    """Check domain name label by label
+
+    Each character is looked at a fixed number of times, so even long,
+    malformed names, i.e. read from a file with thousands of hosts, are
+    rejected in linear time.
+
+    Args:
+        name: domain name to check, absolute (with a trailing dot) or not
+
+    Returns:
+        None if the name is valid, description of the problem otherwise.
+    """
+    if name.endswith('.'):
+        name = name[:-1]
+    if not name:
+        return "name is empty"
+    if len(name) > _MAX_DOMAIN_NAME_LENGTH:
+        return "name is longer than {0} characters".format(
+            _MAX_DOMAIN_NAME_LENGTH)
+    for label in name.split('.'):
+        if not label:
+            return "name contains an empty label"
+        if len(label) > _MAX_LABEL_LENGTH:
+            return "label {0} is longer than {1} characters".format(
+                label, _MAX_LABEL_LENGTH)
+        if not _LABEL_CHARS.issuperset(label):
+            return "label {0} contains characters other than " \
+                   "a-z, 0-9 and '-'".format(label)
+        if label[0] == '-' or label[-1] == '-':
+            return "label {0} starts or ends with '-'".format(label)
+    return None
+
+
 def get_fqdn(string):
     """Check whether string is valid domain name.
 
@@ -179,14 +241,14 @@ def get_fqdn(string):
         argparse.ArgumentTypeError: string does not represent a valid domain
         name or is a relative name and contains backend_domain string.
     """
-    match = re.match(r'(([a-z0-9]\-*[a-z0-9]*){1,63}\.?){1,255}$', string)
-    if not match:
-        msg = "{0} is not proper domain name.".format(string)
-        raise argparse.ArgumentTypeError(msg)
+    reason = _domain_name_error(string)
+    if reason is not None:
+        msg = "{0} is not proper domain name: {1}.".format(string, reason)
+        raise _argument_error(msg)
     try:
         return HostnameParser.normalize_hostname(string)
     except MalformedInputException as e:
-        raise argparse.ArgumentTypeError(str(e)) from e
+        raise _argument_error(str(e)) from e
 
 
 def get_name(string):
@@ -205,13 +267,152 @@ def get_name(string):
         argparse.ArgumentTypeError: string does not represent a valid
         name.
     """
-    match = re.match(r'[\w\-\.]{2,}$', string)
-    if not match:
+    if not _NAME_REGEXP.match(string):
         msg = "{0} is not proper name.".format(string)
-        raise argparse.ArgumentTypeError(msg)
+        raise _argument_error(msg)
     return string
 
 
+def get_count(string):
+    """Parse a non-negative integer, i.e. a number of items to show
+
+    Args:
+        string: string to parse
+
+    Returns:
+        Parsed integer.
+
+    Raises:
+        argparse.ArgumentTypeError: string does not represent a non-negative
+        integer.
+    """
+    try:
+        tmp = int(string)
+    except ValueError:
+        tmp = -1
+    if tmp < 0:
+        msg = "{0} is not a non-negative integer.".format(string)
+        raise _argument_error(msg)
+    return tmp
+
+
+def expand_ranges(string):
+    """Expand numeric ranges in a name, i.e. web[001:250].dc1
+
+    Numbers are zero-padded to the width of the start of the range if it
+    begins with "0". Many ranges give all the combinations of their values.
+
+    Args:
+        string: name to expand
+
+    Returns:
+        A list of names, just [string] if there are no ranges in it.
+
+    Raises:
+        argparse.ArgumentTypeError: range is malformed.
+    """
+    parts = re.split(r'\[([^\]]*)\]', string)
+    if len(parts) == 1:
+        return [string]
+    ret = [parts[0]]
+    for i in range(1, len(parts), 2):
+        match = re.match(r'(\d+):(\d+)$', parts[i])
+        if not match or int(match.group(1)) > int(match.group(2)):
+            msg = "[{0}] in {1} is not proper range.".format(parts[i], string)
+            raise _argument_error(msg)
+        start, end = match.group(1), match.group(2)
+        width = len(start) if start.startswith("0") else 0
+        values = ["{0:0{1}d}".format(x, width)
+                  for x in range(int(start), int(end) + 1)]
+        ret = [x + y + parts[i + 1] for x in ret for y in values]
+    return ret
+
+
+def names_source(validator, ranges=False):
+    """Build a parser of -n/--*-name option values
+
+    Apart from a single name, the option accepts "@path" - a file with one
+    name per line, and "-" - the same read from stdin. Empty lines and lines
+    starting with "#" are skipped.
+
+    Args:
+        validator: function validating each of the names, i.e. get_fqdn
+        ranges: expand numeric ranges in the names, see expand_ranges()
+
+    Returns:
+        A function returning a list of validated names.
+    """
+    def parse(string):
+        if string != "-" and not string.startswith("@"):
+            names = [string]
+        else:
+            try:
+                if string == "-":
+                    lines = sys.stdin.readlines()
+                else:
+                    with open(string[1:]) as fh:
+                        lines = fh.readlines()
+            except IOError as e:
+                msg = "Failed to read names from {0}: {1}".format(string[1:], e)
+                raise _argument_error(msg) from e
+            names = [x.strip() for x in lines]
+            names = [x for x in names if x and not x.startswith("#")]
+        if ranges:
+            names = [y for x in names for y in expand_ranges(x)]
+        return [validator(x) for x in names]
+    parse.__name__ = validator.__name__
+    return parse
+
+
+def names_list(validator):
+    """Build a parser of comma separated lists of names, i.e. "web,db"
+
+    Args:
+        validator: function validating each of the names, i.e. get_name
+
+    Returns:
+        A function returning a list of validated names.
+    """
+    def parse(string):
+        names = [x.strip() for x in string.split(',') if x.strip()]
+        if not names:
+            raise _argument_error("{0} does not contain any names.".format(
+                                  string))
+        return [validator(x) for x in names]
+    parse.__name__ = validator.__name__
+    return parse
+
+
+def get_condition(string):
+    """Parse a condition on host's variable
+
+    Args:
+        string: "key=val" - the value of the variable is val, or "key~network"
+            - the variable is an ip address from the network, i.e.
+            "tunnel_ip~10.9.0.0/16"
+
+    Returns:
+        A hash with key "key" and either "val" (a string) or "network" (an
+        ip_network object), suitable as arguments of host_find() method of the
+        inventory.
+
+    Raises:
+        argparse.ArgumentTypeError: condition is malformed.
+    """
+    match = re.match(r'([\w\-]{2,})([=~])(.+)$', string)
+    if not match:
+        msg = "{0} is not proper key=val or key~network condition.".format(string)
+        raise _argument_error(msg)
+    if match.group(2) == '=':
+        return {"key": match.group(1), "val": match.group(3)}
+    try:
+        network = ip_network(match.group(3), strict=False)
+    except ValueError as e:
+        msg = "Condition {0} requires proper ipv4/ipv6 network: {1}"
+        raise _argument_error(msg.format(string, str(e)))
+    return {"key": match.group(1), "network": network}
+
+
 def get_keyval(string):
     """Parse a key-value string into object.
 
@@ -233,7 +434,7 @@ def get_keyval(string):
     match = re.match(r'([\w\-]{2,})(?::([\w\-\./\\\@]{2,}))?$', string)
     if not match:
         msg = "{0} is not proper key-val argument.".format(string)
-        raise argparse.ArgumentTypeError(msg)
+        raise _argument_error(msg)
     ret = {"key": match.group(1), "val": match.group(2)}
 
     # Integer type k-vals:
@@ -244,7 +445,7 @@ def get_keyval(string):
         except ValueError:
             msg = "Key param {0}".format(ret["key"])
             msg += " requires integer as a value."
-            raise argparse.ArgumentTypeError(msg)
+            raise _argument_error(msg)
 
     # ipaddress type k-vals:
     if KeyWordValidator.is_ipaddress_keyword(ret["key"]):
@@ -262,7 +463,7 @@ def get_keyval(string):
         except ValueError as e:
             msg = "Key param {0} requires proper ".format(ret["key"]) + \
                   "ipv4/ipv6 network as a value: " + str(e)
-            raise argparse.ArgumentTypeError(msg)
+            raise _argument_error(msg)
 
     # ansible_connection type k-val:
     if ret["key"] == "ansible_connection":
@@ -271,7 +472,7 @@ def get_keyval(string):
                   "one of following connection types: " + \
                   ','.join(KeyWordValidator.get_connection_keywords()) + \
                   " as a value."
-            raise argparse.ArgumentTypeError(msg)
+            raise _argument_error(msg)
         else:
             return ret
 
@@ -36,3 +36,8 @@ MISSING_ANSIBLE_SSH_HOST_INVENTORY = op.join(_fabric_base_dir, 'missing_ansible_
 HOSTVARS_INVENTORY = op.join(_fabric_base_dir, 'hostvars.yml')
 IPADDR_AUTOALLOCATION_INVENTORY = op.join(_fabric_base_dir, 'ipaddr-autoallocation.yml')
 CHILD_GROUPS_INVENTORY = op.join(_fabric_base_dir, 'child-groups.yml')
+EMITTER_GOLDEN_FILE = op.join(_fabric_base_dir, 'emitter-golden.yml')
+TMP_PSTATS = op.join(_fabric_base_dir, 'tmp.pstats')
+TMP_NAMES = op.join(_fabric_base_dir, 'tmp-names.txt')
+ANSIBLE_INI_INVENTORY = op.join(_fabric_base_dir, 'ansible-inventory/hosts')
+ANSIBLE_YAML_INVENTORY = op.join(_fabric_base_dir, 'ansible-inventory/hosts.yml')
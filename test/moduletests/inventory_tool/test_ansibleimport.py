@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.ansibleimport as ai
+import inventory_tool.object.inventory as iv
+import inventory_tool.object.sqlinventory as sq
+import inventory_tool.validators as v
+from inventory_tool.exception import MalformedInputException
+
+
+class TestAnsibleImportBase(unittest.TestCase):
+    def setUp(self):
+        for patched in ['logging.debug',
+                        'logging.info',
+                        'logging.warning',
+                        ]:
+            patcher = mock.patch(patched)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        v.HostnameParser.set_backend_domain('example.com')
+        v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+
+class TestAnsibleInventory(TestAnsibleImportBase):
+    def test_ini_structure(self):
+        source = ai.read(paths.ANSIBLE_INI_INVENTORY)
+        self.assertEqual(sorted(source.hosts),
+                         ['bastion', 'db1.dc1', 'db2.dc1', 'web01.dc1',
+                          'web02.dc1', 'web03.dc1', 'weird'])
+        self.assertEqual(source.groups['web']['hosts'],
+                         ['web01.dc1', 'web02.dc1', 'web03.dc1', 'weird'])
+        self.assertEqual(source.groups['dc1']['children'], ['web', 'db'])
+        self.assertEqual(source.hosts['weird'],
+                         {'ansible_host': '10.1.0.77', 'ansible_port': 2222})
+        self.assertEqual(source.hosts['db1.dc1']['aliases'], ['db-master.dc1'])
+        self.assertEqual(source.problems,
+                         [(os.path.join('group_vars', 'nope.yml'),
+                           'variables of an object that is not in the inventory')])
+
+    def test_yaml_gives_the_same_hosts(self):
+        ini = ai.read(paths.ANSIBLE_INI_INVENTORY)
+        yml = ai.read(paths.ANSIBLE_YAML_INVENTORY)
+        self.assertEqual(ini.get_hostvars(), yml.get_hostvars())
+        self.assertEqual(sorted(ini.groups), sorted(yml.groups))
+
+    def test_variables_precedence(self):
+        hostvars = ai.read(paths.ANSIBLE_INI_INVENTORY).get_hostvars()
+        # all < parent group < child group < host:
+        self.assertEqual(hostvars['web01.dc1']['ansible_user'], 'admin')
+        self.assertEqual(hostvars['db1.dc1']['dc'], 'dc1')
+        self.assertEqual(hostvars['web02.dc1']['dc'], 'dc1-web')
+        self.assertEqual(hostvars['web01.dc1']['ansible_host'], '192.168.125.10')
+        self.assertEqual(hostvars['web02.dc1']['aliases'], ['www.dc1'])
+
+    def test_missing_file(self):
+        with self.assertRaises(MalformedInputException):
+            ai.load(paths.ANSIBLE_INI_INVENTORY + '.missing')
+
+
+class TestImportInventory(TestAnsibleImportBase):
+    def test_import(self):
+        inventory = iv.InventoryData(paths.TEST_INVENTORY)
+        summary = ai.import_inventory(inventory,
+                                      ai.read(paths.ANSIBLE_INI_INVENTORY))
+        self.assertEqual((summary.hosts, summary.groups, summary.aliases,
+                          summary.addresses), (4, 3, 1, 2))
+        self.assertEqual(sorted(x[0] for x in summary.conflicts),
+                         ['group_vars/nope.yml', 'host db1.dc1', 'host db2.dc1',
+                          'host web03.dc1'])
+        self.assertIn("Skipped due to 4 conflicts:", str(summary))
+
+        web01 = inventory.host_get('web01.dc1')
+        self.assertEqual(str(web01.get_keyval('ansible_ssh_host')),
+                         '192.168.125.10')
+        self.assertEqual(web01.get_keyval('http_port'), 80)
+        self.assertIn('192.168.125.10',
+                      inventory.ippool_get('y1_guests').get_hash()['allocated'])
+        self.assertEqual(inventory.host_get('web02.dc1').get_aliases(),
+                         ['www.dc1'])
+        self.assertEqual(inventory.host_get('weird').get_keyval('ansible_ssh_port'),
+                         2222)
+        # Hosts without a valid ansible_ssh_host are skipped as a whole, and
+        # so are their aliases:
+        self.assertEqual(sorted(inventory.host_get()),
+                         ['bastion', 'foobarator.y1', 'web01.dc1', 'web02.dc1',
+                          'weird', 'y1', 'y1-front.foobar'])
+        self.assertNotIn('db-master.dc1', inventory.host_get('y1').get_aliases())
+        conflicts = dict(summary.conflicts)
+        self.assertEqual(conflicts['host db1.dc1'],
+                         "ansible_ssh_host 192.168.125.3 is already " +
+                         "allocated or reserved, host skipped")
+        self.assertEqual(conflicts['host web03.dc1'],
+                         "ansible_ssh_host variable is not set, host skipped")
+        # All of them can be passed to Ansible:
+        self.assertEqual(len(list(inventory.iter_ansible_hostvars())), 7)
+        self.assertEqual(sorted(inventory.group_get('dc1').get_children()),
+                         ['db', 'web'])
+        self.assertEqual(inventory.group_get('db').get_hosts(), [])
+
+        # Nothing new the second time:
+        summary = ai.import_inventory(inventory,
+                                      ai.read(paths.ANSIBLE_YAML_INVENTORY))
+        self.assertEqual((summary.hosts, summary.groups), (0, 0))
+        self.assertEqual(len(summary.conflicts), 8)
+
+    def test_import_to_sqlite_matches_yaml_backend(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        obj = sq.SQLiteInventoryData(os.path.join(tmpdir, 'inventory.sqlite'),
+                                     initialize=True)
+        self.addCleanup(obj.close)
+        obj.import_yaml(paths.TEST_INVENTORY)
+        ai.import_inventory(obj, ai.read(paths.ANSIBLE_INI_INVENTORY))
+        expected = iv.InventoryData(paths.TEST_INVENTORY)
+        ai.import_inventory(expected, ai.read(paths.ANSIBLE_INI_INVENTORY))
+        self.assertEqual(obj.get_hash(), expected.get_hash())
+
+
+class TestHostImport(TestAnsibleImportBase):
+    def setUp(self):
+        super().setUp()
+        self.obj = iv.InventoryData(paths.TEST_INVENTORY)
+
+    def test_alias_in_use(self):
+        before = self.obj.get_hash()
+        for hosts in [{"new1": {"aliases": ["new2"], "keyvals": {}},
+                       "new2": {"aliases": [], "keyvals": {}}},
+                      {"new1": {"aliases": ["front-foobar.y1"], "keyvals": {}}},
+                      {"y1": {"aliases": [], "keyvals": {}}}]:
+            with self.assertRaises(MalformedInputException):
+                self.obj.host_import(hosts)
+            self.assertEqual(self.obj.get_hash(), before)
+
+    def test_address_in_use(self):
+        before = self.obj.get_hash()
+        with self.assertRaises(MalformedInputException):
+            self.obj.host_import({
+                "new1": {"aliases": [], "keyvals": {"tunnel_ip": "192.168.255.1"}},
+                "new2": {"aliases": [], "keyvals": {"tunnel_ip": "192.168.255.125"}}})
+        self.assertEqual(self.obj.get_hash(), before)
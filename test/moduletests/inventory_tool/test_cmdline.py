@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import io
+import json
+import mock
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.cmdline as cmd
+import inventory_tool.object.inventory as iv
+from inventory_tool.exception import BadDataException
+
+_main_dir = os.path.abspath(pwd + '/../../../')
+
+
+class TestParseCommandline(unittest.TestCase):
+    def setUp(self):
+        cmd.HostnameParser.set_backend_domain('example.com')
+
+    def tearDown(self):
+        cmd.HostnameParser.set_backend_domain(None)
+
+    def test_list_fast_path(self):
+        args = cmd.parse_commandline('test', ['--list'])
+        self.assertTrue(args.list)
+        self.assertIsNone(args.host)
+        self.assertFalse(args.initialize_inventory)
+        self.assertIsNone(args.subcommand)
+        self.assertIn('subcommand', args)
+
+    def test_host_fast_path(self):
+        args = cmd.parse_commandline('test', ['--host', 'y1'])
+        self.assertEqual(args.host, 'y1')
+        self.assertFalse(args.list)
+
+    def test_other_switches_use_the_full_parser(self):
+        args = cmd.parse_commandline('test', ['-s', '--host', 'y1'])
+        self.assertEqual(args.host, 'y1')
+        self.assertTrue(args.std_err)
+        args = cmd.parse_commandline('test', ['host', '-n', 'y1', '-s'])
+        self.assertEqual(args.subcommand, 'host')
+
+    def test_list_and_host_are_mutually_exclusive(self):
+        with mock.patch('sys.stderr', new_callable=io.StringIO):
+            with self.assertRaises(SystemExit):
+                cmd.parse_commandline('test', ['--list', '--host', 'y1'])
+            with self.assertRaises(SystemExit):
+                cmd.parse_commandline('test', ['--host', 'y1', 'host', '-l'])
+
+    def test_list_does_not_import_unneeded_modules(self):
+        script = ("import sys\n"
+                  "import inventory_tool.cmdline as cmd\n"
+                  "cmd.parse_commandline('test', ['--list'])\n"
+                  "print(' '.join(x for x in ['argparse', 'yaml', 'sqlite3', "
+                  "'logging.handlers'] if x in sys.modules))\n")
+        res = subprocess.check_output([sys.executable, '-c', script],
+                                      cwd=_main_dir, universal_newlines=True)
+        self.assertEqual(res.strip(), '')
+
+
+class TestJsonOutput(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('logging.warning')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cmd.HostnameParser.set_backend_domain('example.com')
+        cmd.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+
+    def tearDown(self):
+        cmd.HostnameParser.set_backend_domain(None)
+        cmd.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def test_streaming_writer_matches_json_dumps(self):
+        for path in [paths.TEST_INVENTORY, paths.CHILD_GROUPS_INVENTORY]:
+            inventory = iv.InventoryData(path)
+            res = inventory.get_ansible_inventory()
+            for compact, kwargs in [(False, {"indent": 4, "separators": (',', ': ')}),
+                                    (True, {"separators": (',', ':')})]:
+                out = io.StringIO()
+                cmd.write_ansible_inventory(inventory, out, compact=compact)
+                self.assertEqual(out.getvalue(),
+                                 json.dumps(res, sort_keys=True, **kwargs) + '\n')
+
+    def test_streaming_writer_empty_inventory(self):
+        inventory = iv.InventoryData(paths.TMP_INVENTORY, initialize=True)
+        for compact in [False, True]:
+            out = io.StringIO()
+            cmd.write_ansible_inventory(inventory, out, compact=compact)
+            self.assertEqual(json.loads(out.getvalue()),
+                             inventory.get_ansible_inventory())
+
+    def test_streaming_writer_malformed_host(self):
+        inventory = iv.InventoryData(paths.MISSING_ANSIBLE_SSH_HOST_INVENTORY)
+        out = io.StringIO()
+        with self.assertRaises(BadDataException):
+            cmd.write_ansible_inventory(inventory, out)
+        self.assertEqual(out.getvalue(), '')
+
+    def test_compact_unless_tty(self):
+        for argv, isatty, compact in [(['--list'], False, True),
+                                      (['--list'], True, False),
+                                      (['--list', '--pretty'], False, False),
+                                      (['--list', '--compact'], True, True)]:
+            with mock.patch('sys.stdout') as StdoutMock, \
+                    mock.patch('logging.getLogger'), \
+                    mock.patch('inventory_tool.cmdline.InventoryLock'), \
+                    mock.patch('inventory_tool.cmdline.write_ansible_inventory') as WriterMock:
+                StdoutMock.isatty.return_value = isatty
+                with self.assertRaises(SystemExit):
+                    cmd.main(['test'] + argv, paths.TEST_INVENTORY,
+                             backend_domain='example.com',
+                             extra_ipaddress_keywords=['tunnel_ip'])
+            self.assertEqual(WriterMock.call_args[1]["compact"], compact, argv)
+
+
+class TestHostSwitch(unittest.TestCase):
+    def _run(self, host):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as StdoutMock, \
+                mock.patch('logging.getLogger'), \
+                mock.patch('inventory_tool.cmdline.InventoryLock'):
+            with self.assertRaises(SystemExit) as e:
+                cmd.main(['test', '--host', host], paths.TEST_INVENTORY,
+                         backend_domain='example.com',
+                         extra_ipaddress_keywords=['tunnel_ip'])
+            self.assertEqual(e.exception.code, 0)
+        return StdoutMock.getvalue()
+
+    def tearDown(self):
+        cmd.HostnameParser.set_backend_domain(None)
+        cmd.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def test_existing_host(self):
+        self.assertEqual(json.loads(self._run('y1'))["tunnel_ip"],
+                         "192.168.255.125")
+
+    def test_missing_host(self):
+        self.assertEqual(self._run('nonexistant').strip(), '{}')
+
+
+class TestShowSwitch(unittest.TestCase):
+    def _run(self, argv, code=0):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as StdoutMock, \
+                mock.patch('sys.stderr', new_callable=io.StringIO), \
+                mock.patch('logging.getLogger'), \
+                mock.patch('inventory_tool.cmdline.InventoryLock'):
+            with self.assertRaises(SystemExit) as e:
+                cmd.main(['test'] + argv, paths.TEST_INVENTORY,
+                         backend_domain='example.com',
+                         extra_ipaddress_keywords=['tunnel_ip'])
+            self.assertEqual(e.exception.code, code)
+        return StdoutMock.getvalue()
+
+    def tearDown(self):
+        cmd.HostnameParser.set_backend_domain(None)
+        cmd.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def test_single_host(self):
+        res = self._run(['host', '-n', 'y1', '-s'])
+        self.assertTrue(res.startswith("Aliases:\n"))
+
+    def test_many_hosts(self):
+        res = self._run(['host', '-s', 'y1', 'foobarator.y1'])
+        self.assertTrue(res.startswith("y1:\nAliases:\n"))
+        self.assertIn("\nfoobarator.y1:\nAliases:\n", res)
+
+    def test_all_groups_json(self):
+        res = json.loads(self._run(['--pretty', 'group', '-s', '--all', '--json']))
+        self.assertEqual(sorted(res), ['front', 'guests-y1', 'hypervisor'])
+        self.assertEqual(res['hypervisor']['hosts'], ['y1'])
+
+    def test_ippools_json(self):
+        res = json.loads(self._run(['ippool', '-s', 'tunels', '--json']))
+        self.assertEqual(res['tunels']['allocated'], ['192.168.255.125'])
+
+    def test_missing_object(self):
+        self.assertEqual(self._run(['host', '-s', 'y1', 'nonexistant'], code=1),
+                         '')
+
+    def test_no_names(self):
+        self._run(['host', '-s'], code=1)
+        self._run(['host', '-n', 'y1', '-s', '--all'], code=1)
+        self._run(['host', '-l', '--all'], code=1)
+
+
+class TestHostPatterns(unittest.TestCase):
+    def _run(self, argv, code=0):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as StdoutMock, \
+                mock.patch('sys.stderr', new_callable=io.StringIO), \
+                mock.patch('logging.getLogger'), \
+                mock.patch('inventory_tool.cmdline.InventoryLock'):
+            with self.assertRaises(SystemExit) as e:
+                cmd.main(['test'] + argv, paths.TEST_INVENTORY,
+                         backend_domain='example.com',
+                         extra_ipaddress_keywords=['tunnel_ip'])
+            self.assertEqual(e.exception.code, code)
+        return StdoutMock.getvalue()
+
+    def tearDown(self):
+        cmd.HostnameParser.set_backend_domain(None)
+        cmd.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def test_query(self):
+        self.assertEqual(self._run(['query', '--pattern', 'guests-y1:!front']),
+                         "foobarator.y1\n")
+
+    def test_list_limit(self):
+        res = json.loads(self._run(['--list', '--limit', 'guests-y1:&front']))
+        self.assertEqual(sorted(res), ['_meta', 'all', 'front', 'guests-y1'])
+        self.assertEqual(res['all']['hosts'], ['y1-front.foobar'])
+        self.assertEqual(res['guests-y1']['hosts'], ['y1-front.foobar'])
+        self.assertEqual(list(res['_meta']['hostvars']), ['y1-front.foobar'])
+
+    def test_limit_requires_list(self):
+        self._run(['--limit', 'all', 'host', '-l'], code=1)
+        self._run(['--groups', 'front', 'host', '-l'], code=1)
+        self._run(['--vars', 'tunnel_ip', 'host', '-l'], code=1)
+
+    def test_limit_options_do_not_clash(self):
+        res = self._run(['ippool', '-n', 'tunels', '-s', '--limit', '2'])
+        self.assertIn('192.168.255.125', res)
+        res = json.loads(self._run(['--list', '--limit', 'guests-y1:!front']))
+        self.assertEqual(res['all']['hosts'], ['foobarator.y1'])
+
+    def test_list_groups(self):
+        res = json.loads(self._run(['--list', '--groups', 'hypervisor,front']))
+        self.assertEqual(sorted(res), ['_meta', 'all', 'front', 'hypervisor'])
+        self.assertEqual(res['all']['hosts'], ['y1', 'y1-front.foobar'])
+        self.assertEqual(sorted(res['_meta']['hostvars']),
+                         ['y1', 'y1-front.foobar'])
+
+    def test_host_where(self):
+        self.assertEqual(self._run(['host', '--where',
+                                    'ansible_ssh_host~192.168.125.0/24']),
+                         "foobarator.y1\ny1-front.foobar\n")
+        self.assertEqual(self._run(['host', '-w', 'ansible_ssh_host~192.168.0.0/16',
+                                    '-w', 'ansible_ssh_host=192.168.125.3']),
+                         "foobarator.y1\n")
+        self.assertEqual(self._run(['host', '-w', 'tunnel_ip=10.0.0.1']), "")
+
+    def test_host_where_with_other_options(self):
+        self._run(['host', '-n', 'y1', '-w', 'tunnel_ip=10.0.0.1'], code=1)
+        self._run(['host', '-w', 'tunnel_ip=10.0.0.1', '--var-del', 'foo'],
+                  code=1)
+        self._run(['host', '-w', 'tunnel_ip=10.0.0.1', '-l'], code=2)
+
+    def test_list_missing_group(self):
+        self._run(['--list', '--groups', 'nonexistant'], code=1)
+
+    def test_list_vars(self):
+        res = json.loads(self._run(['--list', '--vars',
+                                    'tunnel_ip,ansible_ssh_host']))
+        self.assertEqual(len(res['all']['hosts']), 3)
+        self.assertEqual(res['_meta']['hostvars']['y1'],
+                         {"ansible_ssh_host": "1.2.3.4",
+                          "tunnel_ip": "192.168.255.125"})
+        self.assertEqual(res['_meta']['hostvars']['foobarator.y1'],
+                         {"ansible_ssh_host": "192.168.125.3"})
+
+    def test_list_groups_with_children(self):
+        cmd.HostnameParser.set_backend_domain('example.com')
+        inventory = iv.InventoryData(paths.TMP_INVENTORY, initialize=True)
+        inventory.load_hash({"ippools": {}, "hosts": {}, "groups": {}})
+        for group in ["parent", "child", "other"]:
+            inventory.group_add(group)
+        inventory.group_child_add("parent", "child")
+        for host, group in [("h1", "child"), ("h2", "other")]:
+            inventory.host_add(host)
+            inventory.host_set_vars(host, [{"key": "ansible_ssh_host",
+                                            "val": "10.0.0.1"}])
+            inventory.group_host_add(group, host)
+        out = io.StringIO()
+        cmd.write_ansible_inventory(inventory, out, groups=["parent"],
+                                    limit="all:!h2")
+        res = json.loads(out.getvalue())
+        self.assertEqual(sorted(res), ['_meta', 'all', 'child', 'parent'])
+        self.assertEqual(res['parent']['children'], ['child'])
+        self.assertEqual(list(res['_meta']['hostvars']), ['h1'])
+
+
+class TestManyNames(unittest.TestCase):
+    def setUp(self):
+        shutil.copy(paths.TEST_INVENTORY, paths.TMP_INVENTORY)
+
+    def tearDown(self):
+        os.unlink(paths.TMP_INVENTORY)
+        cmd.HostnameParser.set_backend_domain(None)
+        cmd.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def _run(self, argv, code=0):
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch('sys.stderr', new_callable=io.StringIO), \
+                mock.patch('logging.getLogger'), \
+                mock.patch('logging.warning'), \
+                mock.patch('inventory_tool.cmdline.InventoryLock'):
+            with self.assertRaises(SystemExit) as e:
+                cmd.main(['test'] + argv, paths.TMP_INVENTORY,
+                         backend_domain='example.com',
+                         extra_ipaddress_keywords=['tunnel_ip'])
+            self.assertEqual(e.exception.code, code)
+        return iv.InventoryData(paths.TMP_INVENTORY)
+
+    def test_add_hosts_with_autoassignment(self):
+        inventory = self._run(['host', '-n', 'new1', 'new2', '-a',
+                               '--group-add', 'guests-y1',
+                               '--var-set', 'ansible_ssh_host'])
+        ips = [inventory.host_get(x).get_keyval('ansible_ssh_host')
+               for x in ['new1', 'new2']]
+        self.assertNotEqual(ips[0], ips[1])
+        for ip in ips:
+            self.assertIn(ip, inventory.ippool_get('y1_guests'))
+
+    def test_many_groups(self):
+        inventory = self._run(['group', '-n', 'front', 'hypervisor',
+                               '--host-add', 'foobarator.y1'])
+        for group in ['front', 'hypervisor']:
+            self.assertIn('foobarator.y1', inventory.group_get(group).get_hosts())
+
+    def test_names_from_stdin(self):
+        # Duplicated names are skipped:
+        names = "foobarator.y1\ny1-front.foobar\nfoobarator.y1\n"
+        with mock.patch('sys.stdin', new=io.StringIO(names)):
+            inventory = self._run(['host', '-n', '-', '--group-del', 'guests-y1'])
+        self.assertEqual(inventory.group_get('guests-y1').get_hosts(), [])
+
+    def test_failure_changes_nothing(self):
+        inventory = self._run(['host', '-n', 'y1', 'nonexistant', '--var-set',
+                               'role:db'], code=1)
+        self.assertIsNone(inventory.host_get('y1').get_keyval(
+            'role', reporting=False))
+
+    def test_add_host_range(self):
+        inventory = self._run(['host', '-n', 'web[08:10].y1', '-a',
+                               '--group-add', 'guests-y1', 'front',
+                               '--var-set', 'ansible_ssh_host'])
+        hosts = ['web08.y1', 'web09.y1', 'web10.y1']
+        ips = [str(inventory.host_get(x).get_keyval('ansible_ssh_host'))
+               for x in hosts]
+        self.assertEqual(len(set(ips)), 3)
+        for group in ['guests-y1', 'front']:
+            self.assertTrue(set(hosts) <= set(inventory.group_get(group).get_hosts()))
+        self.assertTrue(set(ips) <=
+                        set(inventory.ippool_get('y1_guests').get_hash()['allocated']))
+
+    def test_import_ansible(self):
+        inventory = self._run(['import-ansible', paths.ANSIBLE_INI_INVENTORY])
+        self.assertEqual(inventory.group_get('web').get_hosts(),
+                         ['web01.dc1', 'web02.dc1', 'weird'])
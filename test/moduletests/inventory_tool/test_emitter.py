@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import glob
+import os
+import random
+import sys
+import unittest
+import yaml
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.emitter as em
+
+
+def pyyaml_dump(data, dumper=em.Dumper):
+    return yaml.dump(data, Dumper=dumper, encoding='utf-8',
+                     default_flow_style=False)
+
+
+class TestEmitter(unittest.TestCase):
+    def test_golden_file(self):
+        with open(paths.EMITTER_GOLDEN_FILE, 'rb') as fh:
+            golden = fh.read()
+        data = yaml.load(golden, Loader=yaml.SafeLoader)
+        self.assertEqual(em.dump(data), golden)
+        self.assertEqual(pyyaml_dump(data), golden)
+        self.assertEqual(pyyaml_dump(data, dumper=yaml.Dumper), golden)
+
+    def test_fabric_inventories(self):
+        for path in glob.glob(os.path.join(os.path.dirname(paths.TEST_INVENTORY),
+                                           '*.yml')):
+            with open(path, 'rb') as fh:
+                data = yaml.load(fh.read(), Loader=yaml.SafeLoader)
+            if isinstance(data, dict):
+                self.assertEqual(em.dump(data), pyyaml_dump(data), path)
+
+    def test_dump_entity(self):
+        data = {"aliases": [], "keyvals": {"ansible_ssh_host": "10.0.0.1"}}
+        self.assertEqual(em.dump_entity("hosts", "y1", data),
+                         "  y1:\n    aliases: []\n    keyvals:\n" +
+                         "      ansible_ssh_host: 10.0.0.1\n")
+
+    def test_empty(self):
+        self.assertEqual(em.dump({}), pyyaml_dump({}))
+        data = {"groups": {}, "hosts": {}, "ippools": {}}
+        self.assertEqual(em.dump(data), pyyaml_dump(data))
+
+    def test_unsortable_keys(self):
+        data = {"hosts": {1: {"aliases": []}, "y1": {"aliases": []}}}
+        self.assertEqual(em.dump(data), pyyaml_dump(data))
+
+    def test_random_scalars(self):
+        rand = random.Random(1)
+        chars = "abcXYZ0129._/:@+=~- #'\"!,[]{}&*?|>%`ą\t\n"
+        words = ['yes', 'no', 'null', '~', '22', '0x1f', '1e3', '.5', '-1',
+                 '2014-01-01', 'On', '.inf', '=', '<<', '::1', '10.0.0.0/8',
+                 '...', '---', '-', '?x', 'a:', 'a: b']
+
+        def scalar():
+            r = rand.random()
+            if r < 0.3:
+                return rand.choice(words)
+            elif r < 0.35:
+                return rand.randint(-5, 100000)
+            elif r < 0.37:
+                return rand.choice([True, None, 1.5])
+            length = rand.randint(0, rand.choice([5, 20, 150]))
+            return ''.join(rand.choice(chars) for x in range(length))
+
+        for x in range(500):
+            data = {"hosts": {}, "groups": {}}
+            for y in range(3):
+                data["hosts"][str(scalar())] = {
+                    "aliases": [scalar() for z in range(rand.randint(0, 2))],
+                    "keyvals": {str(scalar()): scalar()
+                                for z in range(rand.randint(0, 3))}}
+                data["groups"]["g" + str(y)] = {
+                    "children": [str(scalar())],
+                    "ippools": {str(scalar()): str(scalar())}}
+            self.assertEqual(em.dump(data), pyyaml_dump(data))
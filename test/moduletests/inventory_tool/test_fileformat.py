@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import hashlib
+import json
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.fileformat as ff
+import inventory_tool.object.inventory as iv
+import inventory_tool.validators as v
+from inventory_tool.exception import BadDataException, MalformedInputException
+
+
+class TestCodecs(unittest.TestCase):
+    DATA = {"hosts": {"y1": {"aliases": ["a", "zażółć"],
+                             "keyvals": {"a": 1, "b": -300, "c": None,
+                                         "d": True, "e": False, "f": 2.5,
+                                         "g": 2 ** 70, "h": ""}}},
+            "groups": {},
+            "ippools": {},
+            }
+    META = {"version": 1, "checksum": "abc"}
+
+    def test_guess_format(self):
+        self.assertEqual(ff.guess_format("/a/b.json"), "json")
+        self.assertEqual(ff.guess_format("/a/b.BIN"), "binary")
+        self.assertEqual(ff.guess_format("/a/b.yml"), "yaml")
+        self.assertEqual(ff.guess_format("/a/b"), "yaml")
+
+    def test_roundtrip(self):
+        for file_format in ["json", "binary"]:
+            body = ff.encode(file_format, self.DATA)
+            meta, data, body2 = ff.load(file_format,
+                                        ff.dump(file_format, self.META, body))
+            self.assertEqual(meta, self.META)
+            self.assertEqual(data, self.DATA)
+            self.assertEqual(body, body2)
+
+    def test_json_is_canonical(self):
+        doc = ff.dump("json", self.META, ff.encode("json", self.DATA))
+        tmp = dict(self.DATA, _meta=self.META)
+        self.assertEqual(doc, json.dumps(tmp, sort_keys=True, separators=(',', ':'),
+                                         ensure_ascii=False).encode('utf-8'))
+
+    def test_binary_keys_are_sorted(self):
+        self.assertEqual(ff.encode("binary", {"b": 1, "a": 2}),
+                         ff.encode("binary", {"a": 2, "b": 1}))
+
+    def test_unsupported_type(self):
+        with self.assertRaises(TypeError):
+            ff.encode("binary", {"a": object()})
+
+    def test_malformed_documents(self):
+        doc = ff.dump("binary", self.META, ff.encode("binary", self.DATA))
+        for file_format, buf in [("json", b"[]"),
+                                 ("json", b'{"hosts": {}}'),
+                                 ("json", b'{"_meta": {'),
+                                 ("binary", b"INVB\x02"),
+                                 ("binary", doc[:-1]),
+                                 ("binary", doc + b"\x00"),
+                                 ("binary", doc[:len(ff.MAGIC)] + b"\xff"),
+                                 ]:
+            with self.assertRaises(BadDataException):
+                ff.load(file_format, buf)
+
+
+class TestWriteAtomically(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmpdir)
+        self._path = os.path.join(self._tmpdir, "inventory.yml")
+
+    def test_replace(self):
+        with open(self._path, 'wb') as fh:
+            fh.write(b"old contents, longer than the new ones")
+        os.chmod(self._path, 0o640)
+        with open(self._path, 'rb') as reader:
+            ff.write_atomically(self._path, b"new")
+            # Readers that opened the file before keep reading the old one:
+            self.assertEqual(reader.read(6), b"old co")
+        with open(self._path, 'rb') as fh:
+            self.assertEqual(fh.read(), b"new")
+        self.assertEqual(os.stat(self._path).st_mode & 0o7777, 0o640)
+        self.assertEqual(os.listdir(self._tmpdir), ["inventory.yml"])
+
+    def test_new_file(self):
+        ff.write_atomically(self._path, b"new")
+        with open(self._path, 'rb') as fh:
+            self.assertEqual(fh.read(), b"new")
+
+    def test_failed_write(self):
+        with open(self._path, 'wb') as fh:
+            fh.write(b"old")
+        with mock.patch('os.fsync', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                ff.write_atomically(self._path, b"new")
+        with open(self._path, 'rb') as fh:
+            self.assertEqual(fh.read(), b"old")
+        self.assertEqual(os.listdir(self._tmpdir), ["inventory.yml"])
+
+
+class TestInventoryFileFormats(unittest.TestCase):
+    def setUp(self):
+        for patched in ['logging.debug',
+                        'logging.info',
+                        'logging.warning',
+                        ]:
+            patcher = mock.patch(patched)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        v.HostnameParser.set_backend_domain('example.com')
+        v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+        self._tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmpdir)
+        self._expected = iv.InventoryData(paths.TEST_INVENTORY).get_hash()
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def _convert(self, name, file_format=None):
+        path = os.path.join(self._tmpdir, name)
+        obj = iv.InventoryData(path, initialize=True, file_format=file_format)
+        obj.load_hash(self._expected)
+        obj.save()
+        return path
+
+    def test_roundtrip(self):
+        for name in ["inventory.json", "inventory.bin"]:
+            obj = iv.InventoryData(self._convert(name))
+            self.assertFalse(obj.is_recalculated())
+            self.assertEqual(obj.get_hash(), self._expected)
+
+    def test_format_guessed_from_extension(self):
+        with open(self._convert("inventory.json"), 'rb') as fh:
+            self.assertEqual(json.loads(fh.read().decode('utf-8'))["_meta"]["version"], 1)
+        with open(self._convert("inventory.bin"), 'rb') as fh:
+            self.assertTrue(fh.read().startswith(ff.MAGIC))
+
+    def test_explicit_format(self):
+        path = self._convert("inventory", file_format="binary")
+        self.assertEqual(iv.InventoryData(path, file_format="binary").get_hash(),
+                         self._expected)
+        with self.assertRaises(MalformedInputException):
+            iv.InventoryData(path, file_format="xml")
+
+    def test_checksum(self):
+        path = self._convert("inventory.json")
+        with open(path, 'rb') as fh:
+            data = json.loads(fh.read().decode('utf-8'))
+        meta = data.pop("_meta")
+        self.assertEqual(meta["checksum"],
+                         hashlib.sha256(ff.encode("json", data)).hexdigest())
+
+    def test_manual_edit_triggers_recalculation(self):
+        path = self._convert("inventory.json")
+        with open(path, 'rb') as fh:
+            data = json.loads(fh.read().decode('utf-8'))
+        data["hosts"]["y1"]["keyvals"]["tunnel_ip"] = "192.168.255.126"
+        with open(path, 'w') as fh:
+            json.dump(data, fh, indent=4)
+        obj = iv.InventoryData(path)
+        self.assertTrue(obj.is_recalculated())
+        self.assertEqual(obj.ippool_get("tunels").get_hash()["allocated"],
+                         ["192.168.255.126"])
+
+    def test_unsupported_version(self):
+        path = os.path.join(self._tmpdir, "inventory.json")
+        with open(path, 'wb') as fh:
+            fh.write(b'{"_meta": {"version": 0, "checksum": ""}}')
+        with self.assertRaises(BadDataException):
+            iv.InventoryData(path)
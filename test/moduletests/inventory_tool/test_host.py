@@ -93,6 +93,45 @@ class TestHostGetHash(TestHostMethodsBase):
         self.assertEqual(correct_hash, self.host_obj.get_hash())
 
 
+    def test_get_hash_after_keyval_change(self):
+        self.host_obj.get_hash()
+        self.host_obj.set_keyval({"key": "ansible_ssh_host",
+                                  "val": ip_address("1.2.3.5")})
+        self.assertEqual("1.2.3.5",
+                         self.host_obj.get_hash()["keyvals"]["ansible_ssh_host"])
+        self.host_obj.del_keyval("ansible_ssh_host")
+        self.assertNotIn("ansible_ssh_host", self.host_obj.get_hash()["keyvals"])
+
+
+class TestHostAnsibleHostvars(TestHostMethodsBase):
+    def test_get_ansible_hostvars(self):
+        correct_hash = self._keyvals_plain.copy()
+        correct_hash['aliases'] = self._aliases
+        ret = self.host_obj.get_ansible_hostvars(frozenset(["ansible_ssh_host"]))
+        self.assertEqual(correct_hash, ret)
+
+    def test_get_ansible_hostvars_no_conversion(self):
+        correct_hash = self._keyvals_obj
+        correct_hash['aliases'] = self._aliases
+        self.assertEqual(correct_hash,
+                         self.host_obj.get_ansible_hostvars(frozenset()))
+
+    def test_get_ansible_hostvars_returns_copy(self):
+        ret = self.host_obj.get_ansible_hostvars(frozenset())
+        ret['aliases'].append("foo.example.com")
+        ret['some_var'] = "other_val"
+        self.assertEqual(self._aliases, self.host_obj.get_aliases())
+        self.assertEqual("some_val", self.host_obj.get_keyval("some_var"))
+
+    def test_get_ansible_hostvars_after_keyval_change(self):
+        str_keywords = frozenset(["ansible_ssh_host"])
+        self.host_obj.get_ansible_hostvars(str_keywords)
+        self.host_obj.set_keyval({"key": "ansible_ssh_host",
+                                  "val": ip_address("1.2.3.5")})
+        ret = self.host_obj.get_ansible_hostvars(str_keywords)
+        self.assertEqual("1.2.3.5", ret["ansible_ssh_host"])
+
+
 class TestHostKeyVal(TestHostMethodsBase):
     def test_get_existing_keyval(self):
         self.assertEqual("some_val", self.host_obj.get_keyval("some_var"))
@@ -30,13 +30,16 @@ import file_paths as paths
 import inventory_tool.object.ippool as i
 import inventory_tool.object.inventory as iv
 from inventory_tool.exception import MalformedInputException, BadDataException
+from inventory_tool.exception import GenericException
 
 # For Python3 < 3.3, ipaddress module is available as an extra module,
 # under a different name:
 try:
     from ipaddress import ip_address
+    from ipaddress import ip_network
 except ImportError:
     from ipaddr import IPAddress as ip_address
+    from ipaddr import IPNetwork as ip_network
 
 
 class TestInventoryBase(unittest.TestCase):
@@ -198,14 +201,13 @@ class TestInventorySave(TestInventoryBase):
         with mock.patch('inventory_tool.object.inventory.open', OpenMock, create=True):
             obj = iv.InventoryData(paths.TMP_INVENTORY)
 
-        SaveMock = mock.mock_open()
-        with mock.patch('inventory_tool.object.inventory.open', SaveMock, create=True):
+        with mock.patch('inventory_tool.fileformat.write_atomically') as SaveMock:
             obj.save()
-        SaveMock.assert_called_once_with(paths.TMP_INVENTORY, 'wb')
+        SaveMock.assert_called_once_with(paths.TMP_INVENTORY, mock.ANY)
         # Comparing multi-line text is tricky:
-        handle = SaveMock()
         self.maxDiff = None
-        self.assertMultiLineEqual(self._file_data, handle.write.call_args[0][0])
+        self.assertMultiLineEqual(self._file_data,
+                                  SaveMock.call_args[0][1].decode('utf-8'))
 
 
 class TestInventoryAnsibleFuncionality(TestInventoryBase):
@@ -213,6 +215,9 @@ class TestInventoryAnsibleFuncionality(TestInventoryBase):
         obj = iv.InventoryData(paths.MISSING_ANSIBLE_SSH_HOST_INVENTORY)
         with self.assertRaises(BadDataException):
             obj.get_ansible_inventory()
+        with self.assertRaises(BadDataException):
+            obj.check_ansible_hosts()
+        iv.InventoryData(paths.TEST_INVENTORY).check_ansible_hosts()
 
     def test_ansible_get_inventory(self):
         self.maxDiff = None
@@ -564,6 +569,153 @@ class TestInventoryHostKeyvalFunctionality(TestInventoryHostFunctionality):
         self.assertListEqual(ippool_hash['allocated'], ["192.168.255.1"])
 
 
+class TestInventoryHostAddMany(TestInventoryBase):
+    def setUp(self):
+        super().setUp()
+        self.obj = iv.InventoryData(paths.IPADDR_AUTOALLOCATION_INVENTORY)
+
+    def test_add_with_groups_and_autoallocation(self):
+        self.obj.host_add_many(["web1", "web2", "web3"], groups=["front"],
+                               data=[{"key": "tunnel_ip", "val": None},
+                                     {"key": "role", "val": "web"}])
+        self.assertEqual(sorted(self.obj.group_get("front").get_hosts()),
+                         ["web1", "web2", "web3", "y1-front.foobar"])
+        for i, host in enumerate(["web1", "web2", "web3"]):
+            correct_hash = {'aliases': [],
+                            'keyvals': {'tunnel_ip': '192.168.255.{0}'.format(i + 1),
+                                        'role': 'web'}
+                            }
+            self.assertEqual(self.obj.host_get(host).get_hash(), correct_hash)
+        self.assertEqual(self.obj.ippool_get("tunels").get_hash()["allocated"],
+                         ["192.168.255.1", "192.168.255.2", "192.168.255.3"])
+
+    def test_add_existing_host(self):
+        before = self.obj.get_hash()
+        with self.assertRaises(MalformedInputException):
+            self.obj.host_add_many(["web1", "y1-front.foobar"])
+        self.assertEqual(self.obj.get_hash(), before)
+
+    def test_add_to_missing_group(self):
+        with self.assertRaises(MalformedInputException):
+            self.obj.host_add_many(["web1"], groups=["nonexistant"])
+
+    def test_add_without_pool(self):
+        before = self.obj.get_hash()
+        with self.assertRaises(MalformedInputException):
+            self.obj.host_add_many(["web1"], data=[{"key": "tunnel_ip",
+                                                    "val": None}])
+        self.assertEqual(self.obj.get_hash(), before)
+
+    def test_add_explicit_address_to_many_hosts(self):
+        before = self.obj.get_hash()
+        with self.assertRaisesRegex(MalformedInputException, "auto-assign"):
+            self.obj.host_add_many(["web1", "web2"],
+                                   data=[{"key": "tunnel_ip",
+                                          "val": "192.168.255.7"}])
+        self.assertEqual(self.obj.get_hash(), before)
+        # A single host may get it:
+        self.obj.host_add_many(["web1"], data=[{"key": "tunnel_ip",
+                                                "val": "192.168.255.7"}])
+        self.assertIn("192.168.255.7",
+                      self.obj.ippool_get("tunels").get_hash()["allocated"])
+
+    def test_pool_exhausted(self):
+        before = self.obj.get_hash()
+        with self.assertRaises(GenericException):
+            self.obj.host_add_many(["web{0}".format(x) for x in range(255)],
+                                   groups=["front"],
+                                   data=[{"key": "tunnel_ip", "val": None}])
+        self.assertEqual(self.obj.get_hash(), before)
+
+
+class TestInventoryHostFind(TestInventoryBaseWithInit):
+    def test_find_by_value(self):
+        self.assertEqual(self.obj.host_find("ansible_ssh_host", "1.2.3.4"),
+                         ["y1"])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host", "1.2.3.5"), [])
+        self.assertEqual(self.obj.host_find("nonexistant", "foo"), [])
+
+    def test_find_in_network(self):
+        self.assertEqual(self.obj.host_find("ansible_ssh_host",
+                                            network=ip_network("192.168.125.0/24")),
+                         ["foobarator.y1", "y1-front.foobar"])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host",
+                                            network=ip_network("192.168.125.3/32")),
+                         ["foobarator.y1"])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host",
+                                            network=ip_network("fe80::/64")), [])
+
+    def test_index_is_maintained(self):
+        # Build the index first:
+        self.obj.host_find("ansible_ssh_host", "1.2.3.4")
+        self.obj.host_set_vars("y1", [{"key": "ansible_ssh_host",
+                                       "val": ip_address("192.168.125.9")},
+                                      {"key": "ansible_ssh_port", "val": 2222}])
+        self.obj.host_add("new")
+        self.obj.host_set_vars("new", [{"key": "ansible_ssh_port", "val": 2222}])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host", "1.2.3.4"), [])
+        self.assertEqual(self.obj.host_find("ansible_ssh_port", "2222"),
+                         ["new", "y1"])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host",
+                                            network=ip_network("192.168.125.0/24")),
+                         ["foobarator.y1", "y1", "y1-front.foobar"])
+        self.obj.host_del_vars("new", ["ansible_ssh_port"])
+        self.obj.host_rename("y1", "y2")
+        self.obj.host_del("foobarator.y1")
+        self.assertEqual(self.obj.host_find("ansible_ssh_port", "2222"), ["y2"])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host",
+                                            network=ip_network("192.168.125.0/24")),
+                         ["y1-front.foobar", "y2"])
+
+    def test_index_matches_rebuilt_one(self):
+        self.obj.host_find("tunnel_ip", "192.168.255.125")
+        self.obj.host_add_many(["web1", "web2"], groups=["hypervisor"],
+                               data=[{"key": "tunnel_ip", "val": None}])
+        self.obj.host_import({"imported": {"aliases": [],
+                                           "keyvals": {"tunnel_ip": "10.0.0.1"}}})
+        found = self.obj.host_find("tunnel_ip", network=ip_network("0.0.0.0/0"))
+        self.obj.recalculate_inventory()
+        self.assertEqual(self.obj.host_find("tunnel_ip",
+                                            network=ip_network("0.0.0.0/0")),
+                         found)
+        self.assertEqual(found, ["imported", "web1", "web2", "y1"])
+
+    def test_addresses_set_as_strings(self):
+        self.obj.host_find("ansible_ssh_host", "1.2.3.4")
+        # That is how the values come from the command line:
+        self.obj.host_set_vars("y1", [{"key": "ansible_ssh_host",
+                                       "val": "10.9.1.1"}])
+        self.obj.host_add_many(["web1"], data=[{"key": "tunnel_ip",
+                                                "val": "10.9.2.1"}])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host",
+                                            network=ip_network("10.9.0.0/16")),
+                         ["y1"])
+        self.assertIn("y1", self.obj.host_find(
+            "ansible_ssh_host", network=ip_network("0.0.0.0/0")))
+        self.assertEqual(self.obj.host_find("tunnel_ip",
+                                            network=ip_network("10.9.0.0/16")),
+                         ["web1"])
+        self.obj.host_set_vars("y1", [{"key": "ansible_ssh_host",
+                                       "val": "10.8.1.1"}])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host",
+                                            network=ip_network("10.9.0.0/16")),
+                         [])
+        self.assertEqual(self.obj.host_find("ansible_ssh_host", "10.8.1.1"),
+                         ["y1"])
+
+
+class TestInventoryStats(TestInventoryBaseWithInit):
+    def test_get_stats(self):
+        stats = self.obj.get_stats(top=2)
+        self.assertEqual((stats["hosts"], stats["aliases"], stats["groups"],
+                          stats["ippools"]), (3, 1, 3, 2))
+        self.assertEqual(stats["largest_groups"], [("guests-y1", 2),
+                                                   ("front", 1)])
+        self.assertEqual(stats["pools"]["y1_guests"],
+                         self.obj.ippool_get("y1_guests").get_stats())
+        self.assertEqual(stats["pools"]["y1_guests"]["free"], 251)
+
+
 class TestInventoryIPPoolFunctionality(TestInventoryBaseWithInit):
     def test_ippool_add_duplicated(self):
         with self.assertRaises(MalformedInputException):
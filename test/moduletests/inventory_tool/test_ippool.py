@@ -65,20 +65,53 @@ class TestIPPoolToString(TestIPPoolBase):
     def test_to_string_with_data(self, *unused):
         correct_str = \
 """Network: 172.21.243.0/28
+Size: 14, allocated: 3, reserved: 2, free: 9
 Allocated:
-\t- 172.21.243.1
-\t- 172.21.243.2
+\t- 172.21.243.1-172.21.243.2
 \t- 172.21.243.6
 Reserved:
-\t- 172.21.243.4
-\t- 172.21.243.5
+\t- 172.21.243.4-172.21.243.5
 """
         self.assertEqual(correct_str, str(self.ippool_obj))
 
+    def test_to_string_free(self, *unused):
+        correct_str = \
+"""Network: 172.21.243.0/28
+Size: 14, allocated: 3, reserved: 2, free: 9
+Free:
+\t- 172.21.243.3
+\t- 172.21.243.7-172.21.243.14
+"""
+        self.assertEqual(correct_str, self.ippool_obj.describe(free=True))
+
+    def test_to_string_paginated(self, *unused):
+        correct_str = \
+"""Network: 172.21.243.0/28
+Size: 14, allocated: 3, reserved: 2, free: 9
+Allocated:
+\t- 172.21.243.6
+\t(ranges 2-2 of 2)
+Reserved:
+\t(no ranges after offset 1, 1 in total)
+"""
+        self.assertEqual(correct_str,
+                         self.ippool_obj.describe(limit=1, offset=1))
+
+    def test_to_string_huge_network(self, *unused):
+        obj = IPPool(network="fd00::/64", allocated=["fd00::1"])
+        correct_str = \
+"""Network: fd00::/64
+Size: 18446744073709551614, allocated: 1, reserved: 0, free: 18446744073709551613
+Free:
+\t- fd00::2-fd00::ffff:ffff:ffff:fffe
+"""
+        self.assertEqual(correct_str, obj.describe(free=True))
+
     def test_to_string_without_data(self, *unused):
         obj = IPPool(network=self._network_str)
         correct_str = \
 """Network: 172.21.243.0/28
+Size: 14, allocated: 0, reserved: 0, free: 14
 Allocated:
 \t<None>
 Reserved:
@@ -87,6 +120,23 @@ Reserved:
         self.assertEqual(correct_str, str(obj))
 
 
+class TestIPPoolRanges(TestIPPoolBase):
+    def test_get_ranges(self, *unused):
+        ip = ip_address
+        self.assertEqual(self.ippool_obj.get_ranges("allocated"),
+                         [(ip("172.21.243.1"), ip("172.21.243.2")),
+                          (ip("172.21.243.6"), ip("172.21.243.6"))])
+        self.assertEqual(self.ippool_obj.get_ranges("reserved"),
+                         [(ip("172.21.243.4"), ip("172.21.243.5"))])
+        self.assertEqual(self.ippool_obj.get_ranges("free"),
+                         [(ip("172.21.243.3"), ip("172.21.243.3")),
+                          (ip("172.21.243.7"), ip("172.21.243.14"))])
+
+    def test_get_ranges_unknown_kind(self, *unused):
+        with self.assertRaises(ValueError):
+            self.ippool_obj.get_ranges("foo")
+
+
 class TestIPPoolGetHash(TestIPPoolBase):
     def test_get_hash(self, *unused):
         correct_hash = {"network": self._network_str,
@@ -96,6 +146,35 @@ class TestIPPoolGetHash(TestIPPoolBase):
         self.assertEqual(correct_hash, self.ippool_obj.get_hash())
 
 
+class TestIPPoolStats(TestIPPoolBase):
+    def test_get_stats(self, *unused):
+        # .3 and .7-.14 are free:
+        correct_stats = {"network": self._network_str,
+                         "size": 14,
+                         "allocated": 3,
+                         "reserved": 2,
+                         "free": 9,
+                         "free_ranges": 2,
+                         "largest_free_range": 8,
+                         "fragmentation": 1 - 8 / 9,
+                         }
+        self.assertEqual(self.ippool_obj.get_stats(), correct_stats)
+
+    def test_get_stats_full_pool(self, *unused):
+        obj = IPPool("172.21.243.0/30", allocated=["172.21.243.1"],
+                     reserved=["172.21.243.2"])
+        stats = obj.get_stats()
+        self.assertEqual((stats["size"], stats["free"], stats["free_ranges"],
+                          stats["fragmentation"]), (2, 0, 0, 0.0))
+
+    def test_get_stats_huge_network(self, *unused):
+        obj = IPPool("fd00::/64", allocated=["fd00::1", "fd00::3"])
+        stats = obj.get_stats()
+        self.assertEqual(stats["size"], 2 ** 64 - 2)
+        self.assertEqual(stats["free"], 2 ** 64 - 4)
+        self.assertEqual(stats["largest_free_range"], 2 ** 64 - 5)
+
+
 class TestIPPoolContains(TestIPPoolBase):
     def test_contains_str(self, *unused):
         self.assertTrue(self._allocated_str[0] in self.ippool_obj)
@@ -214,3 +293,34 @@ class TestIPPoolAllocation(TestIPPoolBase):
             self.ippool_obj.allocate()
         with self.assertRaises(GenericException):
             self.ippool_obj.allocate()
+
+    def test_allocate_many_matches_allocate(self, *unused):
+        other = IPPool(self._network_str, allocated=self._allocated_str,
+                       reserved=self._reserved_str)
+        count = 16 - (len(self._allocated_str) + len(self._reserved_str) + 2)
+        expected = [other.allocate() for _ in range(count)]
+        self.assertEqual(self.ippool_obj.allocate_many(count), expected)
+        self.assertEqual(self.ippool_obj.get_hash(), other.get_hash())
+
+    def test_allocate_many_exhaust_ippool(self, *unused):
+        count = 16 - (len(self._allocated_str) + len(self._reserved_str) + 2)
+        before = self.ippool_obj.get_hash()
+        with self.assertRaises(GenericException):
+            self.ippool_obj.allocate_many(count + 1)
+        self.assertEqual(self.ippool_obj.get_hash(), before)
+
+    def test_allocate_ips(self, *unused):
+        ips = ["172.21.243.3", "172.21.243.7"]
+        self.ippool_obj.allocate_ips([ip_address(x) for x in ips])
+        self.assertEqual(self.ippool_obj.get_hash()["allocated"],
+                         sorted(self._allocated_str + ips))
+
+    def test_allocate_ips_conflicts(self, *unused):
+        before = self.ippool_obj.get_hash()
+        for ips in [["172.21.243.3", "172.21.243.3"],
+                    ["172.21.243.3", self._allocated_str[0]],
+                    ["172.21.243.3", self._reserved_str[0]],
+                    ["172.21.243.3", "1.2.3.32"]]:
+            with self.assertRaises(MalformedInputException):
+                self.ippool_obj.allocate_ips([ip_address(x) for x in ips])
+            self.assertEqual(self.ippool_obj.get_hash(), before)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.object.inventory as iv
+import inventory_tool.validators as v
+from inventory_tool.exception import BadDataException, MalformedInputException
+from inventory_tool.journal import Journal
+from inventory_tool.object.ippool import IPPool
+
+# For Python3 < 3.3, ipaddress module is available as an extra module,
+# under a different name:
+try:
+    from ipaddress import ip_address
+except ImportError:
+    from ipaddr import IPAddress as ip_address
+
+
+class TestJournalBase(unittest.TestCase):
+    def setUp(self):
+        for patched in ['logging.debug',
+                        'logging.info',
+                        'logging.warning',
+                        ]:
+            patcher = mock.patch(patched)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        v.HostnameParser.set_backend_domain('example.com')
+        v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+        self._tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmpdir)
+        self._inventory_path = os.path.join(self._tmpdir, 'inventory.yml')
+        self._journal_path = self._inventory_path + '.journal'
+        shutil.copy(paths.TEST_INVENTORY, self._inventory_path)
+        with open(self._inventory_path, 'rb') as fh:
+            self._file_data = fh.read()
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+
+class TestJournalRecords(TestJournalBase):
+    def test_encode_decode_ippool_add(self):
+        pool = IPPool("10.0.0.0/24", allocated=["10.0.0.5"])
+        op, args = Journal.decode(Journal.encode('ippool_add', pool="foo",
+                                                 pool_obj=pool))
+        self.assertEqual(op, 'ippool_add')
+        self.assertEqual(args["pool"], "foo")
+        self.assertEqual(args["pool_obj"].get_hash(), pool.get_hash())
+
+    def test_encode_decode_ipaddr(self):
+        op, args = Journal.decode(Journal.encode('ippool_book_ipaddr',
+                                                 pool="foo",
+                                                 ipaddr=ip_address("10.0.0.1")))
+        self.assertEqual(args["ipaddr"], ip_address("10.0.0.1"))
+
+    def test_encode_decode_keyvals(self):
+        data = [{"key": "tunnel_ip", "val": ip_address("10.0.0.1")},
+                {"key": "ansible_ssh_port", "val": 22},
+                {"key": "some_key", "val": "some_val"}]
+        op, args = Journal.decode(Journal.encode('host_set_vars', host="y1",
+                                                 data=data))
+        self.assertEqual(args["data"], data)
+
+    def test_decode_unknown_operation(self):
+        with self.assertRaises(BadDataException):
+            Journal.decode('{"op":"save","args":{}}')
+
+    def test_decode_malformed_record(self):
+        with self.assertRaises(BadDataException):
+            Journal.decode('{"op":"host_add"')
+
+    def test_read_ignores_incomplete_record(self):
+        journal = Journal(self._inventory_path)
+        journal.append([Journal.encode('host_add', host='y2')])
+        with open(self._journal_path, 'a') as fh:
+            fh.write('{"op":"host_a')
+        self.assertEqual(journal.read(),
+                         [(1, '{"args":{"host":"y2"},"op":"host_add"}')])
+
+    def test_clear(self):
+        journal = Journal(self._inventory_path)
+        journal.append([Journal.encode('host_add', host='y2')])
+        self.assertTrue(journal.exists())
+        journal.clear()
+        self.assertFalse(journal.exists())
+        journal.clear()
+
+
+class TestInventoryJournal(TestJournalBase):
+    def _read_inventory(self):
+        with open(self._inventory_path, 'rb') as fh:
+            return fh.read()
+
+    def test_save_appends_to_journal(self):
+        obj = iv.InventoryData(self._inventory_path, journal=True)
+        obj.host_add("y2")
+        obj.group_host_add(group="front", host="y2")
+        obj.save()
+
+        self.assertEqual(self._file_data, self._read_inventory())
+        self.assertEqual(len(Journal(self._inventory_path).read()), 2)
+
+        obj = iv.InventoryData(self._inventory_path)
+        self.assertIn("y2", obj.host_get())
+        self.assertTrue(obj.group_get("front").has_host("y2"))
+        self.assertFalse(obj.is_recalculated())
+
+    def test_replay_of_autoallocated_ip(self):
+        obj = iv.InventoryData(self._inventory_path, journal=True)
+        obj.host_add("y2")
+        obj.group_host_add(group="guests-y1", host="y2")
+        obj.host_set_vars("y2", [{"key": "ansible_ssh_host", "val": None}])
+        ip = obj.host_get("y2").get_keyval("ansible_ssh_host")
+        pool_hash = obj.ippool_get("y1_guests").get_hash()
+        obj.save()
+
+        obj = iv.InventoryData(self._inventory_path, journal=True)
+        self.assertEqual(ip, obj.host_get("y2").get_keyval("ansible_ssh_host"))
+        self.assertEqual(pool_hash, obj.ippool_get("y1_guests").get_hash())
+
+    def test_compact(self):
+        obj = iv.InventoryData(self._inventory_path, journal=True)
+        obj.host_add("y2")
+        obj.save()
+        obj = iv.InventoryData(self._inventory_path, journal=True)
+        obj.save(compact=True)
+
+        self.assertFalse(os.path.exists(self._journal_path))
+        obj = iv.InventoryData(self._inventory_path)
+        self.assertIn("y2", obj.host_get())
+        self.assertFalse(obj.is_recalculated())
+
+    def test_save_without_journal_compacts(self):
+        obj = iv.InventoryData(self._inventory_path, journal=True)
+        obj.host_add("y2")
+        obj.save()
+        obj = iv.InventoryData(self._inventory_path)
+        obj.host_add("y3")
+        obj.save()
+
+        self.assertFalse(os.path.exists(self._journal_path))
+        obj = iv.InventoryData(self._inventory_path)
+        self.assertIn("y2", obj.host_get())
+        self.assertIn("y3", obj.host_get())
+
+    def test_malformed_record_arguments(self):
+        journal = Journal(self._inventory_path)
+        journal.append([Journal.encode('host_add', host='y2'),
+                        '{"args":{"name":"y3"},"op":"host_add"}'])
+        with self.assertRaisesRegex(MalformedInputException,
+                                    "line 2 of journal " + self._journal_path):
+            iv.InventoryData(self._inventory_path)
+        journal.clear()
+        journal.append(['{"args":["y3"],"op":"host_add"}'])
+        with self.assertRaises(MalformedInputException):
+            iv.InventoryData(self._inventory_path)
+
+    def test_failed_record_forces_compaction(self):
+        journal = Journal(self._inventory_path)
+        journal.append([Journal.encode('host_del', host='not-a-host'),
+                        Journal.encode('host_add', host='y2')])
+        obj = iv.InventoryData(self._inventory_path, journal=True)
+        self.assertIn("y2", obj.host_get())
+        obj.save()
+
+        self.assertFalse(os.path.exists(self._journal_path))
+        self.assertNotEqual(self._file_data, self._read_inventory())
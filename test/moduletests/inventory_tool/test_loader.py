@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import datetime
+import io
+import mock
+import os
+import sys
+import unittest
+import yaml
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.emitter as em
+import inventory_tool.loader as ld
+import inventory_tool.object.inventory as iv
+import inventory_tool.validators as v
+from inventory_tool.exception import BadDataException
+
+
+class TestIterInventory(unittest.TestCase):
+    def _load(self, data):
+        """Rebuild the whole document out of yielded entities"""
+        ret = {}
+        for section, name, raw in ld.iter_inventory(data):
+            if name is None:
+                ret[section] = raw
+            else:
+                ret.setdefault(section, {})[name] = raw
+        return ret
+
+    def test_same_data_as_yaml_load(self):
+        for path in [paths.TEST_INVENTORY, paths.HOSTVARS_INVENTORY,
+                     paths.CHILD_GROUPS_INVENTORY,
+                     paths.EMPTY_CHECKSUM_OK_INVENTORY]:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            with open(path, 'rb') as fh:
+                self.assertEqual(self._load(fh), yaml.load(data, Loader=ld.Loader))
+
+    def test_entities_are_yielded_separately(self):
+        with open(paths.TEST_INVENTORY, 'rb') as fh:
+            res = [(x, y) for x, y, z in ld.iter_inventory(fh)]
+        self.assertEqual(res[0], ("_meta", None))
+        self.assertIn(("hosts", "y1"), res)
+        self.assertIn(("ippools", "tunels"), res)
+
+    def test_scalar_types(self):
+        data = "hosts:\n  y1:\n    keyvals: {a: 1, b: '1', c: yes, d: null}\n"
+        self.assertEqual(self._load(data)["hosts"]["y1"]["keyvals"],
+                         {"a": 1, "b": "1", "c": True, "d": None})
+
+    def test_anchors_and_aliases(self):
+        data = "hosts:\n  y1: &x {aliases: []}\n  y2: *x\n"
+        self.assertEqual(self._load(data)["hosts"],
+                         {"y1": {"aliases": []}, "y2": {"aliases": []}})
+
+    def test_empty_document(self):
+        with self.assertRaises(BadDataException):
+            self._load("")
+
+    def test_not_a_mapping(self):
+        with self.assertRaises(BadDataException):
+            self._load("- foo\n- bar\n")
+
+    def test_more_than_one_document(self):
+        with self.assertRaises(BadDataException):
+            self._load("a: 1\n---\nb: 2\n")
+
+    def test_malformed_document(self):
+        with self.assertRaises(yaml.YAMLError):
+            self._load("hosts:\n  y1: [\n")
+
+
+class TestSubsetParser(unittest.TestCase):
+    def test_saved_documents_do_not_need_pyyaml(self):
+        for path in [paths.TEST_INVENTORY, paths.CHILD_GROUPS_INVENTORY,
+                     paths.IPADDR_AUTOALLOCATION_INVENTORY]:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            with mock.patch.object(ld, '_iter_events') as EventsMock, \
+                    mock.patch('yaml.load') as LoadMock:
+                res = list(ld.iter_inventory(data))
+                loaded = ld.load(data)
+                self.assertFalse(EventsMock.called)
+                self.assertFalse(LoadMock.called)
+            self.assertEqual(res, list(ld._iter_events(data)))
+            self.assertEqual(loaded, yaml.load(data, Loader=ld.Loader))
+
+    def test_hand_written_documents(self):
+        # Comments, document markers, scalars which need to be escaped...
+        for path in [paths.HOSTVARS_INVENTORY, paths.EMITTER_GOLDEN_FILE]:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            with mock.patch('logging.debug'):
+                self.assertEqual(list(ld.iter_inventory(data)),
+                                 list(ld._iter_events(data)))
+                self.assertEqual(ld.load(data), yaml.load(data, Loader=ld.Loader))
+
+    def test_fallback_after_some_entities(self):
+        data = ("hosts:\n  a:\n    aliases: []\n  b:\n    aliases:\n"
+                "    - x  # comment\n  c: {aliases: [y]}\n")
+        with mock.patch('logging.debug'):
+            res = list(ld.iter_inventory(data))
+        self.assertEqual(res, [("hosts", "a", {"aliases": []}),
+                               ("hosts", "b", {"aliases": ["x"]}),
+                               ("hosts", "c", {"aliases": ["y"]})])
+
+    def test_fallback_from_file(self):
+        with open(paths.TEST_INVENTORY, 'rb') as fh:
+            expected = yaml.load(fh.read(), Loader=ld.Loader)
+            fh.seek(0)
+            data = fh.read() + b"# trailing comment\n"
+        with mock.patch('logging.debug'):
+            self.assertEqual(ld.load(io.BytesIO(data)), expected)
+
+    def test_scalars_outside_of_the_subset(self):
+        for text, expected in [("a: yes", True), ("a: ~", None), ("a: 1.5", 1.5),
+                               ("a: 0x10", 16), ("a: 'it''s'", "it's"),
+                               ('a: "b"', "b"), ("a: b c", "b c"),
+                               ("a: 2001-01-01", datetime.date(2001, 1, 1))]:
+            with mock.patch('logging.debug'):
+                self.assertEqual(ld.load(text + "\n"), {"a": expected}, text)
+        self.assertEqual(ld.load("a: '1'\nb: 12\nc: 'yes'\n"),
+                         {"a": "1", "b": 12, "c": "yes"})
+
+    def test_structure_outside_of_the_subset(self):
+        for text in ["a:\n    b: 1\n", "a:\n  - b\n", "a:\n- b: 1\n",
+                     "a: 1\n\nb: 2\n", "a: 1 # c\n", "--- \na: 1\n",
+                     "? a\n: 1\n", "a: 1\r\nb: 2\r\n"]:
+            self.assertEqual(ld.load(text), yaml.load(text, Loader=ld.Loader),
+                             text)
+
+
+class TestStreamingLoad(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('logging.warning')
+        self.WarningMock = patcher.start()
+        self.addCleanup(patcher.stop)
+        v.HostnameParser.set_backend_domain('example.com')
+        v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def test_checksum_matches_whole_document_dump(self):
+        for path in [paths.TEST_INVENTORY, paths.EMPTY_CHECKSUM_OK_INVENTORY,
+                     paths.IPADDR_AUTOALLOCATION_INVENTORY]:
+            obj = iv.InventoryData(path)
+            self.assertFalse(obj.is_recalculated(), path)
+
+    def test_reordered_document_is_not_recalculated(self):
+        with open(paths.TEST_INVENTORY, 'r') as fh:
+            data = yaml.load(fh.read(), Loader=ld.Loader)
+        # Unsorted order of the hosts:
+        data["hosts"] = dict(reversed(list(data["hosts"].items())))
+        tmp = yaml.dump(data, Dumper=em.Dumper, default_flow_style=False,
+                        sort_keys=False)
+        obj = iv.InventoryData.__new__(iv.InventoryData)
+        self.assertTrue(obj._load(tmp))
+
+    def test_unsorted_inventory_is_not_recalculated(self):
+        for path in [paths.CHILD_GROUPS_INVENTORY,
+                     paths.ORPHANED_CHILD_GORUPS_INVENTORY]:
+            obj = iv.InventoryData(path)
+            self.assertFalse(obj.is_recalculated(), path)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.object.inventory as iv
+import inventory_tool.validators as v
+from inventory_tool.exception import GenericException
+from inventory_tool.lock import InventoryLock, get_file_signature
+
+
+def _allocator(inventory_path, worker, count):
+    """Stress test worker, mimics "host --add --var-set tunnel_ip --group-add"
+
+    Each allocation is a separate load-modify-save cycle, just like separate
+    invocations of the inventory tool would do.
+    """
+    v.HostnameParser.set_backend_domain('example.com')
+    v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+    for i in range(count):
+        host = "worker{0}-host{1}".format(worker, i)
+        with InventoryLock(inventory_path):
+            inventory = iv.InventoryData(inventory_path)
+            inventory.host_add(host)
+            inventory.group_host_add(group='front', host=host)
+            inventory.host_set_vars(host, [{"key": "tunnel_ip", "val": None}])
+            inventory.save()
+
+
+def run_allocators(inventory_path, workers, count):
+    """Run "workers" parallel allocators, "count" allocations each"""
+    procs = [multiprocessing.Process(target=_allocator,
+                                     args=(inventory_path, x, count))
+             for x in range(workers)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+        if proc.exitcode != 0:
+            raise AssertionError("Allocator process has failed")
+
+
+class TestInventoryLockBase(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmpdir)
+        self._inventory_path = os.path.join(self._tmpdir, 'inventory.yml')
+        shutil.copy(paths.IPADDR_AUTOALLOCATION_INVENTORY,
+                    self._inventory_path)
+
+
+class TestInventoryLock(TestInventoryLockBase):
+    def test_acquire_release(self):
+        lock = InventoryLock(self._inventory_path)
+        lock.acquire()
+        self.assertTrue(lock.is_locked())
+        self.assertTrue(os.path.exists(self._inventory_path + '.lock'))
+        lock.release()
+        self.assertFalse(lock.is_locked())
+
+    def test_context_manager(self):
+        with InventoryLock(self._inventory_path) as lock:
+            self.assertTrue(lock.is_locked())
+        self.assertFalse(lock.is_locked())
+
+    def test_lock_is_exclusive(self):
+        with InventoryLock(self._inventory_path):
+            other = InventoryLock(self._inventory_path, timeout=0.05)
+            with self.assertRaises(GenericException):
+                other.acquire()
+        other.acquire()
+        other.release()
+
+    def test_file_signature(self):
+        signature = get_file_signature(self._inventory_path)
+        self.assertIsNotNone(signature)
+        with open(self._inventory_path, 'a') as fh:
+            fh.write('\n')
+        self.assertNotEqual(signature, get_file_signature(self._inventory_path))
+
+    def test_file_signature_missing_file(self):
+        self.assertIsNone(get_file_signature(self._inventory_path + '.missing'))
+
+
+class TestConcurrentAllocation(TestInventoryLockBase):
+    _workers = 8
+    _allocations = 10
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def test_parallel_allocators_get_unique_ips(self):
+        run_allocators(self._inventory_path, self._workers, self._allocations)
+
+        v.HostnameParser.set_backend_domain('example.com')
+        v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+        inventory = iv.InventoryData(self._inventory_path)
+        total = self._workers * self._allocations
+        hosts = [x for x in inventory.host_get() if x.startswith('worker')]
+        ips = [str(inventory.host_get(x).get_keyval('tunnel_ip')) for x in hosts]
+        allocated = inventory.ippool_get('tunels').get_hash()['allocated']
+
+        self.assertEqual(len(hosts), total)
+        self.assertEqual(len(set(ips)), total)
+        self.assertCountEqual(ips, allocated)
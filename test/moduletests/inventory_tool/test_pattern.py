@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import mock
+import os
+import sys
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.object.inventory as iv
+import inventory_tool.pattern as pt
+import inventory_tool.validators as v
+from inventory_tool.exception import MalformedInputException
+
+
+def _group(hosts=[], children=[]):
+    return {"hosts": hosts, "vars": {}, "children": children}
+
+
+class TestHostPatternIndex(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('logging.warning')
+        self.warning_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        groups = {"web": _group(["web01", "web02", "web03"], ["canary"]),
+                  "canary": _group(["canary01"]),
+                  "db": _group(["db01", "db02"]),
+                  "prod": _group(["web01", "web02", "db01"], ["prod-eu"]),
+                  "prod-eu": _group(["canary01"]),
+                  "empty": _group(),
+                  }
+        hosts = sorted(set(x for y in groups.values() for x in y["hosts"]))
+        groups["all"] = _group(hosts + ["lonely"])
+        self.index = pt.HostPatternIndex(groups)
+
+    def test_split_pattern(self):
+        self.assertEqual(pt.split_pattern("web:&prod:!canary"),
+                         ["web", "&prod", "!canary"])
+        self.assertEqual(pt.split_pattern("web, db ,"), ["web", "db"])
+
+    def test_bitset_roundtrip(self):
+        hosts = ["db02", "lonely", "web01"]
+        self.assertEqual(self.index.hosts(self.index.bitset(hosts)), hosts)
+        self.assertEqual(self.index.hosts(0), [])
+
+    def test_children_are_included(self):
+        self.assertEqual(self.index.match("web"),
+                         ["canary01", "web01", "web02", "web03"])
+        self.assertEqual(self.index.match("prod"),
+                         ["canary01", "db01", "web01", "web02"])
+
+    def test_union_intersection_exclusion(self):
+        self.assertEqual(self.index.match("web:db"),
+                         ["canary01", "db01", "db02", "web01", "web02",
+                          "web03"])
+        self.assertEqual(self.index.match("web:&prod"),
+                         ["canary01", "web01", "web02"])
+        self.assertEqual(self.index.match("web:&prod:!canary"),
+                         ["web01", "web02"])
+
+    def test_order_of_terms_does_not_matter(self):
+        self.assertEqual(self.index.match("!canary:&prod:web"),
+                         self.index.match("web:&prod:!canary"))
+
+    def test_only_exclusions_start_with_all(self):
+        self.assertEqual(self.index.match("!web:!db"),
+                         ["lonely"])
+        self.assertEqual(self.index.match("&prod"), self.index.match("prod"))
+
+    def test_all(self):
+        self.assertEqual(len(self.index.match("all")), 7)
+        self.assertEqual(self.index.match("*"), self.index.match("all"))
+
+    def test_hosts_and_wildcards(self):
+        self.assertEqual(self.index.match("db01,lonely"), ["db01", "lonely"])
+        self.assertEqual(self.index.match("web0[12]"), ["web01", "web02"])
+        # Group names are matched as well:
+        self.assertEqual(self.index.match("prod-*"), ["canary01"])
+
+    def test_regexp(self):
+        self.assertEqual(self.index.match("~db0[2-9]"), ["db02"])
+        with self.assertRaises(MalformedInputException):
+            self.index.match("~db0[")
+
+    def test_unknown_term(self):
+        self.assertEqual(self.index.match("nonexistant"), [])
+        self.assertEqual(self.index.match("empty"), [])
+        self.assertEqual(self.warning_mock.call_count, 2)
+
+    def test_empty_pattern(self):
+        with self.assertRaises(MalformedInputException):
+            self.index.match(" , ")
+
+    def test_cycle(self):
+        index = pt.HostPatternIndex({"a": _group(["h1"], ["b"]),
+                                     "b": _group(["h2"], ["a"]),
+                                     "all": _group(["h1", "h2"])})
+        self.assertEqual(index.match("a"), ["h1", "h2"])
+
+    def test_limit_groups(self):
+        res = self.index.limit_groups(self.index.evaluate("web:&prod:!canary"))
+        self.assertEqual(sorted(res), ["all", "prod", "web"])
+        self.assertEqual(res["web"]["hosts"], ["web01", "web02"])
+        self.assertEqual(res["web"]["children"], [])
+        self.assertEqual(res["all"]["hosts"], ["web01", "web02"])
+
+    def test_subtree(self):
+        self.assertEqual(self.index.subtree(["web", "prod"]),
+                         set(["web", "canary", "prod", "prod-eu"]))
+        with self.assertRaises(MalformedInputException):
+            self.index.subtree(["nonexistant"])
+
+    def test_limit_groups_to_subset(self):
+        groups = self.index.subtree(["web"])
+        res = self.index.limit_groups(self.index.evaluate("all"), groups)
+        self.assertEqual(sorted(res), ["all", "canary", "web"])
+        self.assertEqual(res["web"]["children"], ["canary"])
+        self.assertIn("lonely", res["all"]["hosts"])
+
+    def test_inventory_groups(self):
+        v.HostnameParser.set_backend_domain('example.com')
+        self.addCleanup(v.HostnameParser.set_backend_domain, None)
+        inventory = iv.InventoryData(paths.TEST_INVENTORY)
+        index = pt.HostPatternIndex(inventory.get_ansible_groups())
+        self.assertEqual(index.match("guests-y1:!front"), ["foobarator.y1"])
+        self.assertEqual(index.match("hypervisor:front"),
+                         ["y1", "y1-front.foobar"])
+
+
+if __name__ == '__main__':
+    unittest.main()
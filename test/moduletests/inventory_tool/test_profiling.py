@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import io
+import mock
+import os
+import pstats
+import sys
+import time
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.cmdline as cmd
+import inventory_tool.profiling as prof
+
+
+class TestProfilingBase(unittest.TestCase):
+    def tearDown(self):
+        prof.stop(stream=io.StringIO())
+        if os.path.exists(paths.TMP_PSTATS):
+            os.unlink(paths.TMP_PSTATS)
+
+    def _phases(self, summary):
+        # Names of the phases, with indentation, without header and total:
+        return [x[:28].rstrip() for x in summary.splitlines()[1:-1]]
+
+
+class TestParseEnv(TestProfilingBase):
+    def test_disabled(self):
+        for value in [None, "", "0"]:
+            self.assertIsNone(prof.parse_env(value))
+
+    def test_summary_only(self):
+        self.assertEqual(prof.parse_env("1"), "")
+
+    def test_pstats_path(self):
+        self.assertEqual(prof.parse_env("/tmp/foo.pstats"), "/tmp/foo.pstats")
+
+
+class TestPhases(TestProfilingBase):
+    def test_disabled_profiling(self):
+        self.assertFalse(prof.is_enabled())
+        with prof.phase("foo"):
+            prof.begin("bar")
+            prof.end()
+        items = [1, 2, 3]
+        self.assertIs(prof.iterate("foo", items), items)
+        out = io.StringIO()
+        prof.stop(stream=out)
+        self.assertEqual(out.getvalue(), "")
+
+    def test_nested_phases(self):
+        prof.start()
+        self.assertTrue(prof.is_enabled())
+        with prof.phase("load"):
+            for _ in prof.iterate("parse", range(3)):
+                with prof.phase("objects"):
+                    pass
+        with prof.phase("save"):
+            pass
+        with prof.phase("load"):
+            pass
+        out = io.StringIO()
+        prof.stop(stream=out)
+        self.assertFalse(prof.is_enabled())
+        summary = out.getvalue()
+        self.assertEqual(self._phases(summary),
+                         ["load", "  parse", "  objects", "save"])
+        calls = {x[:28].strip(): int(x.split()[3])
+                 for x in summary.splitlines()[1:-1]}
+        # The last, unsuccessful next() call is a part of iteration too:
+        self.assertEqual(calls, {"load": 2, "parse": 4, "objects": 3, "save": 1})
+        self.assertTrue(summary.splitlines()[-1].startswith("total"))
+
+    def test_unfinished_phases_are_closed(self):
+        prof.start()
+        prof.begin("load")
+        prof.begin("parse")
+        out = io.StringIO()
+        prof.stop(stream=out)
+        self.assertEqual(self._phases(out.getvalue()), ["load", "  parse"])
+
+    def test_phase_started_before_profiler(self):
+        since = (time.perf_counter() - 10, time.process_time())
+        prof.start(since=since).record("command line", since)
+        out = io.StringIO()
+        prof.stop(stream=out)
+        lines = out.getvalue().splitlines()
+        self.assertGreaterEqual(float(lines[1].split()[2]), 10)
+        self.assertGreaterEqual(float(lines[-1].split()[1]), 10)
+
+    def test_pstats_dump(self):
+        prof.start(pstats_path=paths.TMP_PSTATS)
+        with prof.phase("foo"):
+            sorted(range(100))
+        out = io.StringIO()
+        prof.stop(stream=out)
+        self.assertIn(paths.TMP_PSTATS, out.getvalue())
+        pstats.Stats(paths.TMP_PSTATS)
+
+
+class TestProfileSwitch(TestProfilingBase):
+    def _run(self, argv, env):
+        with mock.patch('sys.stdout', new_callable=io.StringIO), \
+                mock.patch('logging.getLogger'), \
+                mock.patch('atexit.register'), \
+                mock.patch.dict('os.environ', env, clear=True), \
+                mock.patch('inventory_tool.cmdline.InventoryLock'):
+            with self.assertRaises(SystemExit):
+                cmd.main(['test'] + argv, paths.TEST_INVENTORY,
+                         backend_domain='example.com',
+                         extra_ipaddress_keywords=['tunnel_ip'])
+        enabled = prof.is_enabled()
+        out = io.StringIO()
+        prof.stop(stream=out)
+        return enabled, out.getvalue()
+
+    def tearDown(self):
+        super().tearDown()
+        cmd.HostnameParser.set_backend_domain(None)
+        cmd.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def test_disabled_by_default(self):
+        self.assertEqual(self._run(['--list'], {}), (False, ""))
+
+    def test_profile_switch(self):
+        enabled, summary = self._run(['--profile', '--list'], {})
+        self.assertTrue(enabled)
+        phases = self._phases(summary)
+        for name in ["command line", "lock", "load", "  parse", "  checksum",
+                     "  objects", "list"]:
+            self.assertIn(name, phases)
+
+    def test_environment_variable(self):
+        enabled, summary = self._run(['--list'], {prof.ENV_VARIABLE: "1"})
+        self.assertTrue(enabled)
+        self.assertIn("list", self._phases(summary))
+
+    def test_profile_dump_switch(self):
+        enabled, _ = self._run(['--profile-dump', paths.TMP_PSTATS,
+                                'host', '-l'], {})
+        self.assertTrue(enabled)
+        self.assertTrue(os.path.exists(paths.TMP_PSTATS))
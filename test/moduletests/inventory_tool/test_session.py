@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.object.inventory as iv
+import inventory_tool.object.sqlinventory as sq
+import inventory_tool.validators as v
+from inventory_tool.exception import GenericException, MalformedInputException
+from inventory_tool.lock import InventoryLock
+from inventory_tool.session import InventorySession, open_inventory
+
+
+class TestInventorySession(unittest.TestCase):
+    def setUp(self):
+        for patched in ['logging.debug',
+                        'logging.info',
+                        'logging.warning',
+                        ]:
+            patcher = mock.patch(patched)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self._tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmpdir)
+        self._path = os.path.join(self._tmpdir, 'inventory.yml')
+        shutil.copy(paths.TEST_INVENTORY, self._path)
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def _session(self, **kwargs):
+        return InventorySession(self._path, backend_domain='example.com',
+                                **kwargs)
+
+    def _groups(self, backend='yaml'):
+        inventory = open_inventory(self._path, backend)
+        try:
+            return inventory.group_get()
+        finally:
+            inventory.close()
+
+    def test_commit_saves_once(self):
+        with mock.patch.object(iv.InventoryData, 'save',
+                               autospec=True) as SaveMock:
+            with self._session() as inv:
+                for i in range(10):
+                    inv.group_add(group="batch{0}".format(i))
+        self.assertEqual(SaveMock.call_count, 1)
+
+    def test_commit(self):
+        with self._session(extra_ipaddress_keywords=['tunnel_ip']) as inv:
+            inv.host_add(host="session-host")
+            inv.group_host_add(group="hypervisor", host="session-host")
+            inv.host_set_vars(host="session-host",
+                              data=[{"key": "tunnel_ip", "val": None}])
+        obj = iv.InventoryData(self._path)
+        self.assertIn("session-host", obj.group_get("hypervisor").get_hosts())
+        self.assertIsNotNone(obj.host_get("session-host").get_keyval("tunnel_ip"))
+
+    def test_script_exception_rolls_back(self):
+        with open(self._path, 'rb') as fh:
+            before = fh.read()
+        session = self._session()
+        with self.assertRaises(MalformedInputException):
+            with session as inv:
+                inv.group_add(group="session-group")
+                inv.group_add(group="session-group")
+        with open(self._path, 'rb') as fh:
+            self.assertEqual(fh.read(), before)
+        # The lock has been released:
+        with InventoryLock(self._path, timeout=0) as lock:
+            self.assertTrue(lock.is_locked())
+
+    def test_other_exceptions_are_not_committed(self):
+        with self.assertRaises(KeyError):
+            with self._session() as inv:
+                inv.group_add(group="session-group")
+                raise KeyError("foo")
+        self.assertNotIn("session-group", self._groups())
+
+    def test_explicit_rollback_and_commit(self):
+        with self._session() as session:
+            session.group_add(group="first")
+            session.commit()
+            session.group_add(group="second")
+            session.rollback()
+            self.assertNotIn("second", session.group_get())
+            self.assertIn("first", session.inventory.group_get())
+            session.group_add(group="third")
+        groups = self._groups()
+        self.assertIn("first", groups)
+        self.assertNotIn("second", groups)
+        self.assertIn("third", groups)
+
+    def test_rollback_of_initialized_inventory(self):
+        os.unlink(self._path)
+        with self._session(initialize=True) as session:
+            session.group_add(group="first")
+            session.rollback()
+            self.assertEqual(session.group_get(), [])
+            session.group_add(group="second")
+        self.assertEqual(self._groups(), ["second"])
+
+    def test_sqlite_rollback(self):
+        self._path = os.path.join(self._tmpdir, 'inventory.sqlite')
+        v.HostnameParser.set_backend_domain('example.com')
+        obj = sq.SQLiteInventoryData(self._path, initialize=True)
+        obj.import_yaml(paths.TEST_INVENTORY)
+        obj.save()
+        obj.close()
+        with self.assertRaises(MalformedInputException):
+            with self._session(backend='sqlite') as inv:
+                inv.group_add(group="session-group")
+                inv.host_del(host="no-such-host")
+        with self._session(backend='sqlite') as inv:
+            self.assertNotIn("session-group", inv.group_get())
+            inv.group_add(group="other-group")
+        groups = self._groups(backend='sqlite')
+        self.assertNotIn("session-group", groups)
+        self.assertIn("other-group", groups)
+
+    def test_not_opened(self):
+        session = self._session()
+        with self.assertRaises(GenericException):
+            session.group_get()
+
+    def test_private_attributes_are_not_forwarded(self):
+        with self._session() as session:
+            with self.assertRaises(AttributeError):
+                session._data
+
+    def test_lock_released_if_load_fails(self):
+        os.unlink(self._path)
+        session = self._session()
+        with self.assertRaises(MalformedInputException):
+            session.open()
+        with InventoryLock(self._path, timeout=0) as lock:
+            self.assertTrue(lock.is_locked())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.object.inventory as iv
+import inventory_tool.object.shardedinventory as sh
+import inventory_tool.validators as v
+from inventory_tool.exception import MalformedInputException
+
+
+class TestShardedInventoryData(unittest.TestCase):
+    def setUp(self):
+        for patched in ['logging.debug',
+                        'logging.info',
+                        'logging.warning',
+                        ]:
+            patcher = mock.patch(patched)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        v.HostnameParser.set_backend_domain('example.com')
+        v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+        self._tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmpdir)
+        self._path = os.path.join(self._tmpdir, 'inventory.d')
+        obj = sh.ShardedInventoryData(self._path, initialize=True)
+        obj.import_yaml(paths.TEST_INVENTORY)
+        obj.save()
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def _files(self):
+        ret = []
+        for root, dirs, files in os.walk(self._path):
+            ret.extend(os.path.relpath(os.path.join(root, x), self._path)
+                       for x in files)
+        return sorted(ret)
+
+    def _touch_all(self):
+        for name in self._files():
+            os.utime(os.path.join(self._path, name), ns=(0, 0))
+
+    def _modified(self):
+        return [x for x in self._files()
+                if os.stat(os.path.join(self._path, x)).st_mtime_ns != 0]
+
+    def test_layout(self):
+        expected = ['groups.yml', 'ippools.yml', 'manifest.yml']
+        expected += [sh.host_shard(x) for x in ['foobarator.y1', 'y1',
+                                                'y1-front.foobar']]
+        self.assertEqual(self._files(), sorted(set(expected)))
+
+    def test_missing_inventory(self):
+        with self.assertRaises(MalformedInputException):
+            sh.ShardedInventoryData(self._path + '.missing')
+
+    def test_all_attributes_set(self):
+        for initialize in [True, False]:
+            obj = sh.ShardedInventoryData(self._path, initialize=initialize)
+            for cls in type(obj).__mro__:
+                for name in getattr(cls, '__slots__', []):
+                    self.assertTrue(hasattr(obj, name), name)
+            self.assertEqual(obj._format, 'yaml')
+
+    def test_roundtrip(self):
+        obj = sh.ShardedInventoryData(self._path)
+        self.assertFalse(obj.is_recalculated())
+        self.assertEqual(obj.get_hash(),
+                         iv.InventoryData(paths.TEST_INVENTORY).get_hash())
+        self.assertEqual(obj.get_ansible_inventory(),
+                         iv.InventoryData(paths.TEST_INVENTORY).get_ansible_inventory())
+
+    def test_loads_only_touched_shards(self):
+        obj = sh.ShardedInventoryData(self._path)
+        obj.host_get("y1")
+        self.assertEqual(list(obj._data["hosts"].get_loaded_shards()),
+                         [sh.host_shard("y1")])
+
+    def test_save_rewrites_only_dirty_shards(self):
+        self._touch_all()
+        obj = sh.ShardedInventoryData(self._path)
+        obj.host_set_vars("y1", [{"key": "foo", "val": "bar"}])
+        obj.host_get("foobarator.y1")
+        obj.save()
+
+        self.assertEqual(self._modified(), [sh.host_shard("y1"), 'manifest.yml'])
+        obj = sh.ShardedInventoryData(self._path)
+        self.assertFalse(obj.is_recalculated())
+        self.assertEqual(obj.host_get("y1").get_keyval("foo"), "bar")
+
+    def test_unchanged_inventory_is_not_written(self):
+        self._touch_all()
+        obj = sh.ShardedInventoryData(self._path)
+        obj.host_get("y1")
+        obj.save()
+        self.assertEqual(self._modified(), [])
+
+    def test_host_del_removes_empty_shard(self):
+        obj = sh.ShardedInventoryData(self._path)
+        obj.host_del("y1")
+        obj.save()
+        self.assertNotIn(sh.host_shard("y1"), self._files())
+        obj = sh.ShardedInventoryData(self._path)
+        self.assertFalse(obj.is_recalculated())
+        self.assertNotIn("y1", obj.host_get())
+
+    def test_alias_conflict_with_unloaded_shard(self):
+        obj = sh.ShardedInventoryData(self._path)
+        with self.assertRaises(MalformedInputException):
+            obj.host_add("front-foobar.y1")
+        self.assertNotIn(sh.host_shard("y1-front.foobar"),
+                         obj._data["hosts"].get_loaded_shards())
+
+    def test_host_add_many_alias_conflict_with_unloaded_shard(self):
+        obj = sh.ShardedInventoryData(self._path)
+        with self.assertRaises(MalformedInputException):
+            obj.host_add_many(["web1", "front-foobar.y1"])
+        obj.host_add_many(["web1", "web2"], groups=["front"])
+        obj.save()
+        obj = sh.ShardedInventoryData(self._path)
+        self.assertFalse(obj.is_recalculated())
+        self.assertIn("web2", obj.group_get("front").get_hosts())
+
+    def test_manual_edit_triggers_recalculation(self):
+        shard = os.path.join(self._path, sh.host_shard("y1"))
+        with open(shard, 'r') as fh:
+            data = fh.read()
+        with open(shard, 'w') as fh:
+            fh.write(data.replace("192.168.255.125", "192.168.255.126"))
+        obj = sh.ShardedInventoryData(self._path)
+        # Edited shard is verified when it is loaded:
+        self.assertFalse(obj.is_recalculated())
+        obj.host_get("y1")
+        self.assertTrue(obj.is_recalculated())
+        self.assertEqual(obj.ippool_get("tunels").get_hash()["allocated"],
+                         ["192.168.255.126"])
+        obj.save()
+        obj = sh.ShardedInventoryData(self._path)
+        obj.host_get()
+        self.assertFalse(obj.is_recalculated())
+
+    def test_removed_shard_triggers_recalculation(self):
+        os.unlink(os.path.join(self._path, sh.host_shard("y1-front.foobar")))
+        obj = sh.ShardedInventoryData(self._path)
+        self.assertTrue(obj.is_recalculated())
+        self.assertNotIn("y1-front.foobar", obj.host_get())
+
+    def test_host_lookup_reads_only_its_shard(self):
+        with mock.patch.object(sh, '_checksum', wraps=sh._checksum) as ChecksumMock:
+            obj = sh.ShardedInventoryData(self._path)
+            obj.get_ansible_hostvars("y1")
+        # groups.yml, ippools.yml and the shard of the host:
+        self.assertEqual(ChecksumMock.call_count, 3)
+        self.assertFalse(obj.is_recalculated())
+
+    def test_initialize_removes_old_shards(self):
+        obj = sh.ShardedInventoryData(self._path, initialize=True)
+        obj.save()
+        self.assertEqual(self._files(), ['groups.yml', 'ippools.yml',
+                                         'manifest.yml'])
+        self.assertEqual(sh.ShardedInventoryData(self._path).host_get(), [])
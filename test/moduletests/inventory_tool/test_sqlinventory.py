@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.object.inventory as iv
+import inventory_tool.object.sqlinventory as sq
+import inventory_tool.validators as v
+from inventory_tool.exception import BadDataException, MalformedInputException
+from inventory_tool.object.ippool import IPPool
+
+# For Python3 < 3.3, ipaddress module is available as an extra module,
+# under a different name:
+try:
+    from ipaddress import ip_address
+    from ipaddress import ip_network
+except ImportError:
+    from ipaddr import IPAddress as ip_address
+    from ipaddr import IPNetwork as ip_network
+
+
+class TestSQLiteInventoryData(unittest.TestCase):
+    def setUp(self):
+        for patched in ['logging.debug',
+                        'logging.info',
+                        'logging.warning',
+                        ]:
+            patcher = mock.patch(patched)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        v.HostnameParser.set_backend_domain('example.com')
+        v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+        self._tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmpdir)
+        self._db_path = os.path.join(self._tmpdir, 'inventory.sqlite')
+        obj = sq.SQLiteInventoryData(self._db_path, initialize=True)
+        obj.import_yaml(paths.TEST_INVENTORY)
+        obj.save()
+        obj.close()
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+    def _open(self):
+        obj = sq.SQLiteInventoryData(self._db_path)
+        self.addCleanup(obj.close)
+        return obj
+
+    def test_missing_file(self):
+        with self.assertRaises(MalformedInputException):
+            sq.SQLiteInventoryData(self._db_path + '.missing')
+
+    def test_not_a_database(self):
+        with self.assertRaises(BadDataException):
+            sq.SQLiteInventoryData(paths.TEST_INVENTORY)
+
+    def test_stats_match_yaml_backend(self):
+        obj = self._open()
+        expected = iv.InventoryData(paths.TEST_INVENTORY).get_stats(top=2)
+        self.assertEqual(obj.get_stats(top=2), expected)
+
+    def test_ansible_inventory_matches_yaml_backend(self):
+        obj = self._open()
+        expected = iv.InventoryData(paths.TEST_INVENTORY).get_ansible_inventory()
+        for host in expected["_meta"]["hostvars"].values():
+            host["aliases"].sort()
+        self.assertEqual(obj.get_ansible_inventory(), expected)
+        self.assertEqual(obj.get_ansible_hostvars("y1"),
+                         expected["_meta"]["hostvars"]["y1"])
+        self.assertEqual(obj.get_ansible_hostvars("nonexistant"), {})
+
+    def test_check_ansible_hosts(self):
+        obj = self._open()
+        obj.check_ansible_hosts()
+        obj.host_add("y2")
+        with self.assertRaises(BadDataException):
+            obj.check_ansible_hosts()
+        obj.check_ansible_hosts(hosts=["y1"])
+
+    def test_host_find_matches_yaml_backend(self):
+        obj = self._open()
+        expected = iv.InventoryData(paths.TEST_INVENTORY)
+        for kwargs in [{"key": "ansible_ssh_host", "val": "1.2.3.4"},
+                       {"key": "ansible_ssh_host",
+                        "network": ip_network("192.168.0.0/16")},
+                       {"key": "tunnel_ip", "network": ip_network("::/0")},
+                       {"key": "nonexistant", "val": "foo"}]:
+            self.assertEqual(obj.host_find(**kwargs),
+                             expected.host_find(**kwargs), kwargs)
+        obj.host_set_vars("y1", [{"key": "ansible_ssh_port", "val": 2222}])
+        self.assertEqual(obj.host_find("ansible_ssh_port", "2222"), ["y1"])
+
+    def test_ansible_hostvars_of_some_hosts(self):
+        obj = self._open()
+        expected = iv.InventoryData(paths.TEST_INVENTORY)
+        hosts = ["y1-front.foobar", "y1"]
+        self.assertEqual(list(obj.iter_ansible_hostvars(hosts=hosts)),
+                         list(expected.iter_ansible_hostvars(hosts=hosts)))
+
+    def test_export_import_roundtrip(self):
+        obj = self._open()
+        yaml_path = os.path.join(self._tmpdir, 'inventory.yml')
+        obj.export_yaml(yaml_path)
+
+        exported = iv.InventoryData(yaml_path)
+        self.assertFalse(exported.is_recalculated())
+        self.assertEqual(exported.get_hash(), obj.get_hash())
+        self.assertEqual(iv.InventoryData(paths.TEST_INVENTORY).get_hash(),
+                         obj.get_hash())
+
+    def test_changes_need_save(self):
+        obj = self._open()
+        obj.host_add("y2")
+        self.assertNotIn("y2", self._open().host_get())
+        obj.save()
+        self.assertIn("y2", self._open().host_get())
+
+    def test_close_discards_unsaved_changes(self):
+        obj = sq.SQLiteInventoryData(self._db_path)
+        obj.host_add("y2")
+        obj.close()
+        self.assertNotIn("y2", self._open().host_get())
+
+    def test_ip_autoallocation(self):
+        obj = self._open()
+        obj.host_add("y2")
+        obj.group_host_add(group="guests-y1", host="y2")
+        obj.host_set_vars("y2", [{"key": "ansible_ssh_host", "val": None}])
+        obj.save()
+
+        obj = self._open()
+        ip = obj.host_get("y2").get_keyval("ansible_ssh_host")
+        self.assertIn(str(ip), obj.ippool_get("y1_guests").get_hash()["allocated"])
+        obj.host_del("y2")
+        self.assertNotIn(str(ip),
+                         obj.ippool_get("y1_guests").get_hash()["allocated"])
+
+    def test_host_add_many_matches_yaml_backend(self):
+        args = {"hosts": ["web1", "web2", "web3"],
+                "groups": ["guests-y1", "front"],
+                "data": [{"key": "ansible_ssh_host", "val": None},
+                         {"key": "role", "val": "web"}]}
+        obj = self._open()
+        obj.host_add_many(**args)
+        expected = iv.InventoryData(paths.TEST_INVENTORY)
+        expected.host_add_many(**args)
+        self.assertEqual(obj.get_hash(), expected.get_hash())
+
+        before = obj.get_hash()
+        with self.assertRaises(MalformedInputException):
+            obj.host_add_many(["web4", "web1"], groups=["guests-y1"],
+                              data=[{"key": "ansible_ssh_host", "val": None}])
+        self.assertEqual(obj.get_hash(), before)
+        with self.assertRaises(MalformedInputException):
+            obj.host_add_many(["web4", "web5"], groups=["guests-y1"],
+                              data=[{"key": "ansible_ssh_host",
+                                     "val": "192.168.125.7"}])
+        self.assertEqual(obj.get_hash(), before)
+
+    def test_failed_operation_is_rolled_back(self):
+        obj = self._open()
+        obj.host_add("y2")
+        before = obj.get_hash()
+        with self.assertRaises(MalformedInputException):
+            obj.host_set_vars("y2", [{"key": "tunnel_ip", "val": None},
+                                     {"key": "ansible_ssh_host", "val": None}])
+        self.assertEqual(before, obj.get_hash())
+
+    def test_ippool_add_overlapping(self):
+        obj = self._open()
+        with self.assertRaises(MalformedInputException):
+            obj.ippool_add("overlap", IPPool("192.168.125.0/25"))
+
+    def test_ippool_book_and_cancel(self):
+        obj = self._open()
+        obj.ippool_add("new", IPPool("10.10.0.0/24"))
+        obj.ippool_book_ipaddr("new", ip_address("10.10.0.1"))
+        self.assertEqual(obj.ippool_get("new").get_hash()["reserved"],
+                         ["10.10.0.1"])
+        obj.ippool_cancel_ipaddr("new", ip_address("10.10.0.1"))
+        self.assertEqual(obj.ippool_get("new").get_hash()["reserved"], [])
+        with self.assertRaises(MalformedInputException):
+            obj.ippool_cancel_ipaddr("new", ip_address("10.10.0.1"))
+
+    def test_group_del_cascades(self):
+        obj = self._open()
+        obj.group_add("parent")
+        obj.group_child_add("parent", "front")
+        obj.group_del("front")
+        self.assertEqual(obj.group_get("parent").get_children(), [])
+        self.assertNotIn("front", obj.host_to_groups("y1"))
+
+    def test_host_rename(self):
+        obj = self._open()
+        groups = obj.host_to_groups("y1")
+        obj.host_rename("y1", "y1-renamed")
+        self.assertEqual(obj.host_to_groups("y1-renamed"), groups)
+        with self.assertRaises(MalformedInputException):
+            obj.host_rename("y1-renamed", "foobarator.y1")
+
+    def test_host_rename_conflicts_match_yaml_backend(self):
+        for obj in [self._open(),
+                    iv.InventoryData(paths.TEST_INVENTORY)]:
+            before = obj.get_hash()
+            for name in ["foobarator.y1", "front-foobar.y1"]:
+                with self.assertRaises(MalformedInputException):
+                    obj.host_rename("y1", name)
+            self.assertEqual(obj.get_hash(), before)
+
+    def test_alias_conflicts(self):
+        obj = self._open()
+        obj.host_alias_add("y1", "y1-alias")
+        with self.assertRaises(MalformedInputException):
+            obj.host_alias_add("foobar", "y1-alias")
+        with self.assertRaises(MalformedInputException):
+            obj.host_add("y1-alias")
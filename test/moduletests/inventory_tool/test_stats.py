@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Copyright (c) 2014 Brainly.com sp. z o.o.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may not
+# use this file except in compliance with the License. You may obtain a copy of
+# the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations under
+# the License.
+
+# Global imports:
+import io
+import json
+import mock
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# To perform local imports first we need to fix PYTHONPATH:
+pwd = os.path.abspath(os.path.dirname(__file__))
+sys.path.append(os.path.abspath(pwd + '/../../modules/'))
+
+# Local imports:
+import file_paths as paths
+import inventory_tool.cmdline as cmd
+import inventory_tool.stats as st
+import inventory_tool.object.inventory as iv
+import inventory_tool.validators as v
+
+
+class TestStatsBase(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('logging.warning')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        v.HostnameParser.set_backend_domain('example.com')
+        v.KeyWordValidator.set_extra_ipaddress_keywords(['tunnel_ip'])
+        self._tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self._tmpdir)
+        inventory = iv.InventoryData(paths.TEST_INVENTORY)
+        self.stats = st.collect(inventory, paths.TEST_INVENTORY, top=2)
+
+    def tearDown(self):
+        v.HostnameParser.set_backend_domain(None)
+        v.KeyWordValidator.set_extra_ipaddress_keywords([])
+
+
+class TestCollect(TestStatsBase):
+    def test_file_size(self):
+        self.assertEqual(self.stats["file_size"],
+                         os.path.getsize(paths.TEST_INVENTORY))
+
+    def test_directory_size(self):
+        os.mkdir(os.path.join(self._tmpdir, "hosts"))
+        for name, size in [("manifest.yml", 10), ("hosts/00.yml", 5)]:
+            with open(os.path.join(self._tmpdir, name), 'w') as fh:
+                fh.write("x" * size)
+        self.assertEqual(st.file_size(self._tmpdir), 15)
+
+    def test_missing_file(self):
+        self.assertIsNone(st.file_size(os.path.join(self._tmpdir, "missing")))
+
+
+class TestFormats(TestStatsBase):
+    def test_human(self):
+        out = st.format_human(self.stats)
+        self.assertIn("Hosts: 3\n", out)
+        self.assertIn("\tguests-y1: 2 hosts\n", out)
+        self.assertIn("\ty1_guests (192.168.125.0/24): 3/254 used (1.2%), " +
+                      "2 allocated, 1 reserved, 251 free in 1 ranges, " +
+                      "fragmentation 0.00\n", out)
+
+    def test_human_empty_inventory(self):
+        inventory = iv.InventoryData(paths.TMP_INVENTORY, initialize=True)
+        out = st.format_human(st.collect(inventory, paths.TMP_INVENTORY))
+        self.assertNotIn("File size", out)
+        self.assertEqual(out.count("<None>"), 2)
+
+    def test_prometheus(self):
+        out = st.format_prometheus(self.stats)
+        lines = out.splitlines()
+        self.assertIn("# TYPE inventory_tool_hosts gauge", lines)
+        self.assertIn("inventory_tool_hosts 3", lines)
+        self.assertIn('inventory_tool_group_hosts{group="guests-y1"} 2', lines)
+        self.assertIn('inventory_tool_ippool_free{pool="y1_guests",' +
+                      'network="192.168.125.0/24"} 251', lines)
+        for line in lines:
+            if not line.startswith("#"):
+                float(line.rsplit(" ", 1)[1])
+
+    def test_prometheus_label_escaping(self):
+        self.stats["largest_groups"] = [('a"b\\c', 1)]
+        self.assertIn('inventory_tool_group_hosts{group="a\\"b\\\\c"} 1\n',
+                      st.format_prometheus(self.stats))
+
+    def test_write_textfile(self):
+        path = os.path.join(self._tmpdir, "inventory.prom")
+        st.write_textfile(path, "foo 1\n")
+        with open(path) as fh:
+            self.assertEqual(fh.read(), "foo 1\n")
+        self.assertEqual(os.listdir(self._tmpdir), ["inventory.prom"])
+
+
+class TestStatsSubcommand(TestStatsBase):
+    def _run(self, argv):
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as StdoutMock, \
+                mock.patch('logging.getLogger'), \
+                mock.patch('inventory_tool.cmdline.InventoryLock') as LockMock:
+            with self.assertRaises(SystemExit) as e:
+                cmd.main(['test'] + argv, paths.TEST_INVENTORY,
+                         backend_domain='example.com',
+                         extra_ipaddress_keywords=['tunnel_ip'])
+            self.assertEqual(e.exception.code, 0)
+        # Statistics are read-only, just like --list:
+        self.assertFalse(LockMock.return_value.acquire.called)
+        return StdoutMock.getvalue()
+
+    def test_json(self):
+        res = json.loads(self._run(['stats', '--format', 'json', '--top', '2']))
+        self.assertEqual(res["largest_groups"], [["guests-y1", 2], ["front", 1]])
+        self.assertEqual(res["pools"]["tunels"]["allocated"], 1)
+
+    def test_textfile(self):
+        path = os.path.join(self._tmpdir, "inventory.prom")
+        self.assertEqual(self._run(['stats', '--textfile', path]), "")
+        with open(path) as fh:
+            self.assertIn("inventory_tool_hosts 3\n", fh.read())
@@ -15,8 +15,11 @@
 
 # Global imports:
 import argparse
+import contextlib
+import io
 import mock
 import os
+import signal
 import sys
 import unittest
 
@@ -25,6 +28,7 @@ pwd = os.path.abspath(os.path.dirname(__file__))
 sys.path.append(os.path.abspath(pwd + '/../../modules/'))
 
 # Local imports:
+import file_paths as paths
 import inventory_tool.validators as v
 from inventory_tool.exception import MalformedInputException
 
@@ -38,6 +42,24 @@ except ImportError:
     from ipaddr import IPNetwork as ip_network
 
 
+@contextlib.contextmanager
+def _time_limit(seconds):
+    """Fail the test instead of letting it hang, where SIGALRM is available"""
+    if not hasattr(signal, 'SIGALRM'):
+        yield
+        return
+
+    def timeout(*unused):
+        raise AssertionError("Took more than {0}s".format(seconds))
+    handler = signal.signal(signal.SIGALRM, timeout)
+    signal.alarm(seconds)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, handler)
+
+
 class TestKeyWordValidator(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -131,6 +153,24 @@ class TestHostNameParser(unittest.TestCase):
         with self.assertRaises(MalformedInputException):
             v.HostnameParser.normalize_hostname(test_domain)
 
+    def test_dots_in_backend_domain_are_literal(self):
+        test_domain = "me.exampleXcom."
+        self.assertEqual(test_domain,
+                         v.HostnameParser.normalize_hostname(test_domain))
+
+    def test_backend_domain_change(self):
+        test_domain = "me.{0}.".format(self._backend_domain)
+        self.assertEqual("me", v.HostnameParser.normalize_hostname(test_domain))
+        try:
+            v.HostnameParser.set_backend_domain("example.net")
+            self.assertEqual(test_domain,
+                             v.HostnameParser.normalize_hostname(test_domain))
+            v.HostnameParser.set_backend_domain(None)
+            with self.assertRaises(MalformedInputException):
+                v.HostnameParser.normalize_hostname(test_domain)
+        finally:
+            v.HostnameParser.set_backend_domain(self._backend_domain)
+
 
 class TestGetIpaddr(unittest.TestCase):
     def test_get_good_ipaddr(self):
@@ -188,6 +228,39 @@ class TestGetFqdn(unittest.TestCase):
         with self.assertRaises(argparse.ArgumentTypeError):
             v.get_fqdn(domain)
 
+    def test_get_good_fqdns(self, HostnameParserMock):
+        HostnameParserMock.side_effect = lambda x: x
+        for domain in ['y1', 'www.example.com.', 'web-01.dc1', '1.2.3.4',
+                       'x--y.example.com', 'a' * 63 + '.example.com',
+                       '.'.join(['a' * 62] * 4) + '.']:
+            self.assertEqual(domain, v.get_fqdn(domain))
+
+    def test_get_malformed_fqdns(self, *unused):
+        for domain in ['', '.', '.example.com', 'www..example.com',
+                       'www.example.com..', '-www.example.com',
+                       'www-.example.com', 'WWW.example.com',
+                       'www_1.example.com', 'www.example.com\n',
+                       'a' * 64 + '.example.com',
+                       '.'.join(['a' * 63] * 4)]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                v.get_fqdn(domain)
+
+    def test_adversarial_fqdns_are_rejected(self, *unused):
+        # Near-misses that made a backtracking regex run for minutes:
+        domains = ['a' * 60 + '!', 'a-' * 30 + '!', ('a' * 20 + '.') * 12 + '_',
+                   'a' * 250 + '-', '-'.join(['a'] * 126) + '.!']
+        with _time_limit(30):
+            for domain in domains:
+                with self.assertRaises(argparse.ArgumentTypeError):
+                    v.get_fqdn(domain)
+
+    def test_bulk_fqdns(self, HostnameParserMock):
+        HostnameParserMock.side_effect = lambda x: x
+        parse = v.names_source(v.get_fqdn, ranges=True)
+        names = parse("web[00001:20000]." + "a-b" * 20)
+        self.assertEqual(len(names), 20000)
+        self.assertEqual(names[-1], "web20000." + "a-b" * 20)
+
 
 class TestGetName(unittest.TestCase):
     def test_get_good_name(self):
@@ -199,6 +272,113 @@ class TestGetName(unittest.TestCase):
         with self.assertRaises(argparse.ArgumentTypeError):
             v.get_name(name_str)
 
+    def test_adversarial_names_are_rejected(self):
+        # Long enough for a backtracking regex to never finish:
+        names = ["a" * 10000 + " ", "a\n", "-." * 5000 + "!"]
+        with _time_limit(30):
+            for name in names:
+                with self.assertRaises(argparse.ArgumentTypeError):
+                    v.get_name(name)
+
+
+class TestGetCount(unittest.TestCase):
+    def test_get_good_count(self):
+        self.assertEqual(v.get_count("0"), 0)
+        self.assertEqual(v.get_count("15"), 15)
+
+    def test_get_bad_count(self):
+        for count_str in ["-1", "foo", "1.5"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                v.get_count(count_str)
+
+
+class TestExpandRanges(unittest.TestCase):
+    def test_no_ranges(self):
+        self.assertEqual(v.expand_ranges("web1.dc1"), ["web1.dc1"])
+
+    def test_padded_range(self):
+        res = v.expand_ranges("web[008:011].dc1")
+        self.assertEqual(res, ["web008.dc1", "web009.dc1", "web010.dc1",
+                               "web011.dc1"])
+
+    def test_many_ranges(self):
+        self.assertEqual(v.expand_ranges("web[1:2].dc[8:9]"),
+                         ["web1.dc8", "web1.dc9", "web2.dc8", "web2.dc9"])
+
+    def test_bad_ranges(self):
+        for name_str in ["web[2:1]", "web[a:b]", "web[1-2]", "web[]"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                v.expand_ranges(name_str)
+
+
+class TestNamesSource(unittest.TestCase):
+    def setUp(self):
+        self.parse = v.names_source(v.get_name)
+
+    def tearDown(self):
+        if os.path.exists(paths.TMP_NAMES):
+            os.unlink(paths.TMP_NAMES)
+
+    def test_single_name(self):
+        self.assertEqual(self.parse("some-name"), ["some-name"])
+
+    def test_names_from_file(self):
+        with open(paths.TMP_NAMES, 'w') as fh:
+            fh.write("first-name\n# comment\n\n  second-name  \n")
+        self.assertEqual(self.parse("@" + paths.TMP_NAMES),
+                         ["first-name", "second-name"])
+
+    def test_names_from_stdin(self):
+        with mock.patch('sys.stdin', new=io.StringIO("first-name\nsecond-name\n")):
+            self.assertEqual(self.parse("-"), ["first-name", "second-name"])
+
+    def test_ranges(self):
+        parse = v.names_source(v.get_name, ranges=True)
+        self.assertEqual(parse("web[1:2]"), ["web1", "web2"])
+        with open(paths.TMP_NAMES, 'w') as fh:
+            fh.write("db[1:2]\n")
+        self.assertEqual(parse("@" + paths.TMP_NAMES), ["db1", "db2"])
+        # Brackets are not valid in names otherwise:
+        with self.assertRaises(argparse.ArgumentTypeError):
+            self.parse("web[1:2]")
+
+    def test_bad_names(self):
+        with open(paths.TMP_NAMES, 'w') as fh:
+            fh.write("first-name\nthis is a bad name\n")
+        for name_str in ["this is a bad name", "@" + paths.TMP_NAMES,
+                         "@" + paths.TMP_NAMES + ".missing"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                self.parse(name_str)
+
+
+class TestNamesList(unittest.TestCase):
+    def test_names(self):
+        parse = v.names_list(v.get_name)
+        self.assertEqual(parse("web,db"), ["web", "db"])
+        self.assertEqual(parse(" web , db,"), ["web", "db"])
+        for names_str in ["", ",", "web,d b"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse(names_str)
+
+
+class TestGetCondition(unittest.TestCase):
+    def test_value(self):
+        self.assertEqual(v.get_condition("ansible_ssh_port=2222"),
+                         {"key": "ansible_ssh_port", "val": "2222"})
+        self.assertEqual(v.get_condition("role=a=b"),
+                         {"key": "role", "val": "a=b"})
+
+    def test_network(self):
+        self.assertEqual(v.get_condition("tunnel_ip~10.9.1.1/16"),
+                         {"key": "tunnel_ip",
+                          "network": ip_network("10.9.0.0/16")})
+
+    def test_bad_conditions(self):
+        for condition_str in ["tunnel_ip", "tunnel_ip=", "=foo",
+                              "tunnel_ip~10.9.0.0/33", "tunnel_ip~foo"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                v.get_condition(condition_str)
+
 
 class TestGetKeyVal(unittest.TestCase):
     def setUp(self):